@@ -1,7 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
-from apps.core.models import User
+from apps.core import purge
+from apps.core.changes import record_changes
+from apps.core.models import Change, Recipe, User
+from apps.core.paginator import EstimatedCountPaginator
+from apps.core.search import search_users
 from . import models
 
 
@@ -28,6 +33,15 @@ class UserAdmin(BaseUserAdmin):
     search_fields = ["email", "name"]
     """
     Specify the fields that should be searchable in the admin interface.
+
+    The search itself is done by `get_search_results`, which only issues
+    lookups the user indexes can serve.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    """
+    Avoid `COUNT(*)` over the whole user table on every changelist page.
     """
 
     fieldsets = (
@@ -74,9 +88,163 @@ class UserAdmin(BaseUserAdmin):
     Specify fields that are read-only and cannot be edited in the admin interface.
     """
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search by exact email, then by email/name prefix, then by trigram
+        similarity, instead of `ILIKE '%term%'` over both columns.
+        """
+        return search_users(queryset, search_term), False
+
+    actions = ["purge_users"]
+
+    @admin.action(
+        description=_("Deactivate and delete selected users in the background"),
+        permissions=["delete"],
+    )
+    def purge_users(self, request, queryset):
+        """
+        Queue the selected users for the job worker.
+
+        The built-in delete action cascades through every recipe in one
+        transaction, which is too slow for large accounts.
+        """
+        users = list(queryset)
+        for user in users:
+            purge.delete_account(user)
+        self.message_user(
+            request, _("Queued %(count)d users for deletion.") % {"count": len(users)}
+        )
+
+
+def record_admin_changes(entries):
+    """Record ``(user_id, action, kind, object id)`` entries in each user's log."""
+    by_user = {}
+    for user_id, action, kind, object_id in entries:
+        by_user.setdefault(user_id, {}).setdefault(action, []).append((kind, object_id))
+    # In user order, so concurrent writes lock the counters in the same order.
+    for user_id, changes in sorted(by_user.items()):
+        record_changes(user_id, **changes)
+
+
+class ChangeLogAdminMixin:
+    """
+    Record admin creates, edits and deletes in the owners' change logs.
+
+    Sync clients, the change stream and the in-memory recipe indexes only
+    learn of writes from the log, so every write path must go through
+    `apps.core.changes.record_changes`.
+    """
+
+    change_kind = None
+    recipe_field = None
+    """
+    The `Recipe` field relating recipes to these objects, whose recipes
+    embed their names and so change with them.
+    """
+
+    def affected_entries(self, object_ids):
+        if self.recipe_field is None:
+            return []
+        recipes = Recipe.objects.filter(**{f"{self.recipe_field}__in": object_ids})
+        return [
+            (user_id, "updated", Change.Kind.RECIPE, pk)
+            for user_id, pk in recipes.values_list("user_id", "id").distinct()
+        ]
+
+    def save_related(self, request, form, formsets, change):
+        # Runs after the object and its many-to-many fields are saved, in
+        # the admin's transaction.
+        super().save_related(request, form, formsets, change)
+        obj = form.instance
+        entries = [
+            (obj.user_id, "updated" if change else "created", self.change_kind, obj.pk)
+        ] + self.affected_entries([obj.pk])
+        previous_user_id = form.initial.get("user") if change else None
+        if previous_user_id is not None and previous_user_id != obj.user_id:
+            # Moved to another user: gone from the previous owner's catalog.
+            entries.append((previous_user_id, "deleted", self.change_kind, obj.pk))
+        record_admin_changes(entries)
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, self.model.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            deleted = list(queryset.values_list("user_id", "id"))
+            entries = self.affected_entries([pk for _, pk in deleted])
+            super().delete_queryset(request, queryset)
+            record_admin_changes(
+                entries
+                + [(user_id, "deleted", self.change_kind, pk) for user_id, pk in deleted]
+            )
+
+
+class RecipeAdmin(ChangeLogAdminMixin, admin.ModelAdmin):
+    """
+    Define the admin interface for the Recipe model.
+
+    Tuned for large tables: the owner is joined into the changelist query,
+    the full-table count is estimated, and related objects are picked with
+    raw id / autocomplete widgets instead of loading every row into a select.
+    """
+
+    change_kind = Change.Kind.RECIPE
+    list_display = ["title", "user", "time_minute", "price"]
+
+    list_select_related = ["user"]
+    """
+    Join the owner in the changelist query instead of one query per row.
+    """
+
+    search_fields = ["^title", "=user__email"]
+    """
+    Prefix search on the title (served by the `UPPER(title)` pattern index)
+    and case-insensitive exact match on the owner's email (`iexact`, served
+    by the `UPPER(email)` pattern index, not by the unique index).
+    """
+
+    raw_id_fields = ["user"]
+    autocomplete_fields = ["tags", "ingredients"]
+    """
+    Only the selected tags and ingredients are rendered; others are looked
+    up on demand through the autocomplete endpoint.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    """
+    Avoid `COUNT(*)` over the whole table on every changelist page.
+    """
+
+
+class TagAdmin(ChangeLogAdminMixin, admin.ModelAdmin):
+    """Define the admin interface for the Tag model."""
+
+    change_kind = Change.Kind.TAG
+    recipe_field = "tags"
+    list_display = ["name", "user"]
+    list_select_related = ["user"]
+    search_fields = ["^name"]
+    raw_id_fields = ["user"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class IngredientAdmin(ChangeLogAdminMixin, admin.ModelAdmin):
+    """Define the admin interface for the Ingredient model."""
+
+    change_kind = Change.Kind.INGREDIENT
+    recipe_field = "ingredients"
+    list_display = ["name", "user"]
+    list_select_related = ["user"]
+    search_fields = ["^name"]
+    raw_id_fields = ["user"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
 # Register the User model with the custom UserAdmin configuration
 admin.site.register(User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.Tag, TagAdmin)
+admin.site.register(models.Ingredient, IngredientAdmin)
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.core"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from apps.core.metrics import record_connection_created
+
+        connection_created.connect(record_connection_created)
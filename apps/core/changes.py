@@ -0,0 +1,167 @@
+"""
+Per-user change log for delta sync.
+
+Write paths call `record_changes` in the same transaction as the write.
+Every write path must: sync clients, the change stream and the in-memory
+recipe indexes (`apps.recipe.indexes`) only learn of writes from the log.
+It bumps the user's `ChangeSequence` and appends the `Change` entries in a
+single statement. The counter row stays locked until the transaction
+commits, so a user's sequence numbers become visible in increasing order:
+a client that has seen sequence number N never misses a change numbered
+below N.
+
+Every recorded batch is also published to the change stream (see
+`apps.core.events`), which delivers it when the transaction commits.
+
+`compact` keeps the log small: it drops entries superseded by a later
+entry for the same object, and tombstones older than the retention period,
+in bounded batches.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from apps.core.events import get_broker
+from apps.core.models import Change, ChangeSequence
+
+
+RECORD_SQL = f"""
+WITH counter AS (
+    INSERT INTO {ChangeSequence._meta.db_table} (user_id, last_seq, compacted_seq)
+    VALUES (%(user_id)s, %(count)s, 0)
+    ON CONFLICT (user_id) DO UPDATE
+    SET last_seq = {ChangeSequence._meta.db_table}.last_seq + EXCLUDED.last_seq
+    RETURNING last_seq
+)
+INSERT INTO {Change._meta.db_table} (user_id, seq, kind, object_id, deleted, changed_at)
+SELECT
+    %(user_id)s,
+    counter.last_seq - %(count)s + entry.ord,
+    entry.kind,
+    entry.object_id,
+    entry.deleted,
+    now()
+FROM counter,
+    unnest(%(kinds)s::varchar[], %(ids)s::bigint[], %(deleted)s::boolean[])
+    WITH ORDINALITY AS entry(kind, object_id, deleted, ord)
+RETURNING seq
+"""
+
+# Both delete at most %(limit)s of one user's entries; the user's part of
+# the log is found with the (user_id, seq) index.
+COMPACT_SUPERSEDED_SQL = f"""
+WITH purged AS (
+    DELETE FROM {Change._meta.db_table}
+    WHERE id IN (
+        SELECT id FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY kind, object_id ORDER BY seq DESC
+            ) AS newer
+            FROM {Change._meta.db_table}
+            WHERE user_id = %(user_id)s
+        ) ranked
+        WHERE newer > 1
+        LIMIT %(limit)s
+    )
+    RETURNING id
+)
+SELECT count(*) FROM purged
+"""
+
+COMPACT_TOMBSTONES_SQL = f"""
+WITH purged AS (
+    DELETE FROM {Change._meta.db_table}
+    WHERE id IN (
+        SELECT id FROM {Change._meta.db_table}
+        WHERE user_id = %(user_id)s
+            AND deleted
+            AND changed_at < now() - make_interval(days => %(days)s)
+        LIMIT %(limit)s
+    )
+    RETURNING seq
+), watermark AS (
+    UPDATE {ChangeSequence._meta.db_table}
+    SET compacted_seq = GREATEST(compacted_seq, (SELECT max(seq) FROM purged))
+    WHERE user_id = %(user_id)s AND EXISTS (SELECT 1 FROM purged)
+)
+SELECT count(*) FROM purged
+"""
+
+
+def record_changes(user_id, created=(), updated=(), deleted=()):
+    """
+    Append changes to ``user_id``'s log and publish them.
+
+    ``created``, ``updated`` and ``deleted`` are iterables of
+    ``(Change.Kind, object id)`` pairs. Call it inside the transaction that
+    made the changes, as its last statement: it locks the user's counter
+    row until the transaction ends.
+    """
+    entries = [
+        (kind, object_id, action)
+        for action, pairs in (
+            ("created", created),
+            ("updated", updated),
+            ("deleted", deleted),
+        )
+        for kind, object_id in pairs
+    ]
+    if not entries:
+        return
+    kinds, ids, actions = zip(*entries)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            RECORD_SQL,
+            {
+                "user_id": user_id,
+                "count": len(entries),
+                "kinds": [str(kind) for kind in kinds],
+                "ids": list(ids),
+                "deleted": [action == "deleted" for action in actions],
+            },
+        )
+        last_seq = max(seq for (seq,) in cursor.fetchall())
+    first_seq = last_seq - len(entries) + 1
+    get_broker().publish(
+        user_id,
+        [
+            (first_seq + n, str(kind), object_id, action)
+            for n, (kind, object_id, action) in enumerate(entries)
+        ],
+    )
+
+
+def compact(tombstone_days, batch_size=None):
+    """
+    Compact every user's change log.
+
+    Returns ``(superseded, tombstones)``: the number of entries removed
+    because a later entry names the same object, and the number of
+    tombstones removed for being older than ``tombstone_days``.
+
+    Users are compacted one at a time, deleting at most ``batch_size``
+    (default `settings.SYNC_COMPACT_BATCH_SIZE`) entries per transaction,
+    so locks are held briefly however large the log.
+    """
+    batch_size = batch_size or settings.SYNC_COMPACT_BATCH_SIZE
+    superseded = tombstones = 0
+    user_ids = ChangeSequence.objects.order_by("user_id").values_list(
+        "user_id", flat=True
+    )
+    for user_id in user_ids.iterator(chunk_size=batch_size):
+        params = {"user_id": user_id, "days": tombstone_days, "limit": batch_size}
+        superseded += _delete_batches(COMPACT_SUPERSEDED_SQL, params)
+        tombstones += _delete_batches(COMPACT_TOMBSTONES_SQL, params)
+    return superseded, tombstones
+
+
+def _delete_batches(sql, params):
+    """Run ``sql`` until it deletes less than a batch; returns the total."""
+    deleted = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            (count,) = cursor.fetchone()
+        deleted += count
+        if count < params["limit"]:
+            return deleted
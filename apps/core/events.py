@@ -0,0 +1,453 @@
+"""
+Per-user change notifications for the server-sent events stream.
+
+`record_changes` (see `apps.core.changes`) hands every logged change to
+the configured broker (`settings.EVENTS_BROKER`), which delivers it once
+the write's transaction commits:
+
+- `PostgresBroker` sends a `NOTIFY` in the write's transaction. Each worker
+  process holds one `LISTEN` connection, whatever the number of streams it
+  serves, and fans notifications out to its local subscribers.
+- `InMemoryBroker` fans out within the process only. It needs no database
+  connection, for tests and single-process development servers.
+
+Subscribers get a bounded queue. Publishing never waits for a slow client:
+when a queue is full its events are dropped and the subscriber is marked
+as overflowed, so the stream tells the client to catch up through the
+sync endpoint instead.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "bitesail_changes"
+# NOTIFY payloads must stay below 8000 bytes; larger batches are announced
+# without their entries.
+MAX_PAYLOAD_BYTES = 7000
+
+
+def make_event(user_id, entries):
+    """
+    Build the notification for one `record_changes` call.
+
+    ``entries`` are ``(seq, kind, object_id, action)`` tuples, with action
+    one of "created", "updated" or "deleted".
+    """
+    event = {
+        "user": user_id,
+        "from_seq": min(seq for seq, _, _, _ in entries),
+        "seq": max(seq for seq, _, _, _ in entries),
+        "changes": [
+            {"seq": seq, "kind": kind, "id": object_id, "action": action}
+            for seq, kind, object_id, action in entries
+        ],
+    }
+    if len(json.dumps(event)) > MAX_PAYLOAD_BYTES:
+        # Too many entries to list: clients fetch them with a sync.
+        event["changes"] = None
+    return event
+
+
+class Subscription:
+    """
+    One stream's queue of events.
+
+    Created and consumed on the event loop serving the stream; `put` may be
+    called from any thread.
+    """
+
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        """Queue ``event`` without blocking (from the subscription's loop)."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client is not keeping up: drop what is queued and have it
+            # resync instead of buffering without bound.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.overflowed = True
+            self.queue.put_nowait(None)
+
+    def put_threadsafe(self, event):
+        self.loop.call_soon_threadsafe(self.put, event)
+
+    async def get(self, timeout=None):
+        """
+        Return the next event, or None on timeout.
+
+        After an overflow, returns ``{"overflow": True}`` once.
+        """
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event is None and self.overflowed:
+            self.overflowed = False
+            return {"overflow": True}
+        return event
+
+
+class Hub:
+    """In-process fan-out from user ids to their subscriptions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def add(self, subscription):
+        with self._lock:
+            self._subscriptions[subscription.user_id].add(subscription)
+
+    def remove(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def deliver(self, event):
+        """Queue ``event`` for every subscription of its user."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(event["user"], ()))
+        for subscription in subscriptions:
+            subscription.put_threadsafe(event)
+
+    def broadcast(self, event):
+        """Queue ``event`` for every subscription (e.g. after lost messages)."""
+        with self._lock:
+            subscriptions = [s for group in self._subscriptions.values() for s in group]
+        for subscription in subscriptions:
+            subscription.put_threadsafe(event)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(group) for group in self._subscriptions.values())
+
+
+class InMemoryBroker:
+    """Deliver events to subscribers in this process, after commit."""
+
+    def __init__(self):
+        self.hub = Hub()
+
+    def publish(self, user_id, entries, using="default"):
+        event = make_event(user_id, entries)
+        transaction.on_commit(lambda: self.hub.deliver(event), using=using)
+
+    async def subscribe(self, user_id):
+        subscription = Subscription(user_id, settings.EVENTS_QUEUE_SIZE)
+        self.hub.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.hub.remove(subscription)
+
+
+class PostgresBroker(InMemoryBroker):
+    """
+    Deliver events through Postgres `LISTEN`/`NOTIFY`.
+
+    The notification is part of the write's transaction, so it reaches every
+    worker exactly when the change becomes visible, and never for a rolled
+    back write. The listener connection is opened on the first subscription
+    and reconnects with backoff; subscribers are told to resync after a
+    reconnect, since notifications sent meanwhile are lost.
+    """
+
+    def __init__(self, alias="default"):
+        super().__init__()
+        self.alias = alias
+        self._listener = None
+        self._ready = None
+
+    def publish(self, user_id, entries, using="default"):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)",
+                [CHANNEL, json.dumps(make_event(user_id, entries))],
+            )
+
+    async def subscribe(self, user_id):
+        subscription = await super().subscribe(user_id)
+        loop = asyncio.get_running_loop()
+        if (
+            self._listener is None
+            or self._listener.done()
+            or self._listener.get_loop() is not loop
+        ):
+            self._ready = asyncio.Event()
+            self._listener = loop.create_task(self.listen(self._ready))
+        try:
+            # Events published before LISTEN takes effect would be missed.
+            await asyncio.wait_for(self._ready.wait(), settings.EVENTS_CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Change listener is not connected yet.")
+        return subscription
+
+    def connection_params(self):
+        params = connections[self.alias].get_connection_params()
+        # Django-specific adapters are not needed to receive notifications.
+        for key in ("cursor_factory", "context", "prepare_threshold"):
+            params.pop(key, None)
+        return params
+
+    async def listen(self, ready):
+        """Receive notifications for this process until it exits."""
+        import psycopg
+
+        delay = 0.5
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    autocommit=True, **self.connection_params()
+                ) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    if ready.is_set():
+                        # Reconnected: anything sent meanwhile is lost.
+                        self.hub.broadcast({"overflow": True})
+                    ready.set()
+                    delay = 0.5
+                    async for notify in conn.notifies():
+                        self.hub.deliver(json.loads(notify.payload))
+            except psycopg.Error as exc:
+                logger.warning("Change listener disconnected: %s", exc)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured by `settings.EVENTS_BROKER`."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.EVENTS_BROKER)()
+        return _broker
+
+
+def reset_broker():
+    """Forget the broker, e.g. after changing `EVENTS_BROKER` in tests."""
+    global _broker
+    with _broker_lock:
+        _broker = None
+
+
+def format_sse(data=None, event=None, event_id=None, comment=None, retry=None):
+    """Encode one server-sent events message."""
+    lines = []
+    if comment is not None:
+        lines.append(f": {comment}")
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if data is not None:
+        lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+async def event_stream(user_id, cursor, latest_seq):
+    """
+    Yield a user's change notifications as server-sent events.
+
+    ``cursor`` is the last sequence number the client has seen and
+    ``latest_seq`` the user's latest one when the stream opened. A user's
+    sequence numbers are contiguous, so any gap (a missed notification, a
+    client that is behind, or an overflowed queue) is turned into a `sync`
+    event: the client then fetches the changes from the sync endpoint.
+    Heartbeat comments keep idle connections open through proxies.
+    """
+    subscription = await get_broker().subscribe(user_id)
+    deadline = time.monotonic() + settings.EVENTS_MAX_STREAM_SECONDS
+    try:
+        yield format_sse(comment="connected", retry=3000)
+        if cursor < latest_seq:
+            yield format_sse({"seq": latest_seq}, event="sync", event_id=latest_seq)
+            cursor = latest_seq
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            event = await subscription.get(
+                timeout=min(settings.EVENTS_HEARTBEAT_SECONDS, remaining)
+            )
+            if event is None:
+                yield format_sse(comment="keep-alive")
+            elif event.get("overflow"):
+                yield format_sse({"seq": None}, event="sync")
+            elif event["seq"] > cursor:
+                if event["from_seq"] > cursor + 1 or event["changes"] is None:
+                    yield format_sse(
+                        {"seq": event["seq"]}, event="sync", event_id=event["seq"]
+                    )
+                else:
+                    yield format_sse(
+                        {"seq": event["seq"], "changes": event["changes"]},
+                        event="change",
+                        event_id=event["seq"],
+                    )
+                cursor = event["seq"]
+    finally:
+        get_broker().unsubscribe(subscription)
+
+
+def authenticate(authorization):
+    """
+    Resolve an `Authorization: Token <key>` header to an active user's id.
+
+    Returns ``(user_id, latest_seq)``, or None for a missing or invalid
+    token. Runs in Django's shared sync thread (see `ChangeStreamApplication`).
+    """
+    from rest_framework.authtoken.models import Token
+
+    from apps.core.models import ChangeSequence
+
+    scheme, _, key = authorization.partition(" ")
+    if scheme.lower() != "token" or not key.strip():
+        return None
+    if not connections["default"].in_atomic_block:
+        # Nothing else recycles the shared thread's connection; inside a
+        # transaction (as in tests) it must be kept.
+        close_old_connections()
+    token = (
+        Token.objects.select_related("user")
+        .filter(key=key.strip(), user__is_active=True)
+        .first()
+    )
+    if token is None:
+        return None
+    latest_seq = (
+        ChangeSequence.objects.filter(user_id=token.user_id)
+        .values_list("last_seq", flat=True)
+        .first()
+    )
+    return token.user_id, latest_seq or 0
+
+
+class ChangeStreamApplication:
+    """
+    ASGI application serving the change stream in front of Django.
+
+    Requests for `settings.EVENTS_STREAM_PATH` are answered here; everything
+    else goes to ``app``. Going through Django's request handling would tie
+    up a thread per open stream (the sync middleware and views run in a
+    per-request thread that lives as long as the response); here a stream
+    is a coroutine and a small queue, and the token lookup borrows Django's
+    shared sync thread. So a worker holds thousands of idle streams, with
+    no database connection each.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == settings.EVENTS_STREAM_PATH:
+            await self.handle(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def handle(self, scope, receive, send):
+        headers = {
+            name.decode("latin-1").lower(): value.decode("latin-1")
+            for name, value in scope["headers"]
+        }
+        extra = []
+        origin = headers.get("origin")
+        if origin and origin in settings.CORS_ALLOWED_ORIGINS:
+            extra = [
+                (b"access-control-allow-origin", origin.encode("latin-1")),
+                (b"vary", b"origin"),
+            ]
+
+        if scope["method"] != "GET":
+            await self.respond(send, 405, {"detail": "Method not allowed."}, extra)
+            return
+        auth = await sync_to_async(authenticate)(headers.get("authorization", ""))
+        if auth is None:
+            await self.respond(
+                send,
+                401,
+                {"detail": "Invalid or missing token."},
+                extra + [(b"www-authenticate", b"Token")],
+            )
+            return
+        user_id, latest_seq = auth
+        try:
+            cursor = int(headers.get("last-event-id", latest_seq))
+        except ValueError:
+            cursor = 0
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": extra
+                + [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    # Stop nginx from buffering the stream.
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        stream = event_stream(user_id, cursor, latest_seq)
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            while True:
+                chunk = asyncio.ensure_future(anext(stream))
+                await asyncio.wait(
+                    {chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnected.done():
+                    chunk.cancel()
+                    # Let the generator unwind before it is closed below.
+                    await asyncio.wait({chunk})
+                    return
+                try:
+                    body = chunk.result()
+                except StopAsyncIteration:
+                    break
+                await send({"type": "http.response.body", "body": body, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            disconnected.cancel()
+            await stream.aclose()
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def respond(self, send, status, data, headers):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": headers + [(b"content-type", b"application/json")],
+            }
+        )
+        await send({"type": "http.response.body", "body": json.dumps(data).encode()})
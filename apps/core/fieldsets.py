@@ -0,0 +1,92 @@
+"""
+Sparse fieldsets: `?fields=id,title` on read endpoints.
+
+`SparseFieldsetMixin` (for viewsets) parses the requested fields and hands
+them to the serializer through its context; `SparseFieldsetSerializerMixin`
+drops every other field. The view also narrows its queryset to match with
+`select_fields`: relations that are not requested are not prefetched, and
+columns that are not requested are deferred, so a smaller payload also
+means less work in the database.
+"""
+
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+
+
+FIELDS_PARAM = "fields"
+
+
+def parse_fields(value, allowed):
+    """
+    Parse a comma-separated ``fields`` parameter.
+
+    Returns the requested names in the order given, or None when the
+    parameter is missing or empty (meaning "all fields"). Raises
+    `ValidationError` for names not in ``allowed``.
+    """
+    names = list(dict.fromkeys(name.strip() for name in (value or "").split(",")))
+    names = [name for name in names if name]
+    if not names:
+        return None
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValidationError(
+            {FIELDS_PARAM: [f"Unknown field(s): {', '.join(unknown)}."]}
+        )
+    return names
+
+
+class SparseFieldsetSerializerMixin:
+    """Render only the fields listed in ``context["fields"]``, if given."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get(FIELDS_PARAM)
+        if requested is not None:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """
+    Support `?fields=` on the read actions of a viewset.
+
+    The serializer class must use `SparseFieldsetSerializerMixin`, and
+    `get_queryset` should pass its queryset through `select_fields`.
+    Write actions always use every field.
+    """
+
+    sparse_fieldset_actions = ("list", "retrieve")
+
+    @cached_property
+    def requested_fields(self):
+        """The field names asked for, or None for all of them."""
+        if self.action not in self.sparse_fieldset_actions:
+            return None
+        return parse_fields(
+            self.request.query_params.get(FIELDS_PARAM),
+            self.get_serializer_class().Meta.fields,
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context[FIELDS_PARAM] = self.requested_fields
+        return context
+
+    def select_fields(self, queryset, prefetch=()):
+        """
+        Prefetch the ``prefetch`` relations and load the columns in use.
+
+        With `?fields=`, only requested relations are prefetched and only
+        the primary key and requested columns are loaded.
+        """
+        requested = self.requested_fields
+        if requested is None:
+            return queryset.prefetch_related(*prefetch)
+
+        # Serializer field names are assumed to be the model field names.
+        opts = queryset.model._meta
+        columns = {field.name for field in opts.concrete_fields}
+        return queryset.prefetch_related(
+            *[lookup for lookup in prefetch if lookup.split("__", 1)[0] in requested]
+        ).only(opts.pk.name, *[name for name in requested if name in columns])
@@ -0,0 +1,120 @@
+"""
+Database health checks for startup and orchestrator probes.
+
+Everything here runs plain SQL on a connection; no models are loaded or
+queried, so the checks are cheap enough to run many times a second.
+"""
+
+import threading
+
+from django.db import connections
+
+
+def ping(alias="default"):
+    """
+    Run `SELECT 1` on the current thread's connection for ``alias``.
+
+    Reuses the persistent connection, so frequent probes do not open a
+    connection each time. Raises `django.db.Error` if the database is down.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+
+def ping_new_connection(alias="default", connect_timeout=5):
+    """
+    Open a fresh DB-API connection for ``alias``, run `SELECT 1`, close it.
+
+    Bypasses Django's connection handling entirely, so a failed attempt
+    leaves no half-initialised connection behind. Raises
+    `django.db.OperationalError` if the database is unreachable.
+    """
+    connection = connections[alias]
+    params = connection.get_connection_params()
+    if connection.vendor == "postgresql":
+        params.setdefault("connect_timeout", max(1, int(connect_timeout)))
+    with connection.wrap_database_errors:
+        raw = connection.get_new_connection(params)
+        try:
+            with raw.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+        finally:
+            raw.close()
+
+
+_expected_migrations = None
+_expected_lock = threading.Lock()
+
+
+def _migrations_on_disk():
+    """
+    Return ``{(app, name): replaced keys}`` for every migration on disk.
+
+    Squashed migrations count as applied when all the migrations they
+    replace are. Loaded once per process.
+    """
+    global _expected_migrations
+    with _expected_lock:
+        if _expected_migrations is None:
+            from django.db.migrations.loader import MigrationLoader
+
+            loader = MigrationLoader(None, ignore_no_migrations=True)
+            _expected_migrations = {
+                key: set(migration.replaces)
+                for key, migration in loader.disk_migrations.items()
+            }
+    return _expected_migrations
+
+
+def pending_migrations(alias="default"):
+    """Return the sorted keys of migrations not yet applied to ``alias``."""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if "django_migrations" not in connection.introspection.table_names(cursor):
+            applied = set()
+        else:
+            cursor.execute("SELECT app, name FROM django_migrations")
+            applied = set(cursor.fetchall())
+    return sorted(
+        key
+        for key, replaces in _migrations_on_disk().items()
+        if key not in applied and not (replaces and replaces <= applied)
+    )
+
+
+class ReadinessCheck:
+    """
+    Readiness of this process to serve traffic.
+
+    Migrations are compared against the database until they have all been
+    applied once; after that only the connection is checked, since a
+    running deployment does not un-apply migrations.
+    """
+
+    def __init__(self):
+        self.migrated = False
+
+    def __call__(self, alias="default", check_migrations=True):
+        """Return ``(ready, details)``; details map each check to its result."""
+        details = {}
+        try:
+            ping(alias)
+            details["database"] = "ok"
+        except Exception as exc:  # Any failure means not ready.
+            details["database"] = f"unavailable: {exc.__class__.__name__}"
+            return False, details
+
+        if check_migrations and not self.migrated:
+            pending = pending_migrations(alias)
+            if pending:
+                details["migrations"] = f"{len(pending)} pending"
+                return False, details
+            self.migrated = True
+        if check_migrations:
+            details["migrations"] = "ok"
+        return True, details
+
+
+readiness = ReadinessCheck()
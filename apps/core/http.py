@@ -0,0 +1,98 @@
+"""
+HTTP helpers shared by views and middleware.
+"""
+
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available.
+    brotli = None
+
+
+def available_encodings():
+    """Return the content codings this server can produce, best first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def accepted_encodings(header):
+    """
+    Parse an `Accept-Encoding` header into ``{coding: qvalue}``.
+
+    Codings with ``q=0`` are kept (with a zero weight) so callers can tell
+    "explicitly refused" from "not mentioned".
+    """
+    encodings = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        qvalue = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+        encodings[coding] = qvalue
+    return encodings
+
+
+def choose_encoding(header, available):
+    """
+    Pick the best content coding from ``available`` for an `Accept-Encoding` header.
+
+    ``available`` is ordered by server preference (e.g. ``["br", "gzip"]``);
+    ties in client preference go to the earlier entry. Returns None when the
+    client accepts none of them, meaning the identity encoding should be used.
+    """
+    accepted = accepted_encodings(header or "")
+    best, best_q = None, 0.0
+    for coding in available:
+        qvalue = accepted.get(coding, accepted.get("*", 0.0))
+        if qvalue > best_q:
+            best, best_q = coding, qvalue
+    return best
+
+
+class StreamCompressor:
+    """
+    Incremental gzip or Brotli compressor.
+
+    `compress` buffers input inside the compressor; `flush` forces out what
+    has been compressed so far (so a streamed chunk reaches the client
+    without waiting for the next one), and `finish` ends the stream.
+    """
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == "gzip":
+            # wbits 16 + 15: a gzip header and trailer around a deflate stream.
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif encoding == "br" and brotli is not None:
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            raise ValueError(f"Unsupported content coding: {encoding}")
+
+    def compress(self, data):
+        if self.encoding == "gzip":
+            return self._compressor.compress(data)
+        return self._compressor.process(data)
+
+    def flush(self):
+        if self.encoding == "gzip":
+            return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return self._compressor.flush()
+
+    def finish(self):
+        if self.encoding == "gzip":
+            return self._compressor.flush(zlib.Z_FINISH)
+        return self._compressor.finish()
+
+
+def compress(data, encoding, level):
+    """Compress ``data`` in one go with ``encoding`` ("gzip" or "br")."""
+    compressor = StreamCompressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
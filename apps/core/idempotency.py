@@ -0,0 +1,180 @@
+"""
+`Idempotency-Key` support for retried writes.
+
+A client sends the same key with every retry of one logical request. The
+first request claims the key with a single unique insert, which commits
+before the write runs; the write and the storing of its response then
+commit together. Retries find the claim in the same round trip and
+either replay the stored response without running the write again, or
+get 409 while the first request is still running. So concurrent
+duplicates never both write, and a request that crashed mid-write leaves
+nothing behind but its claim, which is taken over after
+`settings.IDEMPOTENCY_LOCK_SECONDS`.
+
+Only successful responses are stored: a request that failed (validation
+errors included) releases its key so the client can retry it. Keys
+expire after `settings.IDEMPOTENCY_KEY_TTL_SECONDS`; expired keys can be
+claimed again straight away and are deleted by `purge_idempotency_keys`.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from apps.core.models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+CLAIM_SQL = f"""
+WITH claimed AS (
+    INSERT INTO {IdempotencyKey._meta.db_table} AS existing
+        (user_id, key, fingerprint, created_at)
+    VALUES (%(user_id)s, %(key)s, %(fingerprint)s, now())
+    ON CONFLICT (user_id, key) DO UPDATE
+    SET fingerprint = EXCLUDED.fingerprint,
+        created_at = EXCLUDED.created_at,
+        status_code = NULL,
+        response = NULL
+    WHERE existing.created_at < now() - make_interval(secs => %(ttl)s)
+        OR (
+            existing.status_code IS NULL
+            AND existing.created_at < now() - make_interval(secs => %(lock)s)
+        )
+    RETURNING id
+)
+SELECT id, NULL, NULL, NULL FROM claimed
+UNION ALL
+SELECT NULL, fingerprint, status_code, response
+FROM {IdempotencyKey._meta.db_table}
+WHERE user_id = %(user_id)s AND key = %(key)s AND NOT EXISTS (SELECT FROM claimed)
+"""
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still in progress."
+    default_code = "idempotency_key_in_use"
+    # Sent as `Retry-After` by DRF's exception handler.
+    wait = 1
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was used for a different request."
+    default_code = "idempotency_key_reused"
+
+
+def fingerprint(request):
+    """Return a SHA-256 digest of the request's method, path and data."""
+    data = request.data
+    if hasattr(data, "lists"):
+        data = dict(data.lists())
+    payload = json.dumps(
+        [request.method, request.path, data], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).digest()
+
+
+def claim(user_id, key, digest):
+    """
+    Claim ``key`` for ``user_id``'s request with the given fingerprint.
+
+    Returns ``(claim_id, None)`` when the key is now ours, or
+    ``(None, (fingerprint, status_code, response))`` for the existing
+    claim; ``status_code`` is None while that request is still running.
+    An existing claim invisible to this statement (committed while it ran)
+    is reported as running.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            CLAIM_SQL,
+            {
+                "user_id": user_id,
+                "key": key,
+                "fingerprint": digest,
+                "ttl": settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+                "lock": settings.IDEMPOTENCY_LOCK_SECONDS,
+            },
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None, (digest, None, None)
+    claim_id, stored_digest, status_code, response = row
+    if claim_id is not None:
+        return claim_id, None
+    if isinstance(response, str):
+        response = json.loads(response)
+    return None, (bytes(stored_digest), status_code, response)
+
+
+def purge_expired():
+    """Delete expired keys; returns how many were deleted."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {IdempotencyKey._meta.db_table} "
+            "WHERE created_at < now() - make_interval(secs => %s)",
+            [settings.IDEMPOTENCY_KEY_TTL_SECONDS],
+        )
+        return cursor.rowcount
+
+
+class IdempotentMixin:
+    """
+    Honour `Idempotency-Key` on the create and update actions of a viewset.
+
+    Requests without the header are handled as usual. Replayed responses
+    carry an `Idempotent-Replayed: true` header.
+    """
+
+    def create(self, request, *args, **kwargs):
+        return self.idempotent(super().create, request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        return self.idempotent(super().update, request, *args, **kwargs)
+
+    def idempotent(self, handler, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return handler(request, *args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            raise ValidationError(
+                {HEADER: ["Must be between 1 and 255 characters long."]}
+            )
+
+        digest = fingerprint(request)
+        claim_id, existing = claim(request.user.id, key, digest)
+        if claim_id is None:
+            stored_digest, status_code, response = existing
+            if stored_digest != digest:
+                raise IdempotencyKeyReused()
+            if status_code is None:
+                raise IdempotencyKeyInUse()
+            return Response(
+                response, status=status_code, headers={REPLAYED_HEADER: "true"}
+            )
+
+        try:
+            with transaction.atomic():
+                response = handler(request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    IdempotencyKey.objects.filter(id=claim_id).update(
+                        status_code=response.status_code, response=response.data
+                    )
+        except BaseException:
+            self.release(claim_id)
+            raise
+        if not status.is_success(response.status_code):
+            self.release(claim_id)
+        return response
+
+    def release(self, claim_id):
+        """Free a key whose request failed, so that it can be retried."""
+        IdempotencyKey.objects.filter(id=claim_id).delete()
@@ -0,0 +1,123 @@
+"""
+Per-request instrumentation: SQL query counts, DB time and serializer time.
+
+`RequestStats` collects the numbers for one request. The middleware in
+`apps.core.middleware` creates it, installs `QueryCounter` as a database
+execute wrapper and publishes the stats through a context variable, so
+code running inside the request (such as `TimedSerializerMixin`) can add
+to them without having the request object at hand.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_current_stats = ContextVar("request_stats", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a view runs more SQL queries than its configured budget."""
+
+
+class RequestStats:
+    """Numbers collected for a single request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.total_time = 0.0
+        self._serializer_depth = 0
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+        return self
+
+    def server_timing(self):
+        """Format the stats as a `Server-Timing` header value (milliseconds)."""
+        return ", ".join(
+            [
+                f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+                f"serializer;dur={self.serializer_time * 1000:.2f}",
+                f"total;dur={self.total_time * 1000:.2f}",
+            ]
+        )
+
+
+class QueryCounter:
+    """Database execute wrapper that counts queries and the time spent in them."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.stats.queries += 1
+            self.stats.db_time += time.perf_counter() - start
+
+
+def get_current_stats():
+    """Return the `RequestStats` of the request being handled, if any."""
+    return _current_stats.get()
+
+
+@contextmanager
+def collect(stats):
+    """Publish ``stats`` as the current request's stats for the block."""
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin that adds `to_representation` time to the request stats.
+
+    Only the outermost serializer is timed, so nested serializers (tags inside
+    a recipe) are not counted twice. Lazy related-object queries triggered
+    while serializing are included in both DB and serializer time, which is
+    exactly what makes N+1 problems visible here.
+    """
+
+    def to_representation(self, instance):
+        stats = _current_stats.get()
+        if stats is None:
+            return super().to_representation(instance)
+
+        stats._serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats._serializer_depth -= 1
+            if stats._serializer_depth == 0:
+                stats.serializer_time += time.perf_counter() - start
+
+
+def endpoint_name(request, match=None):
+    """
+    Return a stable name for the view that handled ``request``.
+
+    DRF views are named `<ViewClass>.<action>` (e.g. `RecipeViewSet.list`),
+    or `<ViewClass>.<method>` for plain API views; anything else falls back
+    to the URL pattern's view name. ``match`` can be passed to name a request
+    before URL resolution has attached `request.resolver_match`.
+    """
+    match = match or getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+
+    view_cls = getattr(match.func, "cls", None)
+    if view_cls is None:
+        return match.view_name or "unresolved"
+
+    actions = getattr(match.func, "actions", None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f"{view_cls.__name__}.{action}"
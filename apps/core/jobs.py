@@ -0,0 +1,235 @@
+"""
+Background jobs stored in Postgres.
+
+Tasks are plain functions registered with `task` in an app's ``tasks``
+module; `enqueue` inserts a `Job` row in the caller's transaction, so a job
+exists exactly when the write that asked for it commits.
+
+`Worker` (run by `manage.py run_worker`) claims due jobs with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of workers share the
+queue without blocking each other or running a job twice, and runs them on
+a pool of threads. A job that raises is queued again after an exponential,
+jittered backoff until it has been tried ``max_attempts`` times. A job
+whose worker died is taken back after `settings.JOBS_LEASE_SECONDS`, so
+tasks must be safe to run again and should finish well within the lease.
+"""
+
+import json
+import logging
+import random
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from apps.core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+_discovered = False
+_discover_lock = threading.Lock()
+
+CLAIM_SQL = f"""
+UPDATE {Job._meta.db_table}
+SET status = 'running', started_at = clock_timestamp(), attempts = attempts + 1
+WHERE id IN (
+    SELECT id FROM {Job._meta.db_table}
+    WHERE status = 'queued' AND run_at <= clock_timestamp()
+    ORDER BY run_at, id
+    FOR UPDATE SKIP LOCKED
+    LIMIT %s
+)
+RETURNING id, name, kwargs, attempts, max_attempts
+"""
+
+# Jobs still running a whole lease after they started have lost their
+# worker: retry them, or fail them if that was their last attempt.
+REQUEUE_LOST_SQL = f"""
+UPDATE {Job._meta.db_table}
+SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+    run_at = clock_timestamp(),
+    finished_at = CASE WHEN attempts >= max_attempts THEN clock_timestamp() END,
+    error = 'The worker running this job stopped.'
+WHERE status = 'running'
+    AND started_at < clock_timestamp() - make_interval(secs => %s)
+"""
+
+
+def task(name):
+    """Register the decorated function as the task ``name``."""
+
+    def register(func):
+        _tasks[name] = func
+        return func
+
+    return register
+
+
+def get_task(name):
+    """Return the function registered as ``name``."""
+    global _discovered
+    if not _discovered:
+        with _discover_lock:
+            autodiscover_modules("tasks")
+            _discovered = True
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise LookupError(f"No task named {name!r}.") from None
+
+
+def enqueue(name, *, user_id=None, run_at=None, max_attempts=None, **kwargs):
+    """
+    Queue the task ``name`` to be called with ``kwargs``.
+
+    ``kwargs`` must be JSON-serializable. ``user_id`` is the user who can
+    see the job's status. The job is saved in the current transaction.
+    Returns the `Job`.
+    """
+    get_task(name)
+    return Job.objects.create(
+        name=name,
+        kwargs=kwargs,
+        user_id=user_id,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a job that failed ``attempts`` times."""
+    delay = min(
+        settings.JOBS_BACKOFF_SECONDS * 2 ** (attempts - 1),
+        settings.JOBS_BACKOFF_MAX_SECONDS,
+    )
+    # Jitter spreads out retries of jobs that failed together.
+    return delay * random.uniform(0.5, 1)
+
+
+def claim(limit):
+    """Mark up to ``limit`` due jobs as running; returns their rows."""
+    with connection.cursor() as cursor:
+        cursor.execute(CLAIM_SQL, [limit])
+        rows = cursor.fetchall()
+    return [
+        (job_id, name, _json(kwargs), attempts, max_attempts)
+        for job_id, name, kwargs, attempts, max_attempts in rows
+    ]
+
+
+def requeue_lost():
+    """Retry (or fail) running jobs whose lease expired; returns how many."""
+    with connection.cursor() as cursor:
+        cursor.execute(REQUEUE_LOST_SQL, [settings.JOBS_LEASE_SECONDS])
+        return cursor.rowcount
+
+
+def delete_finished(days):
+    """Delete jobs that finished more than ``days`` days ago."""
+    cutoff = timezone.now() - timedelta(days=days)
+    count, _ = Job.objects.filter(
+        status__in=[Job.Status.SUCCEEDED, Job.Status.FAILED], finished_at__lt=cutoff
+    ).delete()
+    return count
+
+
+def execute(job_id, name, kwargs, attempts, max_attempts):
+    """Run one claimed job and record its outcome. Returns the new status."""
+    _recycle_connection()
+    try:
+        result = get_task(name)(**kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if attempts < max_attempts:
+            status = Job.Status.QUEUED
+            Job.objects.filter(id=job_id).update(
+                status=status,
+                run_at=timezone.now() + timedelta(seconds=backoff(attempts)),
+                error=error,
+            )
+        else:
+            status = Job.Status.FAILED
+            Job.objects.filter(id=job_id).update(
+                status=status, finished_at=timezone.now(), error=error
+            )
+        logger.warning("Job %s (%s) attempt %s failed.", job_id, name, attempts)
+    else:
+        status = Job.Status.SUCCEEDED
+        Job.objects.filter(id=job_id).update(
+            status=status, finished_at=timezone.now(), result=result, error=""
+        )
+    finally:
+        _recycle_connection()
+    return status
+
+
+class Worker:
+    """
+    Run jobs on ``concurrency`` threads until stopped.
+
+    Each thread claims and runs one job at a time on its own database
+    connection; the calling thread requeues lost jobs and deletes old ones.
+    """
+
+    def __init__(self, concurrency=None, poll_seconds=None):
+        self.concurrency = concurrency or settings.JOBS_CONCURRENCY
+        self.poll_seconds = (
+            settings.JOBS_POLL_SECONDS if poll_seconds is None else poll_seconds
+        )
+        self.stop = threading.Event()
+        self.processed = 0
+        self._lock = threading.Lock()
+
+    def run(self, until_empty=False):
+        """
+        Run jobs until `stop` is set, finishing those already started.
+
+        With ``until_empty``, return once no job is due.
+        """
+        threads = [
+            threading.Thread(target=self.work, args=[until_empty], name=f"job-{n}")
+            for n in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            requeue_lost()
+            delete_finished(settings.JOBS_RETENTION_DAYS)
+            for thread in threads:
+                thread.join(timeout=60)
+                if thread.is_alive():
+                    break
+
+    def work(self, until_empty):
+        try:
+            while not self.stop.is_set():
+                claimed = claim(1)
+                if not claimed:
+                    if until_empty:
+                        return
+                    self.stop.wait(self.poll_seconds)
+                    _recycle_connection()
+                    continue
+                execute(*claimed[0])
+                with self._lock:
+                    self.processed += 1
+        finally:
+            connections.close_all()
+
+
+def _recycle_connection():
+    # Like around a request: drop the thread's connection if it broke or
+    # reached CONN_MAX_AGE. Inside a transaction (as in tests) it is kept.
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+def _json(value):
+    # Raw queries return jsonb as text.
+    return json.loads(value) if isinstance(value, str) else value
@@ -0,0 +1,47 @@
+"""
+Django command to precompute the OpenAPI schema artifact.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core import schema
+
+
+class Command(BaseCommand):
+    """Django command to build the versioned, pre-compressed OpenAPI schema."""
+
+    help = "Generate the OpenAPI schema once and store it for /api/schema/."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output-dir",
+            help="Directory for the artifact (defaults to SCHEMA_CACHE_DIR).",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild even if an artifact for the current code exists.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        directory = str(options["output_dir"] or settings.SCHEMA_CACHE_DIR)
+        version = schema.code_fingerprint()
+
+        if not options["force"] and schema.load(directory, version):
+            self.stdout.write(f"Schema {version} is up to date.")
+            return
+
+        artifact = schema.build(directory, version)
+        schema.clear()
+        sizes = ", ".join(
+            f"{fmt}: {len(bodies['identity'])}B"
+            + "".join(
+                f" / {encoding} {len(body)}B"
+                for encoding, body in bodies.items()
+                if encoding != "identity"
+            )
+            for fmt, bodies in artifact.bodies.items()
+        )
+        self.stdout.write(self.style.SUCCESS(f"Built schema {version} ({sizes})."))
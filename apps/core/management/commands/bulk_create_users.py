@@ -0,0 +1,217 @@
+"""
+Django command to provision many users at once.
+
+Password hashing is CPU bound (PBKDF2 runs hundreds of thousands of
+iterations per user), so it is spread across a process pool while the
+parent process inserts finished batches with ``bulk_create``.
+"""
+
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+
+def _init_worker():
+    """Make sure Django is configured inside pool worker processes."""
+    import django
+
+    django.setup()
+
+
+def hash_passwords(passwords):
+    """Hash a batch of raw passwords, each with its own random salt."""
+    return [make_password(password) for password in passwords]
+
+
+def _generate_rows(count, start, email_template, name_template, password):
+    """Yield ``(email, name, password)`` rows for synthetic users."""
+    for n in range(start, start + count):
+        yield (
+            email_template.format(n=n),
+            name_template.format(n=n),
+            password,
+        )
+
+
+def _read_csv_rows(path):
+    """Yield ``(email, name, password)`` rows from a CSV file with a header."""
+    with open(path, newline="", encoding="utf-8") as fh:
+        for row in csv.DictReader(fh):
+            yield (row["email"], row.get("name", ""), row["password"])
+
+
+def _batched(rows, size):
+    """Group an iterable of rows into lists of at most ``size`` items."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    """Django command to create users in bulk."""
+
+    help = (
+        "Create many users at once, hashing passwords in parallel and "
+        "inserting them in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=1000,
+            help="Number of synthetic users to create (ignored with --csv).",
+        )
+        parser.add_argument(
+            "--start",
+            type=int,
+            default=0,
+            help="First sequence number used in the email/name templates.",
+        )
+        parser.add_argument(
+            "--email-template",
+            default="user{n}@example.com",
+            help="Email template for synthetic users; `{n}` is the sequence number.",
+        )
+        parser.add_argument(
+            "--name-template",
+            default="User {n}",
+            help="Name template for synthetic users; `{n}` is the sequence number.",
+        )
+        parser.add_argument(
+            "--password",
+            default="Pass!2024",
+            help="Password given to every synthetic user.",
+        )
+        parser.add_argument(
+            "--csv",
+            dest="csv_path",
+            help="Read users from a CSV file with `email`, `name`, `password` columns.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of users hashed and inserted per batch.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Hashing processes; 1 hashes in the current process.",
+        )
+        parser.add_argument(
+            "--tokens",
+            action="store_true",
+            help="Also issue an auth token for every created user.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        batch_size = options["batch_size"]
+        workers = options["workers"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if workers < 1:
+            raise CommandError("--workers must be at least 1.")
+
+        if options["csv_path"]:
+            rows = _read_csv_rows(options["csv_path"])
+        else:
+            if not options["password"]:
+                raise CommandError("A password must be set for regular users.")
+            rows = _generate_rows(
+                options["count"],
+                options["start"],
+                options["email_template"],
+                options["name_template"],
+                options["password"],
+            )
+
+        self.stats = {"created": 0, "skipped": 0, "tokens": 0, "insert_time": 0.0}
+        started = time.perf_counter()
+
+        batches = _batched(rows, batch_size)
+        if workers == 1:
+            for batch in batches:
+                hashed = hash_passwords([row[2] for row in batch])
+                self._insert_batch(batch, hashed, options["tokens"])
+        else:
+            self._run_pool(batches, workers, options["tokens"])
+
+        elapsed = time.perf_counter() - started
+        created = self.stats["created"]
+        rate = created / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"Skipped {self.stats['skipped']} existing users; "
+            f"issued {self.stats['tokens']} tokens; "
+            f"spent {self.stats['insert_time']:.2f}s inserting."
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {created} users in {elapsed:.2f}s ({rate:.1f} users/s)."
+            )
+        )
+
+    def _run_pool(self, batches, workers, with_tokens):
+        """
+        Hash batches in a process pool and insert them as they complete.
+
+        At most ``2 * workers`` batches are in flight, so memory stays bounded
+        regardless of how many users are being created.
+        """
+        pending = []
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker
+        ) as executor:
+            for batch in batches:
+                future = executor.submit(hash_passwords, [row[2] for row in batch])
+                pending.append((batch, future))
+                if len(pending) >= 2 * workers:
+                    done_batch, done_future = pending.pop(0)
+                    self._insert_batch(done_batch, done_future.result(), with_tokens)
+            for done_batch, done_future in pending:
+                self._insert_batch(done_batch, done_future.result(), with_tokens)
+
+    def _insert_batch(self, batch, hashed_passwords, with_tokens):
+        """Insert one batch of users (and tokens), skipping existing emails."""
+        started = time.perf_counter()
+        User = get_user_model()
+
+        users = []
+        seen = set()
+        for (email, name, _), password in zip(batch, hashed_passwords):
+            email = User.objects.normalize_email(email)
+            if email in seen:
+                continue
+            seen.add(email)
+            users.append(User(email=email, name=name, password=password))
+
+        existing = set(
+            User.objects.filter(email__in=seen).values_list("email", flat=True)
+        )
+        users = [user for user in users if user.email not in existing]
+        self.stats["skipped"] += len(batch) - len(users)
+
+        with transaction.atomic():
+            created = User.objects.bulk_create(users)
+            if with_tokens:
+                tokens = Token.objects.bulk_create(
+                    Token(user=user, key=Token.generate_key()) for user in created
+                )
+                self.stats["tokens"] += len(tokens)
+
+        self.stats["created"] += len(created)
+        self.stats["insert_time"] += time.perf_counter() - started
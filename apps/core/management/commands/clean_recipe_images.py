@@ -0,0 +1,30 @@
+"""
+Django command to delete image files of deleted recipes.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.recipe import images
+
+
+class Command(BaseCommand):
+    """Django command to delete recipe images no recipe refers to."""
+
+    help = (
+        "Delete uploaded recipe images and thumbnails that no recipe refers "
+        "to any more (e.g. of deleted recipes). Run it periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age-hours",
+            type=float,
+            default=1,
+            help="Keep files younger than this, whose upload may still be "
+            "in progress.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        count = images.delete_orphans(options["min_age_hours"] * 3600)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} image files."))
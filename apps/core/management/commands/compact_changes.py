@@ -0,0 +1,37 @@
+"""
+Django command to compact the sync change log.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core import changes
+
+
+class Command(BaseCommand):
+    """Django command to remove superseded change log entries and old tombstones."""
+
+    help = (
+        "Remove change log entries superseded by a later change to the same "
+        "object, and tombstones older than the retention period. Run it "
+        "periodically (e.g. daily from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tombstone-days",
+            type=int,
+            default=settings.SYNC_TOMBSTONE_RETENTION_DAYS,
+            help="Keep tombstones for this many days "
+            "(defaults to SYNC_TOMBSTONE_RETENTION_DAYS).",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        superseded, tombstones = changes.compact(options["tombstone_days"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Removed {superseded} superseded entries and {tombstones} "
+                "expired tombstones."
+            )
+        )
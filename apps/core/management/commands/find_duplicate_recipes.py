@@ -0,0 +1,83 @@
+"""
+Django command to report, and optionally merge, near-duplicate recipes.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.core.models import Recipe
+from apps.recipe import duplicates
+
+
+class Command(BaseCommand):
+    """Django command to find each user's near-duplicate recipes."""
+
+    help = (
+        "List clusters of near-duplicate recipes (similar titles and "
+        "ingredients) in each user's catalog, using MinHash signatures. "
+        "With --merge, merge each cluster into its oldest recipe."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            dest="emails",
+            action="append",
+            default=[],
+            help="Only check the recipes of the user with this email "
+            "(may be repeated).",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=settings.DUPLICATES_THRESHOLD,
+            help="Smallest estimated similarity, from 0 to 1, of duplicates "
+            "(defaults to DUPLICATES_THRESHOLD).",
+        )
+        parser.add_argument(
+            "--merge",
+            action="store_true",
+            help="Merge each cluster into its oldest recipe, which gets the "
+            "tags and ingredients of the others; the others are deleted. "
+            "Recipes of a cluster less alike the oldest one than the "
+            "threshold are listed and left alone.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        users = get_user_model().objects.filter(
+            id__in=Recipe.objects.values("user_id")
+        ).order_by("id")
+        if options["emails"]:
+            users = users.filter(email__in=options["emails"])
+        clusters = recipes = 0
+        for user in users.iterator():
+            for cluster in duplicates.find_clusters(user.id, options["threshold"]):
+                titles = dict(
+                    Recipe.objects.filter(id__in=cluster).values_list("id", "title")
+                )
+                listed = ", ".join(f"{pk} ({titles.get(pk, '?')})" for pk in cluster)
+                self.stdout.write(f"{user.email}: {listed}")
+                if not options["merge"]:
+                    clusters += 1
+                    recipes += len(cluster)
+                    continue
+                kept, merged, left = duplicates.merge(
+                    user.id, cluster, options["threshold"]
+                )
+                if merged:
+                    clusters += 1
+                    recipes += 1 + len(merged)
+                    self.stdout.write(
+                        f"  merged {', '.join(map(str, merged))} into {kept}"
+                    )
+                if left:
+                    self.stdout.write(
+                        f"  left {', '.join(map(str, left))}: "
+                        f"less alike {kept} than the threshold"
+                    )
+        verb = "Merged" if options["merge"] else "Found"
+        self.stdout.write(
+            self.style.SUCCESS(f"{verb} {clusters} clusters of {recipes} recipes.")
+        )
@@ -0,0 +1,21 @@
+"""
+Django command to delete expired idempotency keys.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.core import idempotency
+
+
+class Command(BaseCommand):
+    """Django command to delete idempotency keys older than their TTL."""
+
+    help = (
+        "Delete idempotency keys older than IDEMPOTENCY_KEY_TTL_SECONDS. Run it "
+        "periodically (e.g. hourly from cron)."
+    )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        purged = idempotency.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {purged} expired keys."))
@@ -0,0 +1,50 @@
+"""
+Django command to run queued account and bulk deletions.
+
+Purges normally run as jobs on `manage.py run_worker`; this command runs
+any that are pending without one, e.g. queued before the job worker ran
+them or left behind when their job failed for good.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.core import purge
+
+
+class Command(BaseCommand):
+    """Django command to run the background purge worker."""
+
+    help = (
+        "Delete deactivated accounts and bulk-deleted objects in batches. "
+        "Runs until interrupted, polling every PURGE_POLL_SECONDS; several "
+        "workers can run side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the pending purges, then exit (e.g. from cron).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.PURGE_BATCH_SIZE,
+            help="Rows deleted per transaction (defaults to PURGE_BATCH_SIZE).",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        while True:
+            count = purge.run_pending(options["batch_size"])
+            if count:
+                self.stdout.write(self.style.SUCCESS(f"Ran {count} purges."))
+            if options["once"]:
+                return
+            time.sleep(settings.PURGE_POLL_SECONDS)
+            # Reconnect if the database went away while idle.
+            close_old_connections()
@@ -0,0 +1,93 @@
+"""
+Django command to run background jobs.
+"""
+
+import os
+import signal
+import traceback
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.core.jobs import Worker
+
+
+class Command(BaseCommand):
+    """Django command to run the background job worker."""
+
+    help = (
+        "Run queued background jobs until interrupted. Jobs are claimed with "
+        "SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers can run "
+        "side by side. SIGTERM stops claiming and waits for running jobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOBS_CONCURRENCY,
+            help="Jobs run at once per process, in threads "
+            "(defaults to JOBS_CONCURRENCY).",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Worker processes to fork, for CPU-bound tasks.",
+        )
+        parser.add_argument(
+            "--until-empty",
+            action="store_true",
+            help="Exit once no job is due (e.g. from cron or in CI).",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options["processes"] <= 1:
+            processed = self.work(options)
+            self.stdout.write(self.style.SUCCESS(f"Ran {processed} jobs."))
+            return
+
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        children = []
+        for _ in range(options["processes"]):
+            pid = os.fork()
+            if pid == 0:
+                code = 0
+                try:
+                    self.work(options)
+                except Exception:
+                    traceback.print_exc()
+                    code = 1
+                finally:
+                    os._exit(code)
+            children.append(pid)
+
+        def forward(signum, frame):
+            for pid in children:
+                os.kill(pid, signum)
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for pid in children:
+            os.waitpid(pid, 0)
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
+
+    def work(self, options):
+        worker = Worker(concurrency=options["concurrency"])
+
+        def stop(signum, frame):
+            worker.stop.set()
+
+        handlers = {
+            signum: signal.signal(signum, stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            worker.run(until_empty=options["until_empty"])
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        return worker.processed
@@ -0,0 +1,278 @@
+"""
+Django command to generate a deterministic, production-shaped dataset.
+
+Catalog sizes follow a heavy-tailed (Pareto) distribution, so most users
+own a few recipes and a handful own thousands, and tags/ingredients are
+picked with Zipfian skew, so a few names ("Dinner", "Salt") are reused
+everywhere while the long tail is rare. Everything is written with
+``bulk_create`` and is reproducible for a given ``--seed``.
+"""
+
+import bisect
+import itertools
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from apps.core.models import Ingredient, Recipe, Tag
+
+
+TAG_WORDS = [
+    "Dinner", "Lunch", "Breakfast", "Vegan", "Vegetarian", "Quick", "Dessert",
+    "Indian", "Thai", "Italian", "Mexican", "Healthy", "Spicy", "Snack",
+    "Soup", "Salad", "Baking", "Grill", "Budget", "Festive",
+]
+
+INGREDIENT_WORDS = [
+    "Salt", "Pepper", "Onion", "Garlic", "Olive Oil", "Butter", "Tomato",
+    "Flour", "Sugar", "Egg", "Milk", "Rice", "Chicken", "Lemon", "Ginger",
+    "Potato", "Cumin", "Basil", "Cheese", "Chili", "Coriander", "Carrot",
+    "Yogurt", "Paneer", "Spinach", "Mushroom", "Beans", "Coconut", "Honey",
+]
+
+TITLE_WORDS = [
+    "Classic", "Spicy", "Creamy", "Roasted", "Grilled", "Quick", "Smoky",
+    "Crispy", "Golden", "Hearty", "Fresh", "Curry", "Stew", "Pasta",
+    "Bowl", "Bake", "Salad", "Soup", "Wrap", "Pie", "Tacos", "Risotto",
+]
+
+
+class ZipfSampler:
+    """Sample ranks ``0..n-1`` with probability proportional to ``1 / (rank + 1) ** s``."""
+
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        weights = [1 / (rank + 1) ** s for rank in range(n)]
+        self.cumulative = list(itertools.accumulate(weights))
+
+    def sample(self):
+        point = self.rng.random() * self.cumulative[-1]
+        return bisect.bisect_left(self.cumulative, point)
+
+    def sample_unique(self, k):
+        """Sample up to ``k`` distinct ranks."""
+        k = min(k, len(self.cumulative))
+        picked = set()
+        while len(picked) < k:
+            picked.add(self.sample())
+        return sorted(picked)
+
+
+def vocabulary(words, size):
+    """Return ``size`` distinct names, most common (lowest rank) first."""
+    names = list(words[:size])
+    n = 2
+    while len(names) < size:
+        names.extend(f"{word} {n}" for word in words[: size - len(names)])
+        n += 1
+    return names
+
+
+def heavy_tail(rng, mean, alpha, cap):
+    """Draw a Pareto-distributed count with the given mean, capped at ``cap``."""
+    scale = mean * (alpha - 1) / alpha
+    return max(0, min(cap, int(scale * rng.paretovariate(alpha))))
+
+
+class Command(BaseCommand):
+    """Django command to seed a synthetic performance dataset."""
+
+    help = (
+        "Generate deterministic users, tags, ingredients and recipes with a "
+        "realistic, skewed distribution for load testing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument(
+            "--recipes-per-user",
+            type=float,
+            default=50,
+            help="Mean number of recipes per user (Pareto distributed).",
+        )
+        parser.add_argument(
+            "--max-recipes-per-user",
+            type=int,
+            default=10000,
+            help="Cap on the number of recipes for a single user.",
+        )
+        parser.add_argument(
+            "--tags-per-user",
+            type=int,
+            default=30,
+            help="Size of each user's tag vocabulary.",
+        )
+        parser.add_argument(
+            "--ingredients-per-user",
+            type=int,
+            default=200,
+            help="Size of each user's ingredient vocabulary.",
+        )
+        parser.add_argument(
+            "--alpha",
+            type=float,
+            default=1.5,
+            help="Pareto shape for catalog sizes; lower means a heavier tail.",
+        )
+        parser.add_argument(
+            "--zipf",
+            type=float,
+            default=1.1,
+            help="Zipf exponent for tag and ingredient reuse.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--email-template",
+            default="perf{n}@example.com",
+            help="Email template for seeded users; `{n}` is the sequence number.",
+        )
+        parser.add_argument("--password", default="Pass!2024")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options["alpha"] <= 1:
+            raise CommandError("--alpha must be greater than 1.")
+        if options["tags_per_user"] < 1:
+            raise CommandError("--tags-per-user must be at least 1.")
+        if options["ingredients_per_user"] < 1:
+            raise CommandError("--ingredients-per-user must be at least 1.")
+
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+        started = time.perf_counter()
+
+        tag_names = vocabulary(TAG_WORDS, options["tags_per_user"])
+        ingredient_names = vocabulary(INGREDIENT_WORDS, options["ingredients_per_user"])
+        tag_sampler = ZipfSampler(len(tag_names), options["zipf"], rng)
+        ingredient_sampler = ZipfSampler(len(ingredient_names), options["zipf"], rng)
+
+        with transaction.atomic():
+            users = self._create_users(options, rng, batch_size)
+            tags = self._create_vocabulary(Tag, users, tag_names, batch_size)
+            ingredients = self._create_vocabulary(
+                Ingredient, users, ingredient_names, batch_size
+            )
+            counts = self._create_recipes(
+                options,
+                rng,
+                users,
+                tags,
+                ingredients,
+                tag_sampler,
+                ingredient_sampler,
+                batch_size,
+            )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {len(users)} users, {len(users) * len(tag_names)} tags, "
+                f"{len(users) * len(ingredient_names)} ingredients, "
+                f"{counts['recipes']} recipes and {counts['links']} M2M links "
+                f"in {elapsed:.2f}s."
+            )
+        )
+
+    def _create_users(self, options, rng, batch_size):
+        """Create users and their auth tokens; one password hash is shared."""
+        User = get_user_model()
+        password = make_password(options["password"])
+        users = User.objects.bulk_create(
+            (
+                User(
+                    email=options["email_template"].format(n=n),
+                    name=f"Perf User {n}",
+                    password=password,
+                )
+                for n in range(options["users"])
+            ),
+            batch_size=batch_size,
+        )
+        Token.objects.bulk_create(
+            (
+                Token(user=user, key="%040x" % rng.getrandbits(160))
+                for user in users
+            ),
+            batch_size=batch_size,
+        )
+        return users
+
+    def _create_vocabulary(self, model, users, names, batch_size):
+        """Create one row per (user, name); return ``{user_id: [pk by rank]}``."""
+        objs = model.objects.bulk_create(
+            (model(user=user, name=name) for user in users for name in names),
+            batch_size=batch_size,
+        )
+        by_user = {}
+        for obj in objs:
+            by_user.setdefault(obj.user_id, []).append(obj.pk)
+        return by_user
+
+    def _create_recipes(
+        self,
+        options,
+        rng,
+        users,
+        tags,
+        ingredients,
+        tag_sampler,
+        ingredient_sampler,
+        batch_size,
+    ):
+        """Create recipes per user (heavy-tailed) and link Zipf-sampled tags/ingredients."""
+        counts = {"recipes": 0, "links": 0}
+        TagLink = Recipe.tags.through
+        IngredientLink = Recipe.ingredients.through
+
+        for user in users:
+            n_recipes = heavy_tail(
+                rng,
+                options["recipes_per_user"],
+                options["alpha"],
+                options["max_recipes_per_user"],
+            )
+            recipes = Recipe.objects.bulk_create(
+                (
+                    Recipe(
+                        user=user,
+                        title=" ".join(rng.sample(TITLE_WORDS, 3)),
+                        description="Synthetic recipe generated for performance testing.",
+                        time_minute=rng.randint(5, 180),
+                        price=Decimal(rng.randint(100, 9999)) / 100,
+                        link=f"https://example.com/recipes/{user.pk}/{i}",
+                    )
+                    for i in range(n_recipes)
+                ),
+                batch_size=batch_size,
+            )
+
+            tag_links = []
+            ingredient_links = []
+            user_tags = tags[user.pk]
+            user_ingredients = ingredients[user.pk]
+            for recipe in recipes:
+                for rank in tag_sampler.sample_unique(rng.randint(0, 4)):
+                    tag_links.append(
+                        TagLink(recipe_id=recipe.pk, tag_id=user_tags[rank])
+                    )
+                for rank in ingredient_sampler.sample_unique(rng.randint(2, 12)):
+                    ingredient_links.append(
+                        IngredientLink(
+                            recipe_id=recipe.pk,
+                            ingredient_id=user_ingredients[rank],
+                        )
+                    )
+            TagLink.objects.bulk_create(tag_links, batch_size=batch_size)
+            IngredientLink.objects.bulk_create(ingredient_links, batch_size=batch_size)
+
+            counts["recipes"] += len(recipes)
+            counts["links"] += len(tag_links) + len(ingredient_links)
+
+        return counts
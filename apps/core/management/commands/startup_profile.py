@@ -0,0 +1,169 @@
+"""
+Django command to profile worker startup.
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)\s*$")
+
+# Runs in a fresh interpreter: set Django up, build the WSGI handler and
+# serve one request, timing each phase.
+CHILD_SCRIPT = """
+import io, json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+app_done = time.perf_counter()
+
+environ = {"PATH_INFO": sys.argv[1], "wsgi.errors": io.StringIO()}
+setup_testing_defaults(environ)
+status = []
+body = b"".join(application(environ, lambda s, h, e=None: status.append(s)))
+done = time.perf_counter()
+
+print(json.dumps({
+    "setup": setup_done - start,
+    "application": app_done - setup_done,
+    "first_request": done - app_done,
+    "total": done - start,
+    "status": status[0],
+}))
+"""
+
+
+def parse_importtime(output):
+    """
+    Parse `python -X importtime` output.
+
+    Returns a list of ``(module, self_us, cumulative_us, depth)`` in the
+    order the imports finished.
+    """
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+
+def group_by_package(imports):
+    """Return ``{top-level package: self time in µs}``, largest first."""
+    totals = defaultdict(int)
+    for module, self_us, _, _ in imports:
+        totals[module.split(".", 1)[0]] += self_us
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def run_child(path, api_only):
+    """Start a worker-like interpreter; return (timings, imports)."""
+    env = dict(os.environ, DJANGO_API_ONLY="1" if api_only else "0")
+    env.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT, path],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise CommandError(f"Startup failed:\n{result.stderr[-2000:]}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return timings, parse_importtime(result.stderr)
+
+
+class Command(BaseCommand):
+    """Django command to report where worker startup time goes."""
+
+    help = (
+        "Start a fresh interpreter the way a worker does, serve one request, "
+        "and report the time to first request and the import cost per module."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default="/api/recipe/recipes/",
+            help="Path of the first request (it needs no database access "
+            "when unauthenticated).",
+        )
+        parser.add_argument("--top", type=int, default=20, help="Modules to list.")
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Runs per mode; the fastest is reported.",
+        )
+        parser.add_argument(
+            "--api-only",
+            action="store_true",
+            help="Profile with DJANGO_API_ONLY=1 (admin and schema apps deferred).",
+        )
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="Profile the full and the API-only configuration and compare.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        modes = [False, True] if options["compare"] else [options["api_only"]]
+        totals = {}
+        for api_only in modes:
+            runs = [
+                run_child(options["path"], api_only) for _ in range(options["repeat"])
+            ]
+            timings, imports = min(runs, key=lambda run: run[0]["total"])
+            totals[api_only] = timings["total"]
+            self.report(timings, imports, api_only, options["top"])
+
+        if options["compare"]:
+            full, api_only = totals[False], totals[True]
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"API-only mode: time to first request {full * 1000:.1f} ms -> "
+                    f"{api_only * 1000:.1f} ms ({(full - api_only) / full:.0%} faster)."
+                )
+            )
+
+    def report(self, timings, imports, api_only, top):
+        mode = "API-only" if api_only else "full"
+        self.stdout.write(
+            f"== {mode} ==\n"
+            f"Time to first request: {timings['total'] * 1000:.1f} ms "
+            f"(django.setup {timings['setup'] * 1000:.1f}, "
+            f"WSGI handler {timings['application'] * 1000:.1f}, "
+            f"first request {timings['first_request'] * 1000:.1f}; "
+            f"{timings['status']})"
+        )
+
+        total_self = sum(self_us for _, self_us, _, _ in imports) or 1
+        self.stdout.write(
+            f"\nImport time by package ({len(imports)} modules, "
+            f"{total_self / 1000:.1f} ms):"
+        )
+        for package, self_us in list(group_by_package(imports).items())[:top]:
+            self.stdout.write(
+                f"  {package:<32}{self_us / 1000:>9.1f} ms{self_us / total_self:>7.1%}"
+            )
+
+        self.stdout.write(f"\nSlowest imports (cumulative):\n  {'module':<48}{'self ms':>9}{'cum ms':>9}")
+        slowest = sorted(imports, key=lambda row: row[2], reverse=True)[:top]
+        for module, self_us, cumulative_us, depth in slowest:
+            self.stdout.write(
+                f"  {module:<48}{self_us / 1000:>9.1f}{cumulative_us / 1000:>9.1f}"
+            )
+        self.stdout.write("")
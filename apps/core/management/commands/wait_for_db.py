@@ -2,25 +2,78 @@
 Django command to wait for the database to be available.
 """
 
+import random
 import time
-from psycopg import OperationalError as PsycogError
+
+from django.core.management.base import BaseCommand, CommandError
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+
+from apps.core.health import pending_migrations, ping_new_connection
 
 
 class Command(BaseCommand):
     """Django command to wait for database."""
 
+    help = (
+        "Wait until the database accepts connections (and, optionally, until "
+        "all migrations are applied), retrying with exponential backoff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Give up after this many seconds (0 waits forever).",
+        )
+        parser.add_argument(
+            "--initial-delay",
+            type=float,
+            default=0.1,
+            help="Delay before the first retry, in seconds.",
+        )
+        parser.add_argument(
+            "--max-delay",
+            type=float,
+            default=5,
+            help="Upper bound for the delay between retries, in seconds.",
+        )
+        parser.add_argument(
+            "--migrations",
+            action="store_true",
+            help="Also wait until every migration has been applied "
+            "(for workers started alongside a separate migrate job).",
+        )
+
     def handle(self, *args, **options):
         """Entrypoint for command."""
+        alias = options["database"]
+        timeout = options["timeout"]
+        deadline = time.monotonic() + timeout if timeout else None
+
         self.stdout.write("Waiting for database...")
-        db_up = False
-        while db_up is False:
+        attempt = 0
+        while True:
             try:
-                self.check(databases=["default"])
-                db_up = True
-            except (PsycogError, OperationalError):
-                self.stdout.write("Database unavailable, waiting 1 second...")
-                time.sleep(1)
+                ping_new_connection(alias, connect_timeout=options["max_delay"])
+                if not options["migrations"]:
+                    break
+                pending = pending_migrations(alias)
+                if not pending:
+                    break
+                reason = f"{len(pending)} migration(s) not applied"
+            except OperationalError as exc:
+                reason = f"unavailable ({str(exc).strip() or exc.__class__.__name__})"
+
+            # Exponential backoff with jitter, so replicas restarted together
+            # do not retry in lockstep.
+            delay = min(options["max_delay"], options["initial_delay"] * 2**attempt)
+            delay *= random.uniform(0.5, 1)
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise CommandError(f"Database not ready after {timeout}s: {reason}.")
+            self.stdout.write(f"Database {reason}, retrying in {delay:.2f}s...")
+            time.sleep(delay)
+            attempt += 1
 
         self.stdout.write(self.style.SUCCESS("Database available!"))
@@ -0,0 +1,315 @@
+"""
+Prometheus-style metrics for the API and the database.
+
+Recording is lock-free: every thread writes to its own shard of counters
+and histograms, and shards are only merged when metrics are scraped. The
+shards of exited threads (the ASGI handler runs each request in a new
+one) are folded into a single retired shard, so shards don't pile up.
+
+When `settings.METRICS_MULTIPROC_DIR` is set, each worker process also
+dumps its merged shards to `<dir>/<pid>.json` at most every
+`METRICS_FLUSH_INTERVAL` seconds (and on every scrape), and `/metrics`
+merges the files of all workers, so a scrape served by any one worker
+reports totals for the whole server. Files of exited workers are kept
+on purpose: counters must not go backwards when a worker is recycled.
+"""
+
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+PREFIX = "bitesail_"
+
+
+class Histogram:
+    """Fixed-bucket histogram; the last bucket catches values above every bound."""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        """Add the observations of ``other``, a histogram with the same buckets."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def snapshot(self):
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum": self.sum,
+        }
+
+
+class _Shard:
+    """Metrics written by a single thread."""
+
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def fold(self, other):
+        """Add the metrics of ``other``, a shard no thread writes to anymore."""
+        for key, value in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, histogram in other.histograms.items():
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(histogram.buckets)
+            self.histograms[key].merge(histogram)
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())) if labels else ())
+
+
+class MetricsRegistry:
+    """Thread-sharded counters and histograms with optional multiprocess files."""
+
+    def __init__(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        # (thread, shard) of the threads that recorded metrics; the shards
+        # of threads that exited are folded into `_retired`.
+        self._shards = []
+        self._retired = _Shard()
+        self._shards_lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def _retire_exited(self):
+        """Fold the shards of exited threads into `_retired` (lock held)."""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._retired.fold(shard)
+        self._shards = live
+
+    def _shard(self):
+        if self._pid != os.getpid():
+            # Forked worker: start from zero instead of re-counting the parent.
+            self.reset()
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            # Only taken once per thread, never on the recording path.
+            with self._shards_lock:
+                self._retire_exited()
+                self._shards.append((threading.current_thread(), shard))
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name, labels=None, value=1):
+        """Increment a counter."""
+        counters = self._shard().counters
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, labels=None):
+        """Record ``value`` in a histogram."""
+        histograms = self._shard().histograms
+        key = _key(name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def snapshot(self):
+        """Merge all thread shards of this process into plain dicts."""
+        if self._pid != os.getpid():
+            self.reset()
+        counters = {}
+        histograms = {}
+        with self._shards_lock:
+            self._retire_exited()
+            shards = [shard for _, shard in self._shards]
+            counters.update(self._retired.counters)
+            for key, histogram in self._retired.histograms.items():
+                histograms[key] = histogram.snapshot()
+        for shard in shards:
+            for key, value in dict(shard.counters).items():
+                counters[key] = counters.get(key, 0) + value
+            for key, histogram in dict(shard.histograms).items():
+                _merge_histogram(histograms, key, histogram.snapshot())
+        return {"counters": counters, "histograms": histograms}
+
+    def reset(self):
+        """Drop all recorded metrics (and forget the parent after a fork)."""
+        with self._shards_lock:
+            self._pid = os.getpid()
+            self._local = threading.local()
+            self._shards = []
+            self._retired = _Shard()
+            self._last_flush = 0.0
+
+    def maybe_flush(self):
+        """Flush to the multiprocess directory if the flush interval has passed."""
+        directory = getattr(settings, "METRICS_MULTIPROC_DIR", None)
+        if not directory:
+            return
+        now = time.monotonic()
+        if now - self._last_flush >= getattr(settings, "METRICS_FLUSH_INTERVAL", 5):
+            self._last_flush = now
+            self.flush(directory)
+
+    def flush(self, directory):
+        """Atomically write this process's snapshot to ``<directory>/<pid>.json``."""
+        snapshot = self.snapshot()
+        payload = {
+            "counters": [[name, labels, v] for (name, labels), v in snapshot["counters"].items()],
+            "histograms": [
+                [name, labels, h] for (name, labels), h in snapshot["histograms"].items()
+            ],
+        }
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(payload, fh)
+        os.replace(tmp_path, os.path.join(directory, f"{os.getpid()}.json"))
+
+    def collect(self):
+        """
+        Return the metrics to expose.
+
+        In multiprocess mode this merges the files of every worker, using the
+        live snapshot for the current process; otherwise it is this process's
+        snapshot.
+        """
+        directory = getattr(settings, "METRICS_MULTIPROC_DIR", None)
+        if not directory:
+            return self.snapshot()
+
+        self.flush(directory)
+        merged = {"counters": {}, "histograms": {}}
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            try:
+                with open(path) as fh:
+                    payload = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in payload["counters"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                merged["counters"][key] = merged["counters"].get(key, 0) + value
+            for name, labels, histogram in payload["histograms"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                _merge_histogram(merged["histograms"], key, histogram)
+        return merged
+
+
+def _merge_histogram(histograms, key, snapshot):
+    existing = histograms.get(key)
+    if existing is None:
+        histograms[key] = {
+            "buckets": list(snapshot["buckets"]),
+            "counts": list(snapshot["counts"]),
+            "count": snapshot["count"],
+            "sum": snapshot["sum"],
+        }
+        return
+    existing["counts"] = [a + b for a, b in zip(existing["counts"], snapshot["counts"])]
+    existing["count"] += snapshot["count"]
+    existing["sum"] += snapshot["sum"]
+
+
+registry = MetricsRegistry()
+
+
+def record_request(endpoint, method, status, stats):
+    """Record one finished request (see `apps.core.instrumentation.RequestStats`)."""
+    labels = {"view": endpoint}
+    registry.inc(
+        "http_requests_total",
+        {"view": endpoint, "method": method, "status": str(status)},
+    )
+    registry.observe("http_request_duration_seconds", stats.total_time, labels=labels)
+    registry.observe("http_request_serializer_seconds", stats.serializer_time, labels=labels)
+    registry.observe("db_query_duration_seconds", stats.db_time, labels=labels)
+    registry.observe("db_queries_per_request", stats.queries, QUERY_BUCKETS, labels)
+    registry.maybe_flush()
+
+
+def record_connection_created(sender, connection, **kwargs):
+    """`connection_created` signal receiver counting new DB connections."""
+    registry.inc("db_connections_opened_total", {"alias": connection.alias})
+
+
+def record_connection_reuse(connections):
+    """Count requests that start with an already open connection, per alias."""
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None:
+            registry.inc("db_connections_reused_total", {"alias": connection.alias})
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return repr(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value)
+
+
+def render_prometheus(snapshot):
+    """Render a snapshot in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+
+    by_name = {}
+    for (name, labels), value in sorted(snapshot["counters"].items()):
+        by_name.setdefault(name, []).append((labels, value))
+    for name, samples in by_name.items():
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        for labels, value in samples:
+            lines.append(f"{PREFIX}{name}{_format_labels(labels)} {_format_number(value)}")
+
+    by_name = {}
+    for (name, labels), histogram in sorted(snapshot["histograms"].items()):
+        by_name.setdefault(name, []).append((labels, histogram))
+    for name, samples in by_name.items():
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        for labels, histogram in samples:
+            cumulative = 0
+            bounds = [_format_number(b) for b in histogram["buckets"]] + ["+Inf"]
+            for bound, count in zip(bounds, histogram["counts"]):
+                cumulative += count
+                lines.append(
+                    f"{PREFIX}{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}"
+                )
+            lines.append(
+                f"{PREFIX}{name}_sum{_format_labels(labels)} {_format_number(histogram['sum'])}"
+            )
+            lines.append(
+                f"{PREFIX}{name}_count{_format_labels(labels)} {histogram['count']}"
+            )
+
+    return "\n".join(lines) + "\n"
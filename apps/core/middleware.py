@@ -0,0 +1,253 @@
+"""
+Middleware for the BiteSail backend.
+"""
+
+import cProfile
+import fnmatch
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+
+from apps.core import metrics
+from apps.core.http import (
+    StreamCompressor,
+    available_encodings,
+    choose_encoding,
+    compress,
+)
+from apps.core.instrumentation import (
+    QueryBudgetExceeded,
+    QueryCounter,
+    RequestStats,
+    collect,
+    endpoint_name,
+)
+from apps.core.profiling import ProfileStore, RateLimiter, SQLTrace
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record SQL query count, DB time, serializer time and total time per request.
+
+    Queries are counted with `connection.execute_wrapper`, so this works with
+    `DEBUG=False`. The numbers are sent back in a `Server-Timing` header,
+    aggregated into per-endpoint histograms (served by `/metrics`), and
+    checked against the per-view budgets in `settings.QUERY_BUDGETS`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        metrics.record_connection_reuse(connections)
+        with ExitStack() as stack:
+            counter = QueryCounter(stats)
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            stack.enter_context(collect(stats))
+            response = self.get_response(request)
+        stats.finish()
+
+        endpoint = endpoint_name(request)
+        metrics.record_request(endpoint, request.method, response.status_code, stats)
+        if getattr(settings, "SERVER_TIMING_HEADER", True):
+            response["Server-Timing"] = stats.server_timing()
+
+        self.check_budget(endpoint, stats)
+        return response
+
+    def check_budget(self, endpoint, stats):
+        """Log, or raise when `QUERY_BUDGET_RAISE` is set, if a budget is exceeded."""
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get(endpoint)
+        if budget is None or stats.queries <= budget:
+            return
+
+        msg = f"{endpoint} ran {stats.queries} queries (budget {budget})."
+        if getattr(settings, "QUERY_BUDGET_RAISE", False):
+            raise QueryBudgetExceeded(msg)
+        logger.warning(msg)
+
+
+class SlowRequestProfilerMiddleware:
+    """
+    Capture a cProfile profile and SQL trace of slow requests.
+
+    A request is profiled only when profiling is enabled, its view matches
+    `settings.PROFILE_VIEWS`, it wins the `PROFILE_SAMPLE_RATE` coin toss, no
+    other request in this process is being profiled, and fewer than
+    `PROFILE_MAX_PER_MINUTE` requests have been profiled in the last minute.
+    Those caps bound the overhead, so this is safe to leave on in production.
+    The profile is kept only if the request took at least
+    `PROFILE_THRESHOLD_MS`, and is written to a `ProfileStore`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limiter = RateLimiter(getattr(settings, "PROFILE_MAX_PER_MINUTE", 10))
+        # cProfile hooks are process-wide on recent Pythons; profile one at a time.
+        self.active = threading.Lock()
+
+    def __call__(self, request):
+        endpoint = self.should_profile(request)
+        if endpoint is None or not self.active.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request, endpoint)
+        finally:
+            self.active.release()
+
+    def should_profile(self, request):
+        """Return the endpoint name if this request should be profiled."""
+        if not getattr(settings, "PROFILE_SLOW_REQUESTS", False):
+            return None
+        if random.random() >= getattr(settings, "PROFILE_SAMPLE_RATE", 0.0):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        endpoint = endpoint_name(request, match)
+        patterns = getattr(settings, "PROFILE_VIEWS", [])
+        if not any(fnmatch.fnmatchcase(endpoint, pattern) for pattern in patterns):
+            return None
+        if not self.limiter.allow():
+            return None
+        return endpoint
+
+    def profile(self, request, endpoint):
+        profiler = cProfile.Profile()
+        trace = SQLTrace()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(trace))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if duration_ms >= getattr(settings, "PROFILE_THRESHOLD_MS", 500):
+            profile_id = ProfileStore().save(
+                profiler,
+                {
+                    "created": timezone.now().isoformat(),
+                    "endpoint": endpoint,
+                    "method": request.method,
+                    "path": request.get_full_path(),
+                    "status": response.status_code,
+                    "duration_ms": round(duration_ms, 3),
+                    "queries": len(trace.queries) + trace.dropped,
+                    "sql": trace.queries,
+                },
+            )
+            logger.info("Saved profile %s of slow request to %s.", profile_id, endpoint)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with Brotli or gzip, as the client prefers.
+
+    Only responses of a compressible type (`settings.COMPRESSIBLE_TYPES`)
+    and at least `settings.COMPRESSION_MIN_SIZE` bytes are compressed;
+    small bodies gain nothing and cost CPU. Streaming responses are
+    compressed incrementally, flushing after every chunk so streamed data
+    is not held back. Responses that already have a `Content-Encoding`
+    (such as the pre-compressed schema) or forbid transformation are left
+    alone.
+
+    `Vary: Accept-Encoding` is merged into existing `Vary` values (CORS
+    adds `Origin`), and strong ETags are weakened: the compressed bytes
+    differ from the identity representation, but weak comparison still
+    lets conditional requests match.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose_encoding(
+            request.headers.get("Accept-Encoding", ""), available_encodings()
+        )
+        if encoding is None:
+            return response
+        level = (
+            settings.COMPRESSION_BROTLI_QUALITY
+            if encoding == "br"
+            else settings.COMPRESSION_GZIP_LEVEL
+        )
+
+        if response.streaming:
+            response.streaming_content = self.compress_stream(
+                response, StreamCompressor(encoding, level)
+            )
+            del response.headers["Content-Length"]
+        else:
+            content = compress(response.content, encoding, level)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers["Content-Length"] = str(len(content))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def is_compressible(self, response):
+        if response.has_header("Content-Encoding") or response.status_code in (204, 304):
+            return False
+        if "no-transform" in response.get("Cache-Control", ""):
+            return False
+        content_type = response.get("Content-Type", "").split(";", 1)[0].strip().lower()
+        if not (
+            content_type in settings.COMPRESSIBLE_TYPES
+            or content_type.startswith("text/")
+            and content_type != "text/event-stream"
+            or content_type.endswith("+json")
+        ):
+            return False
+        return response.streaming or len(response.content) >= settings.COMPRESSION_MIN_SIZE
+
+    def compress_stream(self, response, compressor):
+        # Bind the original iterator now; streaming_content is replaced below.
+        content = response.streaming_content
+        if response.is_async:
+
+            async def compressed():
+                async for chunk in content:
+                    data = compressor.compress(chunk) + compressor.flush()
+                    if data:
+                        yield data
+                yield compressor.finish()
+
+        else:
+
+            def compressed():
+                for chunk in content:
+                    data = compressor.compress(chunk) + compressor.flush()
+                    if data:
+                        yield data
+                yield compressor.finish()
+
+        return compressed()
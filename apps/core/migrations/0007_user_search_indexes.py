@@ -0,0 +1,48 @@
+# Generated by Django 5.1.15 on 2026-10-19 05:58
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+# Trigram indexes back the admin's fuzzy user search. They are created only
+# where the pg_trgm extension is available, so the migration also applies on
+# servers without the contrib modules; the admin then skips fuzzy matching.
+CREATE_TRIGRAM_INDEXES = """
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS core_user_email_trgm_idx
+            ON core_user USING gin (UPPER(email::text) gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS core_user_name_trgm_idx
+            ON core_user USING gin (UPPER(name::text) gin_trgm_ops);
+    END IF;
+END
+$$;
+"""
+
+DROP_TRIGRAM_INDEXES = """
+DROP INDEX IF EXISTS core_user_email_trgm_idx;
+DROP INDEX IF EXISTS core_user_name_trgm_idx;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0006_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='text_pattern_ops'), name='core_user_email_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='text_pattern_ops'), name='core_user_name_prefix_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGRAM_INDEXES, DROP_TRIGRAM_INDEXES),
+    ]
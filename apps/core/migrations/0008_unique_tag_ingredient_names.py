@@ -0,0 +1,69 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:04
+
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Merge tags and ingredients that share a user and name.
+
+    The row with the lowest id is kept. Recipe links to the duplicates are
+    re-pointed to it (links it already has are dropped), then the
+    duplicates are deleted, so the unique constraints can be added.
+    """
+    Recipe = apps.get_model("core", "Recipe")
+    quote = schema_editor.quote_name
+    for field_name in ("tags", "ingredients"):
+        field = Recipe._meta.get_field(field_name)
+        table = quote(field.related_model._meta.db_table)
+        through = field.remote_field.through._meta
+        link = quote(through.db_table)
+        column = quote(field.m2m_reverse_name())
+        recipe_column = quote(field.m2m_column_name())
+        schema_editor.execute(
+            f"""
+            CREATE TEMPORARY TABLE duplicates AS
+            SELECT id, keep_id FROM (
+                SELECT id, MIN(id) OVER (PARTITION BY user_id, name) AS keep_id
+                FROM {table}
+            ) ranked
+            WHERE id <> keep_id
+            """
+        )
+        schema_editor.execute(
+            f"""
+            INSERT INTO {link} ({recipe_column}, {column})
+            SELECT DISTINCT l.{recipe_column}, d.keep_id
+            FROM {link} l JOIN duplicates d ON d.id = l.{column}
+            ON CONFLICT DO NOTHING
+            """
+        )
+        schema_editor.execute(
+            f"DELETE FROM {link} WHERE {column} IN (SELECT id FROM duplicates)"
+        )
+        schema_editor.execute(
+            f"DELETE FROM {table} WHERE id IN (SELECT id FROM duplicates)"
+        )
+        schema_editor.execute("DROP TABLE duplicates")
+    # Run the deferred foreign key checks now; Postgres refuses to alter a
+    # table with pending trigger events.
+    schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='core_ingredient_user_name_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='core_tag_user_name_uniq'),
+        ),
+    ]
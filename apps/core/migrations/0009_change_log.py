@@ -0,0 +1,64 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Log every existing object once, so the log covers whole catalogs and
+# `since=0` is a valid delta.
+BACKFILL_CHANGES = """
+INSERT INTO core_change (user_id, seq, kind, object_id, deleted, changed_at)
+SELECT
+    user_id,
+    row_number() OVER (PARTITION BY user_id ORDER BY kind, object_id),
+    kind,
+    object_id,
+    false,
+    now()
+FROM (
+    SELECT user_id, 'recipe' AS kind, id AS object_id FROM core_recipe
+    UNION ALL
+    SELECT user_id, 'tag', id FROM core_tag
+    UNION ALL
+    SELECT user_id, 'ingredient', id FROM core_ingredient
+) AS existing;
+
+INSERT INTO core_changesequence (user_id, last_seq, compacted_seq)
+SELECT user_id, max(seq), 0 FROM core_change GROUP BY user_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_unique_tag_ingredient_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last_seq', models.BigIntegerField(default=0)),
+                ('compacted_seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('recipe', 'Recipe'), ('tag', 'Tag'), ('ingredient', 'Ingredient')], max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'seq'), name='core_change_user_seq_uniq')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_CHANGES, migrations.RunSQL.noop),
+    ]
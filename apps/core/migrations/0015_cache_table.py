@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-19 09:10
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    """
+    Create the table of the database cache (settings.CACHES), so that
+    `migrate` is all a deployment needs. Does nothing if it exists.
+    """
+    call_command(
+        "createcachetable", database=schema_editor.connection.alias, verbosity=0
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_name_prefix_per_user_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
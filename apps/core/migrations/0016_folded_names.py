@@ -0,0 +1,58 @@
+# Generated by Django 5.1.15 on 2026-10-19 10:05
+
+import apps.core.models
+from django.db import migrations, models
+
+
+def fold_names(apps, schema_editor):
+    """Fill in `folded_name` of the existing tags and ingredients."""
+    for model_name in ("Tag", "Ingredient"):
+        model = apps.get_model("core", model_name)
+        objects = model.objects.using(schema_editor.connection.alias)
+        batch = []
+        for obj in objects.only("id", "name").iterator(chunk_size=1000):
+            obj.folded_name = obj.name.casefold()
+            batch.append(obj)
+            if len(batch) == 1000:
+                objects.bulk_update(batch, ["folded_name"])
+                batch = []
+        objects.bulk_update(batch, ["folded_name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_cache_table'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='core_ingr_user_name_prefix_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='core_tag_user_name_prefix_idx',
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='folded_name',
+            field=apps.core.models.FoldedNameField(db_collation='C', default='', editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='folded_name',
+            field=apps.core.models.FoldedNameField(db_collation='C', default='', editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fold_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'folded_name'], name='core_ingr_user_folded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'folded_name'], name='core_tag_user_folded_idx'),
+        ),
+    ]
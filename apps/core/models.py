@@ -2,7 +2,14 @@
 Database Models
 """
 
+import os
+import uuid
+
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import OpClass
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import (
     PermissionsMixin,
     AbstractBaseUser,
@@ -113,6 +120,19 @@ class User(AbstractBaseUser, PermissionsMixin):
     # Fields required when creating a superuser. Empty since email is required by default.
     REQUIRED_FIELDS = []
 
+    class Meta:
+        indexes = [
+            # Case-insensitive exact and prefix search for the admin.
+            models.Index(
+                OpClass(Upper("email"), name="text_pattern_ops"),
+                name="core_user_email_prefix_idx",
+            ),
+            models.Index(
+                OpClass(Upper("name"), name="text_pattern_ops"),
+                name="core_user_name_prefix_idx",
+            ),
+        ]
+
     def __str__(self):
         """
         Return a string representation of the user instance, which is the user's email.
@@ -120,30 +140,131 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.email
 
 
+class NamedItemManager(models.Manager):
+    """
+    Manager for per-user named objects (tags and ingredients).
+
+    Names are unique per user, which lets many names be resolved to objects
+    with one `INSERT ... ON CONFLICT DO NOTHING` and one `SELECT` instead of
+    a `get_or_create` round trip per name.
+    """
+
+    def get_or_create_many(self, user, names):
+        """
+        Return ``user``'s objects for ``names``, creating the missing ones.
+
+        Objects come back in the order of the first occurrence of each name.
+        Existing rows are skipped by the insert rather than updated, so they
+        are neither rewritten nor locked; the select then reads them along
+        with the new ones, including rows inserted by concurrent callers.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+        self.bulk_create(
+            [self.model(user=user, name=name) for name in names],
+            ignore_conflicts=True,
+        )
+        by_name = {obj.name: obj for obj in self.filter(user=user, name__in=names)}
+        return [by_name[name] for name in names]
+
+
+class FoldedNameField(models.TextField):
+    """
+    The ``name`` of the instance, case-folded with `str.casefold`.
+
+    Set whenever the instance is saved (including by `bulk_create`), so the
+    database holds exactly the folding Python applies, whatever its locale.
+    """
+
+    def pre_save(self, model_instance, add):
+        value = model_instance.name.casefold()
+        setattr(model_instance, self.attname, value)
+        return value
+
+
 class Tag(models.Model):
     name = models.CharField(max_length=255)
+    # For autocomplete; "C" collation sorts it by code point, like Python.
+    folded_name = FoldedNameField(editable=False, db_collation="C")
     user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    objects = NamedItemManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"], name="core_tag_user_name_uniq"
+            ),
+        ]
+        indexes = [
+            # Case-insensitive prefix search (`name__istartswith`).
+            models.Index(
+                OpClass(Upper("name"), name="text_pattern_ops"),
+                name="core_tag_name_prefix_idx",
+            ),
+            # Prefix search and order within one user's names (autocomplete).
+            models.Index(
+                fields=["user", "folded_name"], name="core_tag_user_folded_idx"
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
 class Ingredient(models.Model):
     name = models.CharField(max_length=255)
+    # For autocomplete; "C" collation sorts it by code point, like Python.
+    folded_name = FoldedNameField(editable=False, db_collation="C")
     user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    objects = NamedItemManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"], name="core_ingredient_user_name_uniq"
+            ),
+        ]
+        indexes = [
+            # Case-insensitive prefix search (`name__istartswith`).
+            models.Index(
+                OpClass(Upper("name"), name="text_pattern_ops"),
+                name="core_ingr_name_prefix_idx",
+            ),
+            # Prefix search and order within one user's names (autocomplete).
+            models.Index(
+                fields=["user", "folded_name"], name="core_ingr_user_folded_idx"
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
+def recipe_image_file_path(instance, filename):
+    """Generate a unique storage name for a recipe image, keeping its extension."""
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join("recipes", f"{uuid.uuid4().hex}{ext}")
+
+
 class Recipe(models.Model):
-    """Recipe objects"""
+    """
+    Recipe objects
+
+    ``thumbnails`` maps the sizes of the image's thumbnails (in pixels) to
+    their storage names; it is filled in by a background job after upload
+    (see `apps.recipe.images`).
+    """
 
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     time_minute = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
+    image = models.ImageField(blank=True, upload_to=recipe_image_file_path)
+    thumbnails = models.JSONField(default=dict, blank=True)
     tags = models.ManyToManyField("Tag")
     ingredients = models.ManyToManyField("Ingredient")
 
@@ -152,5 +273,178 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = [
+            # Case-insensitive prefix search (`title__istartswith`).
+            models.Index(
+                OpClass(Upper("title"), name="text_pattern_ops"),
+                name="core_recipe_title_prefix_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.title
+
+
+class ChangeSequence(models.Model):
+    """
+    Per-user counter behind the change log.
+
+    `last_seq` is the sequence number of the user's latest change.
+    `compacted_seq` is the highest sequence number of a tombstone removed by
+    compaction: clients that last synced before it must sync from scratch.
+    """
+
+    user = models.OneToOneField(
+        to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True
+    )
+    last_seq = models.BigIntegerField(default=0)
+    compacted_seq = models.BigIntegerField(default=0)
+
+
+class Change(models.Model):
+    """
+    One entry of a user's change log, read by the sync endpoint.
+
+    Each create, update or delete of a recipe, tag or ingredient appends an
+    entry with the user's next sequence number; deletes are recorded as
+    tombstones (``deleted=True``). Entries only name the object: its current
+    state is read from its table when syncing.
+    """
+
+    class Kind(models.TextChoices):
+        RECIPE = "recipe"
+        TAG = "tag"
+        INGREDIENT = "ingredient"
+
+    user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    seq = models.BigIntegerField()
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # Also the index behind `user_id = %s AND seq > %s ORDER BY seq`.
+            models.UniqueConstraint(
+                fields=["user", "seq"], name="core_change_user_seq_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        action = "deleted" if self.deleted else "changed"
+        return f"{self.kind} {self.object_id} {action} (#{self.seq})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The outcome of a write sent with an `Idempotency-Key` header.
+
+    The row is inserted (claimed) before the write runs, and gets the
+    response once the write succeeds, in the write's transaction. Retries
+    with the same key replay ``response``. ``fingerprint`` is a SHA-256
+    digest of the request, so a key reused for a different request is
+    detected. Rows expire after `settings.IDEMPOTENCY_KEY_TTL_SECONDS`.
+    """
+
+    user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    fingerprint = models.BinaryField(max_length=32)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="core_idempotencykey_user_key_uniq"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["created_at"], name="core_idemkey_created_idx"),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class Purge(models.Model):
+    """
+    A deletion waiting for its job (see `apps.core.purge`).
+
+    Deleting an account queues a ``user`` purge of everything it owns;
+    bulk deletes queue the ``object_ids`` of one kind of object. The worker
+    deletes in bounded batches, so no transaction holds many row locks and
+    nothing is loaded into memory. ``started_at`` is the worker's lease: a
+    purge whose worker died is picked up again once it expires.
+    """
+
+    class Kind(models.TextChoices):
+        USER = "user"
+        RECIPE = "recipe"
+        TAG = "tag"
+        INGREDIENT = "ingredient"
+
+    user = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    object_ids = ArrayField(models.BigIntegerField(), null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        count = "all" if self.object_ids is None else len(self.object_ids)
+        return f"{self.kind} purge of user {self.user_id} ({count})"
+
+
+class Job(models.Model):
+    """
+    A unit of background work, run by `manage.py run_worker`.
+
+    ``name`` is a task registered with `apps.core.jobs.task` and ``kwargs``
+    its keyword arguments. Workers claim due jobs with `FOR UPDATE SKIP
+    LOCKED`; a failed job is queued again with exponential backoff until it
+    has been tried ``max_attempts`` times. See `apps.core.jobs`.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        SUCCEEDED = "succeeded"
+        FAILED = "failed"
+
+    name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True
+    )
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # The claim query: due queued jobs, oldest first.
+            models.Index(
+                fields=["run_at", "id"],
+                name="core_job_queued_idx",
+                condition=models.Q(status="queued"),
+            ),
+            # Leases of running jobs, checked by the same query.
+            models.Index(
+                fields=["started_at"],
+                name="core_job_running_idx",
+                condition=models.Q(status="running"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
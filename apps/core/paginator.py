@@ -0,0 +1,51 @@
+"""
+Paginators for very large tables.
+"""
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_count(model, using="default"):
+    """
+    Return the planner's row estimate for ``model``'s table, or None.
+
+    Reads `pg_class.reltuples`, which autovacuum/ANALYZE keep close to the
+    real row count, in constant time. Returns None on other databases and
+    for tables that have never been analyzed.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids `COUNT(*)` over a whole large table.
+
+    When the queryset is unfiltered and the table is estimated to hold more
+    than `settings.ESTIMATED_COUNT_THRESHOLD` rows, the estimate is used as
+    the count. Filtered querysets (searches, list filters) and small tables
+    are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, "query", None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > settings.ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
@@ -0,0 +1,161 @@
+"""
+Profiles of slow requests, captured by `SlowRequestProfilerMiddleware`.
+
+Each saved profile is a pair of files in `settings.PROFILE_DIR`:
+`<id>.prof` (raw cProfile data, open it with `pstats` or snakeviz) and
+`<id>.json` (request metadata, the SQL trace and the most expensive
+functions). Only the newest `settings.PROFILE_MAX_FILES` profiles are kept.
+"""
+
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+
+
+PROFILE_ID_RE = re.compile(r"^[0-9]{20}-[0-9a-f]{8}$")
+
+
+class RateLimiter:
+    """Allow at most ``limit`` events per rolling ``period`` seconds."""
+
+    def __init__(self, limit, period=60.0):
+        self.limit = limit
+        self.period = period
+        self._events = []
+        self._lock = threading.Lock()
+
+    def allow(self):
+        now = time.monotonic()
+        with self._lock:
+            self._events = [t for t in self._events if now - t < self.period]
+            if len(self._events) >= self.limit:
+                return False
+            self._events.append(now)
+            return True
+
+
+class SQLTrace:
+    """Database execute wrapper that records every query and its duration."""
+
+    def __init__(self, max_queries=500):
+        self.max_queries = max_queries
+        self.queries = []
+        self.dropped = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < self.max_queries:
+                self.queries.append(
+                    {
+                        "sql": sql,
+                        "ms": round((time.perf_counter() - start) * 1000, 3),
+                        "many": many,
+                    }
+                )
+            else:
+                self.dropped += 1
+
+
+def top_functions(profiler, limit=30):
+    """Return the ``limit`` functions with the highest cumulative time."""
+    try:
+        stats = pstats.Stats(profiler).stats
+    except TypeError:
+        # Raised by pstats when the profiler recorded nothing.
+        return []
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": ncalls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+        }
+        for (filename, line, name), (_, ncalls, tottime, cumtime, _) in rows[:limit]
+    ]
+
+
+class ProfileStore:
+    """Rotating on-disk store of request profiles."""
+
+    def __init__(self, directory=None, max_files=None):
+        self.directory = str(directory or settings.PROFILE_DIR)
+        self.max_files = max_files or settings.PROFILE_MAX_FILES
+
+    def save(self, profiler, metadata):
+        """Write a profile and its metadata; return the new profile id."""
+        os.makedirs(self.directory, exist_ok=True)
+        # Ids sort chronologically, which is what rotation relies on.
+        profile_id = f"{datetime.now():%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        profiler.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+
+        metadata = dict(metadata, id=profile_id, functions=top_functions(profiler))
+        tmp_path = os.path.join(self.directory, f"{profile_id}.json.tmp")
+        with open(tmp_path, "w") as fh:
+            json.dump(metadata, fh)
+        os.replace(tmp_path, os.path.join(self.directory, f"{profile_id}.json"))
+
+        self.rotate()
+        return profile_id
+
+    def rotate(self):
+        """Delete the oldest profiles beyond `max_files`."""
+        for profile_id in self._ids()[self.max_files:]:
+            for suffix in (".json", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def _ids(self):
+        """Return stored profile ids, newest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        ids = [name[:-5] for name in names if name.endswith(".json")]
+        return sorted((i for i in ids if PROFILE_ID_RE.match(i)), reverse=True)
+
+    def list(self):
+        """Return a summary of every stored profile, newest first."""
+        summaries = []
+        for profile_id in self._ids():
+            metadata = self.get(profile_id)
+            if metadata is None:
+                continue
+            summaries.append(
+                {
+                    key: metadata.get(key)
+                    for key in (
+                        "id",
+                        "created",
+                        "endpoint",
+                        "method",
+                        "path",
+                        "status",
+                        "duration_ms",
+                        "queries",
+                    )
+                }
+            )
+        return summaries
+
+    def get(self, profile_id):
+        """Return the full metadata of one profile, or None."""
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json")) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
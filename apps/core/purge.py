@@ -0,0 +1,267 @@
+"""
+Background deletion of accounts and large sets of objects.
+
+Deleting a user through the ORM cascades to every recipe, tag, ingredient
+and M2M row in one transaction, after loading them all into memory. Instead,
+`delete_account` deactivates the user and revokes their token at once, and
+`delete_objects` queues a bulk delete; both leave a `Purge` row and queue
+a job that runs it on the job worker (`manage.py run_worker`, see
+`apps.core.jobs`). `manage.py run_purges` sweeps up any purge left without
+one.
+
+The worker deletes with ``DELETE ... WHERE id IN (SELECT id ... LIMIT n)``,
+one transaction per batch of `settings.PURGE_BATCH_SIZE` rows (recipes go
+with their M2M rows), so locks are held briefly and memory use is flat
+however large the account. Bulk
+deletes record their tombstones (and the recipes that lost a tag or
+ingredient) in the change log with each batch. Purges are idempotent: a
+purge interrupted halfway simply deletes what is left when it runs again.
+"""
+
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from apps.core import jobs
+from apps.core.changes import record_changes
+from apps.core.models import (
+    Change,
+    IdempotencyKey,
+    Ingredient,
+    Purge,
+    Recipe,
+    Tag,
+)
+
+
+logger = logging.getLogger(__name__)
+
+RECIPE_TAGS = Recipe.tags.through._meta.db_table
+RECIPE_INGREDIENTS = Recipe.ingredients.through._meta.db_table
+# A recipe's M2M rows, deleted in the same statement as the recipe.
+RECIPE_M2M = [(RECIPE_TAGS, "recipe_id"), (RECIPE_INGREDIENTS, "recipe_id")]
+
+CLAIM_SQL = f"""
+UPDATE {Purge._meta.db_table} SET started_at = now()
+WHERE id = (
+    SELECT id FROM {Purge._meta.db_table}
+    WHERE started_at IS NULL OR started_at < now() - make_interval(secs => %s)
+    ORDER BY id
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1
+)
+RETURNING id, user_id, kind, object_ids
+"""
+
+CLAIM_ONE_SQL = f"""
+UPDATE {Purge._meta.db_table} SET started_at = now()
+WHERE id = %s
+    AND (started_at IS NULL OR started_at < now() - make_interval(secs => %s))
+RETURNING id, user_id, kind, object_ids
+"""
+
+# Per kind of bulk delete: the model, and its M2M table and column.
+OBJECT_TABLES = {
+    Purge.Kind.RECIPE: (Recipe, None),
+    Purge.Kind.TAG: (Tag, (RECIPE_TAGS, "tag_id")),
+    Purge.Kind.INGREDIENT: (Ingredient, (RECIPE_INGREDIENTS, "ingredient_id")),
+}
+
+
+@transaction.atomic
+def delete_account(user):
+    """
+    Deactivate ``user`` and queue the deletion of everything they own.
+
+    Returns the `Job` running the purge. It has no user, as it outlives them.
+    """
+    user.is_active = False
+    user.save(update_fields=["is_active"])
+    Token.objects.filter(user=user).delete()
+    purge = Purge.objects.create(user=user, kind=Purge.Kind.USER)
+    return jobs.enqueue("core.purge", purge_id=purge.id)
+
+
+@transaction.atomic
+def delete_objects(user_id, kind, ids):
+    """
+    Queue the deletion of ``user_id``'s objects of ``kind`` with ``ids``.
+
+    Returns the `Job` running the purge.
+    """
+    purge = Purge.objects.create(
+        user_id=user_id, kind=kind, object_ids=sorted(set(ids))
+    )
+    return jobs.enqueue("core.purge", user_id=user_id, purge_id=purge.id)
+
+
+class Purger:
+    """Run one claimed purge in batches, renewing its lease after each."""
+
+    def __init__(self, purge_id, user_id, kind, object_ids, batch_size):
+        self.purge_id = purge_id
+        self.user_id = user_id
+        self.kind = kind
+        self.object_ids = object_ids
+        self.batch_size = batch_size
+        self.deleted = 0
+
+    def run(self):
+        """Delete everything the purge covers; returns the rows deleted."""
+        if self.kind == Purge.Kind.USER:
+            self.purge_user()
+        else:
+            self.purge_objects()
+            Purge.objects.filter(id=self.purge_id).delete()
+        return self.deleted
+
+    def delete_batches(
+        self, table, where, params, returning=None, on_batch=None, cascade=()
+    ):
+        """
+        Delete the rows of ``table`` matching ``where``, a batch at a time.
+
+        Each batch is one statement in its own transaction. Rows of the
+        ``cascade`` tables, given as ``(table, column)`` pairs, that point
+        at the batch are deleted along with it. ``on_batch`` is called in
+        the transaction with the ``returning`` column of the deleted rows.
+        """
+        sql = f"WITH batch AS (SELECT id FROM {table} WHERE {where} LIMIT %s)"
+        for n, (child, column) in enumerate(cascade):
+            sql += (
+                f", cascade{n} AS (DELETE FROM {child} "
+                f"WHERE {column} IN (SELECT id FROM batch))"
+            )
+        sql += f" DELETE FROM {table} WHERE id IN (SELECT id FROM batch)"
+        if returning:
+            sql += f" RETURNING {returning}"
+        while True:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, [*params, self.batch_size])
+                    count = cursor.rowcount
+                    if on_batch is not None and count:
+                        on_batch([value for (value,) in cursor.fetchall()])
+            self.deleted += count
+            Purge.objects.filter(id=self.purge_id).update(started_at=timezone.now())
+            if count < self.batch_size:
+                return
+
+    def purge_user(self):
+        self.delete_batches(
+            Recipe._meta.db_table,
+            "user_id = %s",
+            [self.user_id],
+            cascade=RECIPE_M2M,
+        )
+        for model in (Tag, Ingredient, Change, IdempotencyKey):
+            self.delete_batches(model._meta.db_table, "user_id = %s", [self.user_id])
+        # What is left is a handful of rows (the counter, sessions, admin
+        # log entries and this purge), so the ORM cascade is cheap now.
+        get_user_model().objects.filter(id=self.user_id).delete()
+
+    def purge_objects(self):
+        model, m2m = OBJECT_TABLES[self.kind]
+        # Only the user's own objects; ids of other users' are ignored.
+        ids = list(
+            model.objects.filter(
+                user_id=self.user_id, id__in=self.object_ids
+            ).values_list("id", flat=True)
+        )
+        if not ids:
+            return
+        if m2m is not None:
+            # A tag can be on every recipe: unlink it in batches first.
+            table, column = m2m
+            self.delete_batches(
+                table,
+                f"{column} = ANY(%s)",
+                [ids],
+                returning="recipe_id",
+                on_batch=self.record_recipes_changed,
+            )
+        self.delete_batches(
+            model._meta.db_table,
+            "id = ANY(%s)",
+            [ids],
+            returning="id",
+            on_batch=self.record_deleted,
+            cascade=RECIPE_M2M if m2m is None else (),
+        )
+
+    def record_recipes_changed(self, recipe_ids):
+        record_changes(
+            self.user_id,
+            updated=[(Change.Kind.RECIPE, pk) for pk in sorted(set(recipe_ids))],
+        )
+
+    def record_deleted(self, ids):
+        _, m2m = OBJECT_TABLES[self.kind]
+        recipe_ids = []
+        if m2m is not None:
+            # Drop links added to these objects since their M2M rows were
+            # purged, which would otherwise fail the foreign key on commit.
+            table, column = m2m
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE {column} = ANY(%s) RETURNING recipe_id",
+                    [ids],
+                )
+                recipe_ids = sorted({pk for (pk,) in cursor.fetchall()})
+        record_changes(
+            self.user_id,
+            updated=[(Change.Kind.RECIPE, pk) for pk in recipe_ids],
+            deleted=[(Change.Kind(self.kind), pk) for pk in ids],
+        )
+
+
+def claim():
+    """Lease the oldest pending purge; returns its row or None."""
+    with connection.cursor() as cursor:
+        cursor.execute(CLAIM_SQL, [settings.PURGE_LEASE_SECONDS])
+        return cursor.fetchone()
+
+
+def run(purge_id, batch_size=None):
+    """
+    Run the purge ``purge_id``; returns the rows deleted.
+
+    Does nothing if the purge is done or another worker holds its lease. If
+    it fails, the lease is released so that it can be retried at once.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(CLAIM_ONE_SQL, [purge_id, settings.PURGE_LEASE_SECONDS])
+        row = cursor.fetchone()
+    if row is None:
+        return 0
+    try:
+        deleted = Purger(*row, batch_size or settings.PURGE_BATCH_SIZE).run()
+    except Exception:
+        Purge.objects.filter(id=purge_id).update(started_at=None)
+        raise
+    _, user_id, kind, _ = row
+    logger.info("Purge %s (%s, user %s) deleted %s rows.", purge_id, kind, user_id, deleted)
+    return deleted
+
+
+def run_pending(batch_size=None):
+    """Run pending purges until there are none; returns how many ran."""
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    count = 0
+    while (row := claim()) is not None:
+        purge_id, user_id, kind, object_ids = row
+        try:
+            deleted = Purger(purge_id, user_id, kind, object_ids, batch_size).run()
+        except Exception:
+            # Keeps its lease, so it is retried once that expires.
+            logger.exception("Purge %s (%s, user %s) failed.", purge_id, kind, user_id)
+            continue
+        logger.info(
+            "Purge %s (%s, user %s) deleted %s rows.", purge_id, kind, user_id, deleted
+        )
+        count += 1
+    return count
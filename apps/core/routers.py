@@ -0,0 +1,109 @@
+"""
+Read-replica routing.
+
+Queries go to the primary ("default") unless a view has opted the current
+request into replica reads with `ReplicaReadMixin`. The mixin does so only
+for safe requests to read actions, and not for users who wrote within the
+last `settings.REPLICA_READ_YOUR_WRITES_SECONDS`, so clients always read
+their own writes even when the replicas lag behind. Those users are
+pinned in the (database) cache, so the pin holds in every worker.
+
+The chosen alias is held in a context variable, so concurrent requests in
+threads or async tasks never see each other's routing.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+
+PRIMARY = "default"
+
+_read_alias = ContextVar("read_alias", default=None)
+
+
+def choose_replica():
+    """Return a random configured replica alias, or None if there are none."""
+    if not settings.DATABASE_REPLICAS:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def _pin_key(user_id):
+    return f"replica:pin:{user_id}"
+
+
+def pin_to_primary(user):
+    """Keep ``user``'s reads on the primary for the read-your-writes window."""
+    cache.set(_pin_key(user.pk), True, settings.REPLICA_READ_YOUR_WRITES_SECONDS)
+
+
+def is_pinned(user):
+    """Return True if ``user`` wrote within the read-your-writes window."""
+    return cache.get(_pin_key(user.pk), False)
+
+
+class ReplicaRouter:
+    """Send reads to the alias chosen for the current request; writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == PRIMARY
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests to read actions of an API view from a replica.
+
+    Authentication and permission checks run on the primary, so a token
+    issued a moment ago is accepted. A successful unsafe request pins the
+    user to the primary for the read-your-writes window.
+    """
+
+    replica_actions = ("list", "retrieve")
+    """
+    ViewSet actions that may read from a replica. Views without actions
+    (generic API views) are routed by HTTP method alone.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+        user = getattr(self.request, "user", None)
+        if (
+            settings.DATABASE_REPLICAS
+            and self.request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        ):
+            pin_to_primary(user)
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.should_read_from_replica(request):
+            _read_alias.set(choose_replica())
+
+    def should_read_from_replica(self, request):
+        if not settings.DATABASE_REPLICAS or request.method not in SAFE_METHODS:
+            return False
+        action = getattr(self, "action", None)
+        if action is not None and action not in self.replica_actions:
+            return False
+        return not (request.user.is_authenticated and is_pinned(request.user))
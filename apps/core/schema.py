@@ -0,0 +1,183 @@
+"""
+Precomputed OpenAPI schema.
+
+Generating the schema introspects every view and serializer, which costs
+hundreds of milliseconds of CPU. Instead it is generated once per code
+version (by `manage.py build_schema`, or lazily on the first request),
+rendered as YAML and JSON, pre-compressed, and written to
+`settings.SCHEMA_CACHE_DIR` as `openapi-<version>.<format>[.gz|.br]`.
+
+The version is a fingerprint of the project's Python sources and of the
+installed framework versions, so the artifact is regenerated exactly when
+the code that shapes the schema changes.
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from importlib.metadata import PackageNotFoundError, version as package_version
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available.
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "yaml": "application/vnd.oai.openapi",
+    "json": "application/vnd.oai.openapi+json",
+}
+
+FINGERPRINT_PACKAGES = ("django", "djangorestframework", "drf-spectacular")
+
+
+def code_fingerprint():
+    """Return a short hash of the project sources and framework versions."""
+    digest = hashlib.sha256()
+    for package in FINGERPRINT_PACKAGES:
+        try:
+            digest.update(f"{package}=={package_version(package)}".encode())
+        except PackageNotFoundError:
+            digest.update(package.encode())
+
+    base_dir = str(settings.BASE_DIR)
+    for top in ("apps", "project"):
+        for root, dirs, files in os.walk(os.path.join(base_dir, top)):
+            dirs[:] = sorted(d for d in dirs if d not in ("tests", "__pycache__"))
+            for name in sorted(files):
+                if not name.endswith(".py"):
+                    continue
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, base_dir).encode())
+                with open(path, "rb") as fh:
+                    digest.update(fh.read())
+    return digest.hexdigest()[:16]
+
+
+class SchemaArtifact:
+    """The rendered schema of one code version, in every format and encoding."""
+
+    def __init__(self, version, bodies):
+        self.version = version
+        # {format: {encoding: bytes}}; encoding is "identity", "gzip" or "br".
+        self.bodies = bodies
+
+    def etag(self, fmt, encoding):
+        # Different representations must not share an ETag.
+        return f'"{self.version}-{fmt}-{encoding}"'
+
+
+def _encode(body):
+    encoded = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(body, quality=11)
+    return encoded
+
+
+def generate_schema():
+    """Run drf-spectacular and return ``{format: bytes}``."""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return {
+        "yaml": OpenApiYamlRenderer().render(schema, renderer_context={}),
+        "json": OpenApiJsonRenderer().render(schema, renderer_context={}),
+    }
+
+
+def _path(directory, version, fmt, encoding):
+    suffix = {"identity": "", "gzip": ".gz", "br": ".br"}[encoding]
+    return os.path.join(directory, f"openapi-{version}.{fmt}{suffix}")
+
+
+def build(directory=None, version=None, keep=5):
+    """
+    Generate, compress and write the artifact; return a `SchemaArtifact`.
+
+    If the directory is not writable the artifact is still returned, so it
+    can be served from memory.
+    """
+    directory = str(directory or settings.SCHEMA_CACHE_DIR)
+    version = version or code_fingerprint()
+
+    bodies = {fmt: _encode(body) for fmt, body in generate_schema().items()}
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for fmt, encodings in bodies.items():
+            for encoding, body in encodings.items():
+                path = _path(directory, version, fmt, encoding)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as fh:
+                    fh.write(body)
+                os.replace(tmp_path, path)
+        _prune(directory, keep)
+    except OSError as exc:
+        logger.warning("Could not write schema artifact to %s: %s", directory, exc)
+    return SchemaArtifact(version, bodies)
+
+
+def _prune(directory, keep):
+    """Keep the artifacts of the ``keep`` most recently built versions."""
+    versions = {}
+    for name in os.listdir(directory):
+        if name.startswith("openapi-") and not name.endswith(".tmp"):
+            path = os.path.join(directory, name)
+            version = name[len("openapi-"):].split(".", 1)[0]
+            versions[version] = max(versions.get(version, 0), os.path.getmtime(path))
+    stale = sorted(versions, key=versions.get, reverse=True)[keep:]
+    for name in os.listdir(directory):
+        if any(name.startswith(f"openapi-{version}.") for version in stale):
+            os.remove(os.path.join(directory, name))
+
+
+def load(directory, version):
+    """Load a previously built artifact, or return None if any part is missing."""
+    bodies = {}
+    for fmt in FORMATS:
+        bodies[fmt] = {}
+        for encoding in ("identity", "gzip", "br"):
+            try:
+                with open(_path(directory, version, fmt, encoding), "rb") as fh:
+                    bodies[fmt][encoding] = fh.read()
+            except FileNotFoundError:
+                if encoding != "br":
+                    return None
+        if "br" not in bodies[fmt] and brotli is not None:
+            bodies[fmt]["br"] = brotli.compress(bodies[fmt]["identity"], quality=11)
+    return SchemaArtifact(version, bodies)
+
+
+_artifact = None
+_lock = threading.Lock()
+
+
+def get_artifact():
+    """
+    Return the schema artifact for the running code.
+
+    Loaded from disk when `build_schema` has already produced it, built
+    otherwise, and memoized for the lifetime of the process.
+    """
+    global _artifact
+    if _artifact is not None:
+        return _artifact
+    with _lock:
+        if _artifact is None:
+            directory = str(settings.SCHEMA_CACHE_DIR)
+            version = code_fingerprint()
+            _artifact = load(directory, version) or build(directory, version)
+    return _artifact
+
+
+def clear():
+    """Forget the memoized artifact (used by tests and after `build_schema`)."""
+    global _artifact
+    with _lock:
+        _artifact = None
@@ -0,0 +1,59 @@
+"""
+Index-friendly text search for large tables.
+
+Substring search (`ILIKE '%q%'`) cannot use a B-tree index and scans the
+whole table. The helpers here only issue lookups that the `UPPER(column)`
+indexes can serve: exact matches and prefixes on `text_pattern_ops`
+indexes, and trigram similarity on `gin_trgm_ops` indexes where the
+pg_trgm extension is installed.
+"""
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Upper
+
+
+MIN_TRIGRAM_TERM_LENGTH = 3
+
+_trigram_support = {}
+
+
+def trigram_available(using="default"):
+    """Return True if the pg_trgm extension is installed in ``using``."""
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    key = (using, connection.settings_dict["NAME"])
+    if key not in _trigram_support:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_support[key] = cursor.fetchone() is not None
+    return _trigram_support[key]
+
+
+def search_users(queryset, term):
+    """
+    Filter a user queryset by ``term``, using the cheapest matching mode.
+
+    - A term containing "@" is an email address and is matched exactly.
+    - Otherwise email and name are matched by prefix.
+    - If no prefix matches, a term of three or more characters falls back
+      to trigram similarity, which tolerates typos and matches inside words.
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+    if "@" in term:
+        return queryset.filter(email__iexact=term)
+
+    prefix = queryset.filter(Q(email__istartswith=term) | Q(name__istartswith=term))
+    if len(term) < MIN_TRIGRAM_TERM_LENGTH or not trigram_available(queryset.db):
+        return prefix
+    if prefix.exists():
+        return prefix
+    return queryset.alias(
+        upper_email=Upper("email"), upper_name=Upper("name")
+    ).filter(
+        Q(upper_email__trigram_similar=term.upper())
+        | Q(upper_name__trigram_similar=term.upper())
+    )
@@ -0,0 +1,27 @@
+"""
+Serializers for the core APIs.
+"""
+
+from rest_framework import serializers
+
+from apps.core.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for the status of a background job."""
+
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "name",
+            "status",
+            "attempts",
+            "max_attempts",
+            "run_at",
+            "started_at",
+            "finished_at",
+            "result",
+            "created_at",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,12 @@
+"""
+Background tasks of the core app, run by `manage.py run_worker`.
+"""
+
+from apps.core import purge
+from apps.core.jobs import task
+
+
+@task("core.purge")
+def run_purge(purge_id):
+    """Run a queued account or bulk deletion."""
+    return {"deleted": purge.run(purge_id)}
@@ -1,9 +1,18 @@
 """Test for Django admin modifications"""
 
-from django.test import TestCase, Client
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from apps.core.models import Change, Ingredient, Recipe, Tag
+from apps.core.search import trigram_available
+from apps.recipe import autocomplete
+
 
 class AdminSiteTest(TestCase):
     """
@@ -72,3 +81,244 @@ class AdminSiteTest(TestCase):
         url = reverse("admin:core_user_add")
         res = self.client.get(url)
         self.assertEqual(res.status_code, 200)
+
+
+class CatalogAdminTests(TestCase):
+    """
+    Test suite for the Recipe, Tag and Ingredient admin pages.
+
+    The changelists must run a fixed number of queries no matter how many rows
+    are shown, and the recipe form must not render every tag and ingredient.
+    """
+
+    def setUp(self) -> None:
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email="testAdmin@example.com", password="Pass!2024"
+        )
+        self.client.force_login(self.admin_user)
+        self.owners = 0
+
+    def create_recipes(self, count):
+        """Create ``count`` recipes, each with its own owner, tag and ingredient."""
+        for n in range(count):
+            self.owners += 1
+            owner = get_user_model().objects.create_user(
+                email=f"owner{self.owners}@example.com", password="Test@1234"
+            )
+            recipe = Recipe.objects.create(
+                user=owner, title=f"Recipe {n}", time_minute=5, price=Decimal("1.00")
+            )
+            recipe.tags.add(Tag.objects.create(user=owner, name=f"Tag {n}"))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=owner, name=f"Ingredient {n}")
+            )
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_count_is_constant(self):
+        """Test changelists do not issue a query per row (N+1)."""
+        for model in ("recipe", "tag", "ingredient"):
+            Recipe.objects.all().delete()
+            self.create_recipes(2)
+            url = reverse(f"admin:core_{model}_changelist")
+            few = self.count_queries(url)
+
+            self.create_recipes(10)
+            many = self.count_queries(url)
+
+            self.assertEqual(few, many, model)
+
+    def test_recipe_search_by_title_prefix(self):
+        """Test recipe search matches title prefixes."""
+        self.create_recipes(1)
+        owner = get_user_model().objects.create_user(
+            email="cook@example.com", password="Test@1234"
+        )
+        Recipe.objects.create(
+            user=owner, title="Curry", time_minute=5, price=Decimal("1.00")
+        )
+
+        res = self.client.get(reverse("admin:core_recipe_changelist"), {"q": "cur"})
+
+        self.assertContains(res, "Curry")
+        self.assertNotContains(res, "Recipe 0")
+
+    def test_recipe_form_does_not_load_all_tags(self):
+        """Test the change form only renders the recipe's own tags."""
+        self.create_recipes(3)
+        recipe = Recipe.objects.get(title="Recipe 0")
+
+        res = self.client.get(reverse("admin:core_recipe_change", args=[recipe.id]))
+
+        self.assertContains(res, "Tag 0")
+        self.assertNotContains(res, "Tag 1")
+        self.assertNotContains(res, "Ingredient 2")
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1000)
+    def test_large_changelist_uses_estimated_count(self):
+        """Test unfiltered lists of large tables use the planner estimate."""
+        self.create_recipes(1)
+        with patch(
+            "apps.core.paginator.estimated_count", return_value=5_000_000
+        ) as estimate:
+            res = self.client.get(reverse("admin:core_recipe_changelist"))
+            self.assertContains(res, "5000000")
+            estimate.assert_called_once()
+
+            res = self.client.get(reverse("admin:core_recipe_changelist"), {"q": "Rec"})
+            self.assertEqual(res.context["cl"].result_count, 1)
+            estimate.assert_called_once()
+
+
+class UserAdminSearchTests(TestCase):
+    """
+    Test suite for the user admin search.
+
+    Search must only use lookups the user indexes can serve: exact email,
+    email/name prefix, and trigram similarity where pg_trgm is installed.
+    """
+
+    def setUp(self) -> None:
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email="testAdmin@example.com", password="Pass!2024"
+        )
+        self.client.force_login(self.admin_user)
+        for email, name in [
+            ("alice@example.com", "Alice Smith"),
+            ("alicia@example.com", "Alicia Jones"),
+            ("bob@example.com", "Bob Malice"),
+        ]:
+            get_user_model().objects.create_user(
+                email=email, name=name, password="Test@1234"
+            )
+
+    def search(self, term):
+        res = self.client.get(reverse("admin:core_user_changelist"), {"q": term})
+        self.assertEqual(res.status_code, 200)
+        return sorted(user.email for user in res.context["cl"].result_list)
+
+    def test_search_by_exact_email(self):
+        """Test a term containing "@" only matches that exact email."""
+        self.assertEqual(self.search("ALICE@example.com"), ["alice@example.com"])
+
+    def test_search_by_prefix(self):
+        """Test email and name prefixes match, case-insensitively."""
+        self.assertEqual(
+            self.search("ali"), ["alice@example.com", "alicia@example.com"]
+        )
+        self.assertEqual(self.search("bob m"), ["bob@example.com"])
+
+    def test_search_does_not_scan_for_substrings(self):
+        """Test the search SQL has no leading-wildcard pattern."""
+        with CaptureQueriesContext(connection) as queries:
+            self.search("ali")
+
+        self.assertFalse(any("%ali" in q["sql"].lower() for q in queries))
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1000)
+    def test_large_user_list_uses_estimated_count(self):
+        """Test the unfiltered user changelist uses the planner estimate."""
+        with patch("apps.core.paginator.estimated_count", return_value=2_000_000):
+            res = self.client.get(reverse("admin:core_user_changelist"))
+
+        self.assertContains(res, "2000000")
+
+    def test_search_falls_back_to_trigram_similarity(self):
+        """Test a misspelled term with no prefix match finds similar names."""
+        if not trigram_available():
+            self.skipTest("pg_trgm is not installed")
+        self.assertEqual(self.search("Alise Smith"), ["alice@example.com"])
+
+
+class AdminChangeLogTests(TestCase):
+    """Test admin writes are recorded in the owners' change logs."""
+
+    def setUp(self):
+        autocomplete.clear()
+        self.addCleanup(autocomplete.clear)
+        self.client = Client()
+        self.client.force_login(
+            get_user_model().objects.create_superuser(
+                email="testAdmin@example.com", password="Pass!2024"
+            )
+        )
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.tag = Tag.objects.create(user=self.user, name="Dinner")
+        self.ingredient = Ingredient.objects.create(user=self.user, name="Rice")
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minute=5, price=Decimal("1.00")
+        )
+        self.recipe.tags.add(self.tag)
+
+    def logged(self, **filters):
+        return set(
+            Change.objects.filter(user=self.user, **filters).values_list(
+                "kind", "object_id", "deleted"
+            )
+        )
+
+    def test_recipe_create_is_logged(self):
+        """Test a recipe created in the admin, with its tags, is logged."""
+        res = self.client.post(
+            reverse("admin:core_recipe_add"),
+            {
+                "title": "Stew",
+                "time_minute": 30,
+                "price": "4.00",
+                "user": self.user.id,
+                "tags": [self.tag.id],
+                "ingredients": [self.ingredient.id],
+                "thumbnails": "{}",
+            },
+        )
+
+        self.assertEqual(res.status_code, 302)
+        recipe = Recipe.objects.get(title="Stew")
+        self.assertEqual(self.logged(), {(Change.Kind.RECIPE, recipe.id, False)})
+
+    def test_tag_rename_is_logged_and_seen_by_indexes(self):
+        """Test renaming a tag logs it and its recipes, and updates indexes."""
+        autocomplete.tags.warm(self.user.id)
+
+        res = self.client.post(
+            reverse("admin:core_tag_change", args=[self.tag.id]),
+            {"name": "Supper", "user": self.user.id},
+        )
+
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(
+            self.logged(),
+            {
+                (Change.Kind.TAG, self.tag.id, False),
+                (Change.Kind.RECIPE, self.recipe.id, False),
+            },
+        )
+        with autocomplete.tags.get(self.user.id) as index:
+            self.assertEqual(index.complete("s", 10), [(self.tag.id, "Supper")])
+
+    def test_deletes_are_logged(self):
+        """Test deletes from the change form and the changelist are logged."""
+        res = self.client.post(
+            reverse("admin:core_recipe_delete", args=[self.recipe.id]), {"post": "yes"}
+        )
+        self.assertEqual(res.status_code, 302)
+
+        res = self.client.post(
+            reverse("admin:core_tag_changelist"),
+            {"action": "delete_selected", "_selected_action": [self.tag.id], "post": "yes"},
+        )
+        self.assertEqual(res.status_code, 302)
+
+        self.assertFalse(Tag.objects.exists())
+        self.assertEqual(
+            self.logged(deleted=True),
+            {(Change.Kind.RECIPE, self.recipe.id, True), (Change.Kind.TAG, self.tag.id, True)},
+        )
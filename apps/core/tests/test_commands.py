@@ -1,10 +1,24 @@
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
 from django.db.utils import OperationalError
-from psycopg import OperationalError as PsycopgError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+from rest_framework.authtoken.models import Token
 
+from apps.core.management.commands.startup_profile import (
+    group_by_package,
+    parse_importtime,
+)
+from apps.core.models import Ingredient, Recipe, Tag
 
+
+@patch("apps.core.management.commands.wait_for_db.time.sleep")
+@patch("apps.core.management.commands.wait_for_db.ping_new_connection")
 class CommandTests(SimpleTestCase):
     """
     Test suite for the `wait_for_db` management command.
@@ -15,40 +29,245 @@ class CommandTests(SimpleTestCase):
     the database becoming available after a delay.
     """
 
-    @patch("apps.core.management.commands.wait_for_db.Command.check")
-    def test_wait_for_db_ready(self, mock_check):
+    def test_wait_for_db_ready(self, mock_ping, mock_sleep):
         """
         Test the `wait_for_db` command when the database is ready.
 
         This test simulates the scenario where the database is immediately available.
-        It verifies that the `check` method is called once and the command completes
+        It verifies that the database is pinged once and the command completes
         without further retries.
         """
-        mock_check.return_value = True  # Simulate the database being ready
-
-        call_command("wait_for_db")
+        call_command("wait_for_db", stdout=StringIO())
 
-        mock_check.assert_called_once_with(databases=["default"])
+        mock_ping.assert_called_once()
+        self.assertEqual(mock_ping.call_args.args, ("default",))
+        mock_sleep.assert_not_called()
 
-    @patch("apps.core.management.commands.wait_for_db.Command.check")
-    @patch("time.sleep")  # Mock sleep to avoid actual delays during testing
-    def test_wait_for_db_delay(self, mock_sleep, mock_check):
+    def test_wait_for_db_delay(self, mock_ping, mock_sleep):
         """
         Test the `wait_for_db` command when the database is initially unavailable and then becomes ready.
 
         This test simulates the scenario where the database is unavailable initially,
-        but becomes available after several retries. It verifies that the `check` method
-        is called multiple times and that the command waits between retries.
+        but becomes available after several retries. It verifies that the delay
+        between retries grows exponentially, with jitter, up to the maximum.
         """
-        mock_check.side_effect = [PsycopgError] * 2 + [OperationalError] * 3 + [True]
+        mock_ping.side_effect = [OperationalError] * 6 + [None]
+
+        call_command(
+            "wait_for_db", initial_delay=1, max_delay=8, timeout=0, stdout=StringIO()
+        )
+
+        self.assertEqual(mock_ping.call_count, 7)
+        delays = [call.args[0] for call in mock_sleep.call_args_list]
+        for delay, ceiling in zip(delays, [1, 2, 4, 8, 8, 8]):
+            self.assertGreaterEqual(delay, ceiling / 2)
+            self.assertLessEqual(delay, ceiling)
+
+    @patch("apps.core.management.commands.wait_for_db.time.monotonic")
+    def test_wait_for_db_timeout(self, mock_monotonic, mock_ping, mock_sleep):
+        """Test the command fails once the total timeout would be exceeded."""
+        mock_ping.side_effect = OperationalError("connection refused")
+        clock = iter(range(0, 1000, 3))
+        mock_monotonic.side_effect = lambda: next(clock)
+
+        with self.assertRaisesMessage(CommandError, "connection refused"):
+            call_command("wait_for_db", timeout=10, max_delay=1, stdout=StringIO())
+
+        self.assertLess(mock_ping.call_count, 10)
+
+    @patch("apps.core.management.commands.wait_for_db.pending_migrations")
+    def test_wait_for_migrations(self, mock_pending, mock_ping, mock_sleep):
+        """Test --migrations waits until no migration is pending."""
+        mock_pending.side_effect = [[("core", "0008_x")], []]
+
+        call_command("wait_for_db", migrations=True, stdout=StringIO())
+
+        self.assertEqual(mock_pending.call_count, 2)
+        self.assertEqual(mock_sleep.call_count, 1)
+
+
+class BulkCreateUsersCommandTests(TestCase):
+    """Test suite for the `bulk_create_users` management command."""
+
+    def test_creates_users_with_hashed_passwords(self):
+        """Test synthetic users are created with usable, salted passwords."""
+        out = StringIO()
+
+        call_command(
+            "bulk_create_users",
+            count=3,
+            password="Bulk!2024",
+            batch_size=2,
+            workers=1,
+            stdout=out,
+        )
+
+        users = get_user_model().objects.order_by("email")
+        self.assertEqual(
+            [user.email for user in users],
+            ["user0@example.com", "user1@example.com", "user2@example.com"],
+        )
+        for user in users:
+            self.assertTrue(user.check_password("Bulk!2024"))
+        self.assertNotEqual(users[0].password, users[1].password)
+        self.assertIn("Created 3 users", out.getvalue())
+
+    def test_skips_existing_users(self):
+        """Test users whose email already exists are skipped, not duplicated."""
+        get_user_model().objects.create_user(
+            email="user1@example.com", password="Test@1234"
+        )
+
+        call_command("bulk_create_users", count=3, workers=1, stdout=StringIO())
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        existing = get_user_model().objects.get(email="user1@example.com")
+        self.assertTrue(existing.check_password("Test@1234"))
+
+    def test_issues_tokens(self):
+        """Test `--tokens` issues one auth token per created user."""
+        call_command(
+            "bulk_create_users", count=2, workers=1, tokens=True, stdout=StringIO()
+        )
+
+        self.assertEqual(Token.objects.count(), 2)
+        self.assertEqual(
+            set(Token.objects.values_list("user__email", flat=True)),
+            {"user0@example.com", "user1@example.com"},
+        )
+
+    def test_hashes_in_process_pool(self):
+        """Test passwords hashed by pool workers are valid."""
+        call_command(
+            "bulk_create_users", count=4, batch_size=1, workers=2, stdout=StringIO()
+        )
+
+        users = get_user_model().objects.all()
+        self.assertEqual(users.count(), 4)
+        for user in users:
+            self.assertTrue(user.check_password("Pass!2024"))
+
+    def test_reads_users_from_csv(self):
+        """Test users can be provisioned from a CSV file."""
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".csv", delete=False, encoding="utf-8"
+        ) as fh:
+            fh.write("email,name,password\n")
+            fh.write("alice@Example.com,Alice,Alice!2024\n")
+            fh.write("bob@example.com,Bob,Bob!2024\n")
+        self.addCleanup(os.remove, fh.name)
+
+        call_command("bulk_create_users", csv_path=fh.name, workers=1, stdout=StringIO())
+
+        alice = get_user_model().objects.get(email="alice@example.com")
+        self.assertEqual(alice.name, "Alice")
+        self.assertTrue(alice.check_password("Alice!2024"))
+        self.assertTrue(get_user_model().objects.filter(email="bob@example.com").exists())
+
+
+class SeedPerfDataCommandTests(TestCase):
+    """Test suite for the `seed_perf_data` management command."""
+
+    def _seed(self, **options):
+        defaults = {
+            "users": 5,
+            "recipes_per_user": 4,
+            "tags_per_user": 6,
+            "ingredients_per_user": 10,
+            "seed": 7,
+            "stdout": StringIO(),
+        }
+        defaults.update(options)
+        call_command("seed_perf_data", **defaults)
+
+    def _snapshot(self):
+        return [
+            (
+                recipe.user.email,
+                recipe.title,
+                recipe.time_minute,
+                recipe.price,
+                sorted(tag.name for tag in recipe.tags.all()),
+                sorted(ingredient.name for ingredient in recipe.ingredients.all()),
+            )
+            for recipe in Recipe.objects.order_by("id")
+        ]
+
+    def test_seeds_users_vocabulary_and_tokens(self):
+        """Test every seeded user gets a token and a full tag/ingredient vocabulary."""
+        self._seed()
+
+        self.assertEqual(get_user_model().objects.count(), 5)
+        self.assertEqual(Token.objects.count(), 5)
+        self.assertEqual(Tag.objects.count(), 5 * 6)
+        self.assertEqual(Ingredient.objects.count(), 5 * 10)
+        for recipe in Recipe.objects.all():
+            self.assertGreaterEqual(recipe.ingredients.count(), 2)
+            self.assertTrue(
+                all(tag.user_id == recipe.user_id for tag in recipe.tags.all())
+            )
+
+    def test_same_seed_is_deterministic(self):
+        """Test seeding twice with the same seed produces the same dataset."""
+        self._seed()
+        first = self._snapshot()
+        get_user_model().objects.all().delete()
+
+        self._seed()
+
+        self.assertEqual(self._snapshot(), first)
+
+    def test_tag_reuse_is_skewed(self):
+        """Test the most common tag is used far more often than the rarest."""
+        self._seed(users=2, recipes_per_user=200, tags_per_user=20)
+
+        usage = sorted(
+            Tag.objects.annotate(uses=Count("recipe")).values_list("uses", flat=True)
+        )
+        self.assertGreater(usage[-1], 4 * max(usage[0], 1))
+
+    def test_rejects_light_tailed_alpha(self):
+        """Test a Pareto shape of 1 or less is rejected."""
+        with self.assertRaises(CommandError):
+            self._seed(alpha=1)
+
+
+class StartupProfileCommandTests(SimpleTestCase):
+    """Test the startup_profile command."""
+
+    def test_parse_importtime(self):
+        """Test -X importtime lines are parsed with their nesting depth."""
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     yaml.error\n"
+            "import time:      2500 |       2620 |   yaml\n"
+            "import time:       300 |       2920 | rest_framework.compat\n"
+            "unrelated line\n"
+        )
+
+        imports = parse_importtime(output)
+
+        self.assertEqual(
+            imports,
+            [
+                ("yaml.error", 120, 120, 2),
+                ("yaml", 2500, 2620, 1),
+                ("rest_framework.compat", 300, 2920, 0),
+            ],
+        )
+        self.assertEqual(
+            group_by_package(imports), {"yaml": 2620, "rest_framework": 300}
+        )
 
-        call_command("wait_for_db")
+    def test_compare_reports_both_modes(self):
+        """Test the command profiles a real worker start in both modes."""
+        out = StringIO()
 
-        self.assertEqual(mock_check.call_count, 6)  # Ensure `check` was called 6 times
+        call_command("startup_profile", compare=True, repeat=1, top=5, stdout=out)
 
-        mock_check.assert_called_with(
-            databases=["default"]
-        )  # Ensure the last call had the correct arguments
-        mock_sleep.assert_called_with(
-            1
-        )  # Ensure `sleep` was called with a 1-second delay during retries
+        output = out.getvalue()
+        self.assertIn("== full ==", output)
+        self.assertIn("== API-only ==", output)
+        self.assertIn("401 Unauthorized", output)
+        self.assertIn("django", output)
+        self.assertIn("time to first request", output)
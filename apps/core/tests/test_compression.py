@@ -0,0 +1,186 @@
+"""Tests for response compression"""
+
+import asyncio
+import gzip
+import json
+from decimal import Decimal
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.core import http
+from apps.core.middleware import CompressionMiddleware
+from apps.core.models import Recipe
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+SCHEMA_URL = reverse("schema")
+
+BODY = json.dumps([{"id": n, "title": f"Recipe {n}"} for n in range(100)]).encode()
+
+
+def process(response, accept_encoding="gzip"):
+    """Run ``response`` through the middleware for a request."""
+    request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test which responses are compressed, and how."""
+
+    def test_gzip(self):
+        """Test a large JSON body is gzipped for a gzip-only client."""
+        res = process(HttpResponse(BODY, content_type="application/json"))
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(res["Content-Length"], str(len(res.content)))
+        self.assertEqual(gzip.decompress(res.content), BODY)
+        self.assertEqual(res["Vary"], "Accept-Encoding")
+
+    @skipIf(http.brotli is None, "brotli is not installed")
+    def test_brotli_preferred(self):
+        """Test Brotli is used when the client accepts it."""
+        res = process(
+            HttpResponse(BODY, content_type="application/json"), "gzip, deflate, br"
+        )
+
+        self.assertEqual(res["Content-Encoding"], "br")
+        self.assertEqual(http.brotli.decompress(res.content), BODY)
+
+    def test_client_preference_respected(self):
+        """Test a lower q-value for Brotli makes gzip win."""
+        res = process(
+            HttpResponse(BODY, content_type="application/json"), "br;q=0.5, gzip"
+        )
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+
+    def test_identity(self):
+        """Test nothing is compressed without an acceptable coding."""
+        res = process(HttpResponse(BODY, content_type="application/json"), "")
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+        self.assertEqual(res.content, BODY)
+        self.assertEqual(res["Vary"], "Accept-Encoding")
+
+    def test_small_body_not_compressed(self):
+        """Test bodies below COMPRESSION_MIN_SIZE are sent as they are."""
+        res = process(HttpResponse(BODY[:1000], content_type="application/json"))
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+        self.assertFalse(res.has_header("Vary"))
+
+    def test_incompressible_type_skipped(self):
+        """Test binary content types are not compressed."""
+        res = process(HttpResponse(BODY, content_type="image/png"))
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+
+    def test_already_encoded_skipped(self):
+        """Test a response with its own Content-Encoding is left alone."""
+        response = HttpResponse(BODY, content_type="application/json")
+        response["Content-Encoding"] = "identity"
+
+        res = process(response)
+
+        self.assertEqual(res["Content-Encoding"], "identity")
+        self.assertEqual(res.content, BODY)
+
+    def test_no_transform_skipped(self):
+        """Test Cache-Control: no-transform forbids compression."""
+        response = HttpResponse(BODY, content_type="application/json")
+        response["Cache-Control"] = "private, no-transform"
+
+        self.assertFalse(process(response).has_header("Content-Encoding"))
+
+    def test_strong_etag_weakened(self):
+        """Test a strong ETag becomes weak on the compressed representation."""
+        response = HttpResponse(BODY, content_type="application/json")
+        response["ETag"] = '"abc"'
+
+        self.assertEqual(process(response)["ETag"], 'W/"abc"')
+
+    def test_vary_merged(self):
+        """Test Accept-Encoding is added to an existing Vary header."""
+        response = JsonResponse(json.loads(BODY), safe=False)
+        response["Vary"] = "Origin"
+
+        self.assertEqual(process(response)["Vary"], "Origin, Accept-Encoding")
+
+    def test_streaming(self):
+        """Test streamed chunks are compressed into one gzip stream."""
+        chunks = [BODY[:500], BODY[500:]]
+        response = StreamingHttpResponse(iter(chunks), content_type="application/json")
+        response["Content-Length"] = str(len(BODY))
+
+        res = process(response)
+        parts = list(res.streaming_content)
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertFalse(res.has_header("Content-Length"))
+        # Every chunk is flushed as soon as it is compressed.
+        self.assertEqual(len(parts), 3)
+        self.assertEqual(gzip.decompress(b"".join(parts)), BODY)
+
+    def test_async_streaming(self):
+        """Test async streaming responses stay async and decompress."""
+
+        async def chunks():
+            yield BODY[:500]
+            yield BODY[500:]
+
+        res = process(StreamingHttpResponse(chunks(), content_type="text/csv"))
+
+        async def collect():
+            return [part async for part in res.streaming_content]
+
+        self.assertTrue(res.is_async)
+        self.assertEqual(gzip.decompress(b"".join(asyncio.run(collect()))), BODY)
+
+    def test_event_stream_not_compressed(self):
+        """Test server-sent events are not buffered in a compressor."""
+        response = StreamingHttpResponse(iter([BODY]), content_type="text/event-stream")
+
+        self.assertFalse(process(response).has_header("Content-Encoding"))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class CompressedApiTests(TestCase):
+    """Test compression of API responses end to end."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client.force_authenticate(self.user)
+        Recipe.objects.bulk_create(
+            Recipe(user=self.user, title=f"Recipe {n}", time_minute=10, price=Decimal("2.50"))
+            for n in range(20)
+        )
+
+    def test_recipe_list_with_cors(self):
+        """Test a cross-origin recipe list is compressed with CORS headers kept."""
+        res = self.client.get(
+            RECIPES_URL,
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_ORIGIN="http://localhost:3000",
+        )
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(res["Access-Control-Allow-Origin"], "http://localhost:3000")
+        self.assertIn("origin", res["Vary"].lower())
+        self.assertIn("Accept-Encoding", res["Vary"])
+        self.assertEqual(len(json.loads(gzip.decompress(res.content))), 20)
+
+    def test_precompressed_schema_untouched(self):
+        """Test the schema view's own encoding is not compressed again."""
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertTrue(gzip.decompress(res.content))
@@ -0,0 +1,279 @@
+"""Tests for change notifications and the server-sent events stream"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from apps.core import events
+from apps.core.changes import record_changes
+from apps.core.models import Change
+
+
+STREAM_PATH = "/api/recipe/events/"
+
+
+def parse_sse(body):
+    """Return the (event, data) pairs of the messages in ``body``."""
+    messages = []
+    for block in body.decode().split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in block.splitlines() if not line.startswith(":")
+        )
+        if "event" in fields:
+            messages.append((fields["event"], json.loads(fields["data"])))
+    return messages
+
+
+def deliver(broker, user_id, entries):
+    """Deliver an event as a committed `publish` does."""
+    broker.hub.deliver(events.make_event(user_id, entries))
+
+
+class BrokerTests(SimpleTestCase):
+    """Test the in-process fan-out and its backpressure."""
+
+    def setUp(self):
+        self.broker = events.InMemoryBroker()
+
+    def test_delivers_to_the_users_subscriptions(self):
+        """Test events reach every stream of their user, and only theirs."""
+
+        async def scenario():
+            mine = [await self.broker.subscribe(1), await self.broker.subscribe(1)]
+            other = await self.broker.subscribe(2)
+            deliver(self.broker, 1, [(5, "recipe", 9, "created")])
+            received = [await s.get(timeout=1) for s in mine]
+            return received, await other.get(timeout=0.05)
+
+        received, other = asyncio.run(scenario())
+
+        self.assertEqual([event["seq"] for event in received], [5, 5])
+        self.assertIsNone(other)
+
+    @override_settings(EVENTS_QUEUE_SIZE=2)
+    def test_overflow_asks_for_resync(self):
+        """Test a slow stream's queue is dropped instead of growing."""
+
+        async def scenario():
+            subscription = await self.broker.subscribe(1)
+            for seq in range(1, 5):
+                deliver(self.broker, 1, [(seq, "tag", seq, "updated")])
+            await asyncio.sleep(0)
+            return [await subscription.get(timeout=0.05) for _ in range(3)]
+
+        received = asyncio.run(scenario())
+
+        self.assertEqual(received[0], {"overflow": True})
+        self.assertEqual(received[1]["seq"], 4)
+        self.assertIsNone(received[2])
+
+    def test_large_batches_are_not_listed(self):
+        """Test a batch too large for one notification only carries its range."""
+        entries = [(seq, "recipe", seq, "updated") for seq in range(1, 2000)]
+
+        event = events.make_event(1, entries)
+
+        self.assertEqual((event["from_seq"], event["seq"]), (1, 1999))
+        self.assertIsNone(event["changes"])
+
+
+@override_settings(EVENTS_HEARTBEAT_SECONDS=0.05)
+class EventStreamTests(SimpleTestCase):
+    """Test the events a stream produces."""
+
+    def setUp(self):
+        events.reset_broker()
+        self.addCleanup(events.reset_broker)
+
+    def collect(self, cursor, latest_seq, publish=(), count=3):
+        async def scenario():
+            stream = events.event_stream(1, cursor, latest_seq)
+            chunks = [await anext(stream)]  # Subscribed once this is sent.
+            for entries in publish:
+                deliver(events.get_broker(), 1, entries)
+            for _ in range(count):
+                chunks.append(await anext(stream))
+            await stream.aclose()
+            return b"".join(chunks)
+
+        return asyncio.run(scenario())
+
+    def test_change_events(self):
+        """Test contiguous changes are sent with their sequence number as id."""
+        body = self.collect(
+            3, 3, publish=[[(4, "recipe", 1, "created"), (5, "tag", 2, "updated")]], count=1
+        )
+
+        self.assertIn(b"id: 5\n", body)
+        self.assertEqual(
+            parse_sse(body),
+            [
+                (
+                    "change",
+                    {
+                        "seq": 5,
+                        "changes": [
+                            {"seq": 4, "kind": "recipe", "id": 1, "action": "created"},
+                            {"seq": 5, "kind": "tag", "id": 2, "action": "updated"},
+                        ],
+                    },
+                )
+            ],
+        )
+
+    def test_client_behind_is_told_to_sync(self):
+        """Test a stale Last-Event-ID gets a sync event first."""
+        body = self.collect(2, 7, count=1)
+
+        self.assertEqual(parse_sse(body), [("sync", {"seq": 7})])
+
+    def test_gap_is_told_to_sync(self):
+        """Test a missed notification turns the next one into a sync event."""
+        body = self.collect(3, 3, publish=[[(6, "recipe", 1, "deleted")]], count=1)
+
+        self.assertEqual(parse_sse(body), [("sync", {"seq": 6})])
+
+    def test_heartbeat(self):
+        """Test idle streams get keep-alive comments."""
+        body = self.collect(0, 0, count=2)
+
+        self.assertEqual(body.count(b": keep-alive\n\n"), 2)
+
+
+class ChangeStreamApplicationTests(TestCase):
+    """Test the ASGI change stream endpoint."""
+
+    def setUp(self):
+        events.reset_broker()
+        self.addCleanup(events.reset_broker)
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.application = events.ChangeStreamApplication(self.fail_not_stream)
+
+    async def fail_not_stream(self, scope, receive, send):
+        raise AssertionError("Request passed on to Django.")
+
+    def write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_changes(self.user.id, created=[(Change.Kind.RECIPE, 42)])
+
+    async def open_stream(self, headers):
+        """Start a request; return (response messages, disconnect, task)."""
+        messages = asyncio.Queue()
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": STREAM_PATH,
+            "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+        }
+        task = asyncio.create_task(self.application(scope, receive, messages.put))
+        return messages, disconnect, task
+
+    async def test_requires_token(self):
+        """Test streams need a valid token."""
+        messages, _, task = await self.open_stream({"authorization": "Token nope"})
+        await task
+
+        start = await messages.get()
+        self.assertEqual(start["status"], 401)
+
+    async def test_streams_changes(self):
+        """Test a committed change reaches an open stream, with CORS headers."""
+        messages, disconnect, task = await self.open_stream(
+            {
+                "authorization": f"Token {self.token.key}",
+                "origin": "http://localhost:3000",
+            }
+        )
+        start = await asyncio.wait_for(messages.get(), 1)
+        connected = await asyncio.wait_for(messages.get(), 1)
+        await sync_to_async(self.write)()
+        change = await asyncio.wait_for(messages.get(), 1)
+        disconnect.set()
+        await asyncio.wait_for(task, 1)
+
+        headers = dict(start["headers"])
+        self.assertEqual(start["status"], 200)
+        self.assertEqual(headers[b"content-type"], b"text/event-stream")
+        self.assertEqual(headers[b"access-control-allow-origin"], b"http://localhost:3000")
+        self.assertIn(b": connected", connected["body"])
+        self.assertEqual(
+            parse_sse(change["body"]),
+            [
+                (
+                    "change",
+                    {
+                        "seq": 1,
+                        "changes": [
+                            {"seq": 1, "kind": "recipe", "id": 42, "action": "created"}
+                        ],
+                    },
+                )
+            ],
+        )
+        self.assertEqual(len(events.get_broker().hub), 0)
+
+    async def test_other_paths_go_to_django(self):
+        """Test requests for other paths are passed on."""
+        calls = []
+
+        async def django_app(scope, receive, send):
+            calls.append(scope["path"])
+
+        await events.ChangeStreamApplication(django_app)(
+            {"type": "http", "path": "/api/recipe/recipes/"}, None, None
+        )
+
+        self.assertEqual(calls, ["/api/recipe/recipes/"])
+
+
+class PostgresBrokerTests(TransactionTestCase):
+    """Test notifications through Postgres LISTEN/NOTIFY."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+
+    def test_notify_is_sent_in_the_write_transaction(self):
+        """Test publishing is a pg_notify in the caller's transaction."""
+        with CaptureQueriesContext(connection) as queries:
+            events.PostgresBroker().publish(self.user.id, [(1, "tag", 3, "created")])
+
+        self.assertIn("pg_notify", queries[-1]["sql"])
+
+    def test_listen(self):
+        """Test a committed notification reaches a subscriber of this process."""
+        broker = events.PostgresBroker()
+
+        async def scenario():
+            subscription = await broker.subscribe(self.user.id)
+            await sync_to_async(broker.publish, thread_sensitive=False)(
+                self.user.id, [(1, "recipe", 7, "updated")]
+            )
+            event = await subscription.get(timeout=5)
+            broker._listener.cancel()
+            return event
+
+        event = asyncio.run(scenario())
+
+        self.assertEqual(event["changes"][0]["id"], 7)
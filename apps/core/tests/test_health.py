@@ -0,0 +1,90 @@
+"""Tests for the health checks and the /healthz and /readyz probes"""
+
+from unittest.mock import patch
+
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.core import health
+
+
+HEALTHZ_URL = reverse("core:healthz")
+READYZ_URL = reverse("core:readyz")
+
+
+class HealthCheckTests(TestCase):
+    """Test the database checks themselves."""
+
+    def test_ping_new_connection(self):
+        """Test a fresh connection to the test database answers."""
+        health.ping_new_connection()
+
+    def test_no_pending_migrations(self):
+        """Test the migrated test database has nothing pending."""
+        self.assertEqual(health.pending_migrations(), [])
+
+    def test_unapplied_migration_is_pending(self):
+        """Test a migration missing from django_migrations is reported."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM django_migrations WHERE app = 'core' AND name = %s",
+                ["0008_unique_tag_ingredient_names"],
+            )
+
+        self.assertEqual(
+            health.pending_migrations(), [("core", "0008_unique_tag_ingredient_names")]
+        )
+
+
+class ProbeTests(TestCase):
+    """Test the orchestrator probe endpoints."""
+
+    def setUp(self):
+        patcher = patch.object(health, "readiness", health.ReadinessCheck())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_healthz_does_not_query(self):
+        """Test liveness never touches the database."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(HEALTHZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {"status": "ok"})
+        self.assertEqual(len(queries), 0)
+
+    def test_readyz_checks_migrations_once(self):
+        """Test readiness checks migrations until they pass, then only pings."""
+        res = self.client.get(READYZ_URL)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            res.json(), {"status": "ok", "database": "ok", "migrations": "ok"}
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([q["sql"] for q in queries], ["SELECT 1"])
+
+    @patch("apps.core.health.pending_migrations", return_value=[("core", "0099_x")])
+    def test_readyz_unavailable_with_pending_migrations(self, mock_pending):
+        """Test readiness fails while migrations are pending."""
+        res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()["migrations"], "1 pending")
+
+    @override_settings(READINESS_CHECK_MIGRATIONS=False)
+    @patch("apps.core.health.ping", side_effect=OperationalError("down"))
+    def test_readyz_unavailable_without_database(self, mock_ping):
+        """Test readiness fails when the database does not answer."""
+        res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(
+            res.json(),
+            {"status": "unavailable", "database": "unavailable: OperationalError"},
+        )
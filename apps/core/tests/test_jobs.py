@@ -0,0 +1,220 @@
+"""Tests for the background job queue"""
+
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core import jobs
+from apps.core.models import Job, Purge, Recipe
+from apps.core.tests.test_purge import create_catalog
+
+
+JOBS_URL = reverse("core:job-list")
+RECIPE_BULK_DELETE_URL = reverse("recipe:recipe-bulk-delete")
+
+
+def job_detail_url(job_id):
+    return reverse("core:job-detail", args=[job_id])
+
+
+@jobs.task("tests.add")
+def add(a, b):
+    return a + b
+
+
+@jobs.task("tests.fail")
+def fail():
+    raise ValueError("Failed on purpose.")
+
+
+def run_claimed(limit=10):
+    """Claim due jobs and run them in this thread; returns their statuses."""
+    with patch.object(jobs.logger, "warning"):
+        return [jobs.execute(*row) for row in jobs.claim(limit)]
+
+
+class JobQueueTests(TestCase):
+    """Test claiming, running and retrying jobs."""
+
+    def test_enqueue_unknown_task(self):
+        """Test only registered tasks can be queued."""
+        with self.assertRaises(LookupError):
+            jobs.enqueue("tests.missing")
+        self.assertFalse(Job.objects.exists())
+
+    def test_claim_due_jobs_in_order(self):
+        """Test claims take due jobs, oldest first, and mark them running."""
+        later = jobs.enqueue(
+            "tests.add", a=1, b=2, run_at=timezone.now() + timedelta(hours=1)
+        )
+        first = jobs.enqueue("tests.add", a=1, b=2)
+        second = jobs.enqueue("tests.add", a=3, b=4)
+
+        rows = sorted(jobs.claim(10))
+
+        self.assertEqual(
+            rows,
+            [
+                (first.id, "tests.add", {"a": 1, "b": 2}, 1, 5),
+                (second.id, "tests.add", {"a": 3, "b": 4}, 1, 5),
+            ],
+        )
+        self.assertEqual(jobs.claim(10), [])
+        first.refresh_from_db()
+        later.refresh_from_db()
+        self.assertEqual(first.status, Job.Status.RUNNING)
+        self.assertIsNotNone(first.started_at)
+        self.assertEqual(later.status, Job.Status.QUEUED)
+
+    def test_success_records_result(self):
+        """Test a job that returns is marked succeeded with its result."""
+        job = jobs.enqueue("tests.add", a=1, b=2)
+
+        self.assertEqual(run_claimed(), [Job.Status.SUCCEEDED])
+
+        job.refresh_from_db()
+        self.assertEqual(job.result, 3)
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(JOBS_BACKOFF_SECONDS=10)
+    def test_failure_retries_with_backoff(self):
+        """Test a failed job is queued again after a growing delay."""
+        job = jobs.enqueue("tests.fail", max_attempts=3)
+
+        self.assertEqual(run_claimed(), [Job.Status.QUEUED])
+        job.refresh_from_db()
+        first_delay = (job.run_at - timezone.now()).total_seconds()
+        self.assertTrue(4 < first_delay <= 10)
+        self.assertIn("Failed on purpose.", job.error)
+        # Not due yet.
+        self.assertEqual(run_claimed(), [])
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(run_claimed(), [Job.Status.QUEUED])
+        job.refresh_from_db()
+        self.assertTrue(9 < (job.run_at - timezone.now()).total_seconds() <= 20)
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(run_claimed(), [Job.Status.FAILED])
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_backoff_is_capped(self):
+        """Test the retry delay stops growing at JOBS_BACKOFF_MAX_SECONDS."""
+        with self.settings(JOBS_BACKOFF_SECONDS=10, JOBS_BACKOFF_MAX_SECONDS=60):
+            self.assertLessEqual(jobs.backoff(20), 60)
+            self.assertGreaterEqual(jobs.backoff(20), 30)
+
+    def test_lost_jobs_are_requeued(self):
+        """Test jobs of a dead worker are retried, or failed on their last try."""
+        retried = jobs.enqueue("tests.add", a=1, b=2)
+        exhausted = jobs.enqueue("tests.add", a=1, b=2, max_attempts=1)
+        jobs.claim(10)
+        Job.objects.update(started_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_lost(), 2)
+
+        retried.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual(retried.status, Job.Status.QUEUED)
+        self.assertEqual(exhausted.status, Job.Status.FAILED)
+
+    def test_delete_finished(self):
+        """Test finished jobs are deleted after the retention period."""
+        old = jobs.enqueue("tests.add", a=1, b=2)
+        recent = jobs.enqueue("tests.add", a=1, b=2)
+        run_claimed()
+        Job.objects.filter(id=old.id).update(
+            finished_at=timezone.now() - timedelta(days=8)
+        )
+
+        self.assertEqual(jobs.delete_finished(7), 1)
+        self.assertEqual(list(Job.objects.values_list("id", flat=True)), [recent.id])
+
+
+class JobApiTests(TestCase):
+    """Test the job status API."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        """Test authentication is required to see jobs."""
+        res = APIClient().get(JOBS_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bulk_delete_job_status(self):
+        """Test a bulk delete returns its job, which can be polled until done."""
+        recipes = create_catalog(self.user, recipes=2)
+
+        res = self.client.post(
+            RECIPE_BULK_DELETE_URL, {"ids": [recipes[0].id]}, format="json"
+        )
+        url = job_detail_url(res.data["job"])
+        self.assertEqual(self.client.get(url).data["status"], Job.Status.QUEUED)
+        run_claimed()
+
+        res = self.client.get(url)
+        self.assertEqual(res.data["status"], Job.Status.SUCCEEDED)
+        self.assertEqual(res.data["result"], {"deleted": 1})
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertFalse(Purge.objects.exists())
+
+    def test_list_only_own_jobs(self):
+        """Test users see only their own jobs, filtered by status."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        own = jobs.enqueue("tests.add", user_id=self.user.id, a=1, b=2)
+        failed = jobs.enqueue("tests.fail", user_id=self.user.id, max_attempts=1)
+        others = jobs.enqueue("tests.add", user_id=other.id, a=1, b=2)
+        run_claimed()
+
+        res = self.client.get(JOBS_URL)
+        self.assertEqual([job["id"] for job in res.data], [failed.id, own.id])
+        res = self.client.get(JOBS_URL, {"status": "failed"})
+        self.assertEqual([job["id"] for job in res.data], [failed.id])
+        self.assertNotIn("error", res.data[0])
+        res = self.client.get(job_detail_url(others.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class WorkerTests(TransactionTestCase):
+    """Test the worker command runs jobs on several threads."""
+
+    def test_run_worker_until_empty(self):
+        """Test every due job is run once, and failures are retried later."""
+        added = [jobs.enqueue("tests.add", a=n, b=1) for n in range(10)]
+        failing = jobs.enqueue("tests.fail")
+        out = StringIO()
+
+        with self.assertLogs("apps.core.jobs", "WARNING"):
+            call_command(
+                "run_worker", "--concurrency", 3, "--until-empty", stdout=out
+            )
+
+        self.assertIn("Ran 11 jobs.", out.getvalue())
+        self.assertEqual(
+            list(
+                Job.objects.filter(id__in=[job.id for job in added])
+                .order_by("id")
+                .values_list("result", flat=True)
+            ),
+            [n + 1 for n in range(10)],
+        )
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, Job.Status.QUEUED)
+        self.assertEqual(failing.attempts, 1)
@@ -0,0 +1,213 @@
+"""Tests for the metrics registry and the /metrics endpoint"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.core.metrics import (
+    MetricsRegistry,
+    registry,
+    render_prometheus,
+)
+
+
+METRICS_URL = reverse("core:metrics")
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    """Test aggregation and rendering without an HTTP round trip."""
+
+    def test_counters_from_many_threads_are_merged(self):
+        """Test per-thread shards add up to the true total."""
+        metrics = MetricsRegistry()
+
+        def work():
+            for _ in range(1000):
+                metrics.inc("jobs_total", {"kind": "a"})
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        counters = metrics.snapshot()["counters"]
+        self.assertEqual(counters[("jobs_total", (("kind", "a"),))], 4000)
+
+    def test_shards_of_exited_threads_are_retired(self):
+        """Test exited threads' shards are folded in, keeping their counts."""
+        metrics = MetricsRegistry()
+
+        def work():
+            metrics.inc("jobs_total")
+            metrics.observe("job_seconds", 0.002)
+
+        for _ in range(20):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        metrics.inc("jobs_total")
+
+        self.assertEqual(len(metrics._shards), 1)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["counters"][("jobs_total", ())], 21)
+        self.assertEqual(snapshot["histograms"][("job_seconds", ())]["count"], 20)
+
+    def test_render_histogram(self):
+        """Test histograms render cumulative buckets, sum and count."""
+        metrics = MetricsRegistry()
+        for value in (0.5, 1.5, 3):
+            metrics.observe("latency_seconds", value, buckets=(1, 2), labels={"view": "v"})
+
+        text = render_prometheus(metrics.snapshot())
+
+        self.assertIn("# TYPE bitesail_latency_seconds histogram", text)
+        self.assertIn('bitesail_latency_seconds_bucket{view="v",le="1"} 1', text)
+        self.assertIn('bitesail_latency_seconds_bucket{view="v",le="2"} 2', text)
+        self.assertIn('bitesail_latency_seconds_bucket{view="v",le="+Inf"} 3', text)
+        self.assertIn('bitesail_latency_seconds_sum{view="v"} 5', text)
+        self.assertIn('bitesail_latency_seconds_count{view="v"} 3', text)
+
+    def test_label_values_are_escaped(self):
+        """Test quotes and backslashes in label values are escaped."""
+        metrics = MetricsRegistry()
+        metrics.inc("odd_total", {"view": 'a"b\\c'})
+
+        text = render_prometheus(metrics.snapshot())
+
+        self.assertIn('bitesail_odd_total{view="a\\"b\\\\c"} 1', text)
+
+    def test_multiprocess_files_are_merged(self):
+        """Test a scrape reports the sum over all worker processes."""
+        with tempfile.TemporaryDirectory() as directory:
+            other_worker = {
+                "counters": [["jobs_total", [["kind", "a"]], 5]],
+                "histograms": [
+                    [
+                        "latency_seconds",
+                        [],
+                        {"buckets": [1], "counts": [1, 0], "count": 1, "sum": 0.5},
+                    ]
+                ],
+            }
+            with open(os.path.join(directory, "99999999.json"), "w") as fh:
+                json.dump(other_worker, fh)
+
+            metrics = MetricsRegistry()
+            metrics.inc("jobs_total", {"kind": "a"}, 2)
+            metrics.observe("latency_seconds", 2, buckets=(1,))
+            with override_settings(METRICS_MULTIPROC_DIR=directory):
+                merged = metrics.collect()
+
+            self.assertTrue(os.path.exists(os.path.join(directory, f"{os.getpid()}.json")))
+
+        self.assertEqual(merged["counters"][("jobs_total", (("kind", "a"),))], 7)
+        histogram = merged["histograms"][("latency_seconds", ())]
+        self.assertEqual(histogram["counts"], [1, 1])
+        self.assertEqual(histogram["sum"], 2.5)
+
+
+class MetricsEndpointTests(TestCase):
+    """Test the /metrics endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        registry.reset()
+
+    def test_metrics_report_api_requests(self):
+        """Test API requests show up as counters and latency histograms."""
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client.force_authenticate(user)
+        self.client.get(reverse("recipe:recipe-list"))
+        self.client.get(reverse("user:me"))
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = res.content.decode()
+        self.assertIn(
+            'bitesail_http_requests_total{method="GET",status="200",view="RecipeViewSet.list"} 1',
+            body,
+        )
+        self.assertIn(
+            'bitesail_http_request_duration_seconds_count{view="ManageUserView.get"} 1',
+            body,
+        )
+        self.assertIn(
+            'bitesail_db_queries_per_request_sum{view="RecipeViewSet.list"} 1', body
+        )
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_metrics_token_required(self):
+        """Test a configured bearer token is enforced."""
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 401)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer s3cret")
+
+        self.assertEqual(res.status_code, 200)
+
+
+class MetricsAsgiTests(SimpleTestCase):
+    """Test metrics recorded by requests served through the ASGI app."""
+
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    async def get(self, application, path):
+        sent = []
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        disconnect = asyncio.Event()
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # The client stays connected until the test is done.
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"testserver")],
+            "client": ("127.0.0.1", 1234),
+            "server": ("testserver", 80),
+        }
+        await application(scope, receive, send)
+        return sent[0]["status"]
+
+    def test_shards_stay_bounded(self):
+        """Test each request's thread doesn't leave a shard behind."""
+        from project.asgi import application
+
+        async def scenario():
+            return [await self.get(application, "/healthz") for _ in range(50)]
+
+        self.assertEqual(asyncio.run(scenario()), [200] * 50)
+
+        self.assertLessEqual(len(registry._shards), 5)
+        counters = registry.snapshot()["counters"]
+        self.assertEqual(
+            sum(v for (name, _), v in counters.items() if name == "http_requests_total"),
+            50,
+        )
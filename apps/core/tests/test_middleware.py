@@ -0,0 +1,88 @@
+"""Tests for request instrumentation middleware"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.core.instrumentation import QueryBudgetExceeded
+from apps.core.metrics import registry
+from apps.core.models import Ingredient, Recipe, Tag
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def create_recipe_with_relations(user, n):
+    """Create a recipe with one tag and one ingredient."""
+    recipe = Recipe.objects.create(
+        user=user, title=f"Recipe {n}", time_minute=10, price=Decimal("1.00")
+    )
+    recipe.tags.add(Tag.objects.create(user=user, name=f"Tag {n}"))
+    recipe.ingredients.add(Ingredient.objects.create(user=user, name=f"Ing {n}"))
+    return recipe
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    """Test per-request query counting, Server-Timing and query budgets."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client.force_authenticate(self.user)
+        registry.reset()
+
+    def test_server_timing_header(self):
+        """Test responses carry DB, serializer and total timings."""
+        create_recipe_with_relations(self.user, 1)
+
+        res = self.client.get(RECIPES_URL)
+
+        timing = res["Server-Timing"]
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="3 queries"', timing)
+        self.assertIn("serializer;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+    def test_recipe_list_query_count_is_constant(self):
+        """Test listing recipes does not run extra queries per recipe (N+1)."""
+        for n in range(10):
+            create_recipe_with_relations(self.user, n)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data), 10)
+        self.assertIn('desc="3 queries"', res["Server-Timing"])
+
+    def test_records_endpoint_histograms(self):
+        """Test request stats are aggregated under the view's action name."""
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        histograms = registry.snapshot()["histograms"]
+        view = (("view", "RecipeViewSet.list"),)
+        self.assertEqual(histograms[("http_request_duration_seconds", view)]["count"], 2)
+        self.assertEqual(histograms[("db_queries_per_request", view)]["sum"], 2)
+
+    @override_settings(QUERY_BUDGETS={"RecipeViewSet.list": 1}, QUERY_BUDGET_RAISE=True)
+    def test_budget_exceeded_raises(self):
+        """Test exceeding a query budget fails loudly when raising is enabled."""
+        create_recipe_with_relations(self.user, 1)
+
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(RECIPES_URL)
+
+    @override_settings(QUERY_BUDGETS={"RecipeViewSet.list": 1}, QUERY_BUDGET_RAISE=False)
+    def test_budget_exceeded_logs(self):
+        """Test exceeding a query budget logs a warning otherwise."""
+        create_recipe_with_relations(self.user, 1)
+
+        with self.assertLogs("apps.core.middleware", level="WARNING") as logs:
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("RecipeViewSet.list ran 3 queries (budget 1)", logs.output[0])
@@ -1,6 +1,8 @@
 """Tests for Models"""
 
+from django.db import IntegrityError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 from decimal import Decimal
@@ -66,3 +68,38 @@ class ModelTests(TestCase):
         user = create_user()
         ingredient = models.Ingredient.objects.create(user=user, name="Tomato")
         self.assertEqual(str(ingredient), "Tomato")
+
+    def test_tag_names_unique_per_user(self):
+        user = create_user()
+        models.Tag.objects.create(user=user, name="Vegan")
+        models.Tag.objects.create(user=create_user("other@example.com"), name="Vegan")
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name="Vegan")
+
+    def test_get_or_create_many(self):
+        user = create_user()
+        salt = models.Ingredient.objects.create(user=user, name="Salt")
+
+        with self.assertNumQueries(2):
+            ingredients = models.Ingredient.objects.get_or_create_many(
+                user, ["Pepper", "Salt", "Pepper"]
+            )
+
+        self.assertEqual([i.name for i in ingredients], ["Pepper", "Salt"])
+        self.assertEqual(ingredients[1].pk, salt.pk)
+        self.assertIsNotNone(ingredients[0].pk)
+        self.assertEqual(models.Ingredient.objects.filter(user=user).count(), 2)
+
+    def test_get_or_create_many_skips_existing_rows(self):
+        """Test existing names are read back without being rewritten or locked."""
+        user = create_user()
+        models.Tag.objects.create(user=user, name="Dinner")
+
+        with CaptureQueriesContext(connection) as queries:
+            tags = models.Tag.objects.get_or_create_many(user, ["Quick", "Dinner"])
+
+        self.assertEqual([tag.name for tag in tags], ["Quick", "Dinner"])
+        insert, select = (query["sql"] for query in queries)
+        self.assertIn("ON CONFLICT DO NOTHING", insert)
+        self.assertTrue(select.startswith("SELECT"))
+        self.assertNotIn("FOR UPDATE", select)
@@ -0,0 +1,150 @@
+"""Tests for slow request profiling"""
+
+import cProfile
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core.profiling import ProfileStore
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+PROFILES_URL = reverse("core:profile-list")
+
+
+def profile_detail_url(profile_id):
+    return reverse("core:profile-detail", args=[profile_id])
+
+
+class SlowRequestProfilerTests(TestCase):
+    """Test which requests are profiled and what is stored."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        settings_override = override_settings(
+            PROFILE_SLOW_REQUESTS=True,
+            PROFILE_SAMPLE_RATE=1.0,
+            PROFILE_THRESHOLD_MS=0,
+            PROFILE_VIEWS=["RecipeViewSet.*"],
+            PROFILE_DIR=self.tmpdir.name,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_slow_recipe_request_is_profiled(self):
+        """Test a request over the threshold stores a profile with its SQL."""
+        self.client.get(RECIPES_URL)
+
+        profiles = ProfileStore().list()
+        self.assertEqual(len(profiles), 1)
+        profile = ProfileStore().get(profiles[0]["id"])
+        self.assertEqual(profile["endpoint"], "RecipeViewSet.list")
+        self.assertEqual(profile["status"], 200)
+        self.assertTrue(any("core_recipe" in q["sql"] for q in profile["sql"]))
+        self.assertTrue(profile["functions"])
+        self.assertTrue(
+            os.path.exists(os.path.join(self.tmpdir.name, f"{profile['id']}.prof"))
+        )
+
+    @override_settings(PROFILE_THRESHOLD_MS=60_000)
+    def test_fast_request_is_not_kept(self):
+        """Test requests under the threshold are discarded."""
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(ProfileStore().list(), [])
+
+    def test_other_views_are_not_profiled(self):
+        """Test only views matching PROFILE_VIEWS are profiled."""
+        self.client.get(TAGS_URL)
+
+        self.assertEqual(ProfileStore().list(), [])
+
+    @override_settings(PROFILE_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_profiled(self):
+        """Test a zero sample rate disables profiling."""
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(ProfileStore().list(), [])
+
+    @override_settings(PROFILE_MAX_PER_MINUTE=1)
+    def test_profiles_per_minute_are_capped(self):
+        """Test the per-minute cap bounds profiling overhead."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for _ in range(3):
+            client.get(RECIPES_URL)
+
+        self.assertEqual(len(ProfileStore().list()), 1)
+
+    def test_store_rotates_old_profiles(self):
+        """Test only the newest profiles are kept."""
+        store = ProfileStore(self.tmpdir.name, max_files=2)
+        ids = [store.save(cProfile.Profile(), {"endpoint": "x"}) for _ in range(3)]
+
+        kept = [profile["id"] for profile in store.list()]
+        self.assertEqual(len(kept), 2)
+        self.assertEqual(set(kept), set(sorted(ids)[-2:]))
+
+
+class ProfileApiTests(TestCase):
+    """Test the admin-only profile endpoints."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        settings_override = override_settings(PROFILE_DIR=self.tmpdir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.profile_id = ProfileStore().save(
+            cProfile.Profile(),
+            {"endpoint": "RecipeViewSet.list", "duration_ms": 900.0, "sql": []},
+        )
+        self.client = APIClient()
+
+    def test_profiles_require_staff(self):
+        """Test regular users cannot list profiles."""
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client.force_authenticate(user)
+
+        res = self.client.get(PROFILES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_and_retrieve_profiles(self):
+        """Test staff can list profiles, read one, and download the raw data."""
+        admin = get_user_model().objects.create_superuser(
+            email="admin@example.com", password="Pass!2024"
+        )
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(PROFILES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]["id"], self.profile_id)
+        self.assertEqual(res.data[0]["duration_ms"], 900.0)
+
+        res = self.client.get(profile_detail_url(self.profile_id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["endpoint"], "RecipeViewSet.list")
+
+        res = self.client.get(profile_detail_url(self.profile_id), {"download": 1})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("attachment", res["Content-Disposition"])
+
+        res = self.client.get(profile_detail_url("not-a-profile"))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
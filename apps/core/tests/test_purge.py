@@ -0,0 +1,183 @@
+"""Tests for background, batched deletion"""
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.core import purge
+from apps.core.models import Change, Ingredient, Purge, Recipe, Tag
+
+
+ME_URL = reverse("user:me")
+RECIPE_BULK_DELETE_URL = reverse("recipe:recipe-bulk-delete")
+TAG_BULK_DELETE_URL = reverse("recipe:tag-bulk-delete")
+
+
+def create_catalog(user, recipes=5):
+    tags = Tag.objects.get_or_create_many(user, ["Dinner", "Quick"])
+    ingredients = Ingredient.objects.get_or_create_many(user, ["Rice", "Salt"])
+    created = []
+    for n in range(recipes):
+        recipe = Recipe.objects.create(
+            user=user, title=f"Recipe {n}", time_minute=10, price=Decimal("1.00")
+        )
+        recipe.tags.set(tags)
+        recipe.ingredients.set(ingredients)
+        created.append(recipe)
+    return created
+
+
+def run_purges(batch_size=2):
+    call_command("run_purges", "--once", "--batch-size", batch_size, stdout=StringIO())
+
+
+class AccountPurgeTests(TestCase):
+    """Test deleting an account through the API and the purge worker."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        create_catalog(self.user)
+        create_catalog(self.other, recipes=1)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_delete_deactivates_at_once(self):
+        """Test deleting the account locks it out before any data is purged."""
+        res = self.client.delete(ME_URL)
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_worker_purges_in_batches(self):
+        """Test the worker deletes everything in bounded batches."""
+        self.client.delete(ME_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            run_purges(batch_size=2)
+
+        self.assertFalse(get_user_model().objects.filter(id=self.user.id).exists())
+        self.assertFalse(Recipe.objects.filter(user_id=self.user.id).exists())
+        self.assertFalse(Tag.objects.filter(user_id=self.user.id).exists())
+        self.assertFalse(Purge.objects.exists())
+        self.assertEqual(Recipe.objects.filter(user=self.other).count(), 1)
+        self.assertEqual(Recipe.tags.through.objects.count(), 2)
+        sql = [query["sql"] for query in queries]
+        batches = [statement for statement in sql if statement.startswith("WITH batch")]
+        self.assertTrue(batches)
+        self.assertTrue(all("LIMIT 2" in statement for statement in batches))
+        self.assertFalse([s for s in sql if s.startswith("DELETE FROM core_recipe")])
+
+    def test_interrupted_purge_resumes(self):
+        """Test a purge left behind by a dead worker is run again."""
+        purge.delete_account(self.user)
+        # A worker claims the purge and dies after its first batch.
+        row = purge.claim()
+        purge.Purger(*row, batch_size=2).delete_batches(
+            Recipe._meta.db_table,
+            "user_id = %s",
+            [self.user.id],
+            cascade=purge.RECIPE_M2M,
+        )
+        self.assertEqual(purge.run_pending(2), 0)
+
+        Purge.objects.update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(purge.run_pending(2), 1)
+
+        self.assertFalse(get_user_model().objects.filter(id=self.user.id).exists())
+
+
+class BulkDeleteTests(TestCase):
+    """Test bulk deletes of recipes and tags."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.recipes = create_catalog(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_delete_recipes(self):
+        """Test recipes are deleted by the worker and leave tombstones."""
+        ids = [recipe.id for recipe in self.recipes[:3]]
+
+        res = self.client.post(RECIPE_BULK_DELETE_URL, {"ids": ids}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Recipe.objects.count(), 5)
+        run_purges()
+
+        self.assertEqual(
+            sorted(Recipe.objects.values_list("id", flat=True)),
+            [recipe.id for recipe in self.recipes[3:]],
+        )
+        self.assertEqual(
+            sorted(
+                Change.objects.filter(deleted=True).values_list("object_id", flat=True)
+            ),
+            ids,
+        )
+
+    def test_bulk_delete_tags_updates_recipes(self):
+        """Test deleting tags logs the recipes that lost them."""
+        tag = Tag.objects.get(name="Dinner")
+
+        self.client.post(TAG_BULK_DELETE_URL, {"ids": [tag.id]}, format="json")
+        run_purges()
+
+        self.assertFalse(Tag.objects.filter(id=tag.id).exists())
+        self.assertEqual(Recipe.objects.count(), 5)
+        self.assertEqual(
+            sorted(
+                Change.objects.filter(kind=Change.Kind.RECIPE).values_list(
+                    "object_id", flat=True
+                )
+            ),
+            sorted(recipe.id for recipe in self.recipes),
+        )
+        self.assertTrue(
+            Change.objects.filter(
+                kind=Change.Kind.TAG, object_id=tag.id, deleted=True
+            ).exists()
+        )
+
+    def test_other_users_objects_are_kept(self):
+        """Test ids of another user's objects are ignored."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        (recipe,) = create_catalog(other, recipes=1)
+
+        self.client.post(RECIPE_BULK_DELETE_URL, {"ids": [recipe.id]}, format="json")
+        run_purges()
+
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_invalid_ids(self):
+        """Test the ids must be a non-empty list of positive integers."""
+        for payload in ({}, {"ids": []}, {"ids": ["x"]}, {"ids": [0]}):
+            res = self.client.post(RECIPE_BULK_DELETE_URL, payload, format="json")
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Purge.objects.exists())
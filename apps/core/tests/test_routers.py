@@ -0,0 +1,177 @@
+"""Tests for read-replica routing"""
+
+import os
+import subprocess
+import sys
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core.models import Recipe, Tag
+from apps.core.routers import ReplicaRouter
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+ME_URL = reverse("user:me")
+PIN_TABLE = settings.CACHES["default"]["LOCATION"]
+
+
+def recipe_detail_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """Test the router outside of a request."""
+
+    def test_queries_default_to_primary(self):
+        """Test reads and writes use the primary without a replica context."""
+        router = ReplicaRouter()
+
+        self.assertIsNone(router.db_for_read(Recipe))
+        self.assertEqual(router.db_for_write(Recipe), "default")
+        self.assertTrue(router.allow_migrate("default", "core"))
+        self.assertFalse(router.allow_migrate("replica1", "core"))
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_READ_YOUR_WRITES_SECONDS=60)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Test which alias serves each query of the API.
+
+    "replica1" is a test mirror of the primary: a separate connection to the
+    same database, so the alias of every query can be told apart.
+    """
+
+    databases = {"default", "replica1"}
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Soup", time_minute=5, price=Decimal("1.00")
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name="Dinner"))
+
+    def request(self, method, url, data=None):
+        """
+        Return the response and the SQL run on each alias, leaving out the
+        read-your-writes pin lookups, which always run on the primary.
+        """
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections["replica1"]) as replica:
+            res = getattr(self.client, method)(url, data, format="json")
+        return (
+            res,
+            [q["sql"] for q in primary if PIN_TABLE not in q["sql"]],
+            [q["sql"] for q in replica],
+        )
+
+    def test_safe_reads_use_replica(self):
+        """Test list and retrieve read from the replica."""
+        for url in (RECIPES_URL, recipe_detail_url(self.recipe.id), TAGS_URL):
+            res, primary, replica = self.request("get", url)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(primary, [], url)
+            self.assertTrue(replica, url)
+
+        res, _, _ = self.request("get", RECIPES_URL)
+        self.assertEqual(res.data[0]["tags"][0]["name"], "Dinner")
+
+    def test_writes_use_primary(self):
+        """Test unsafe requests run every query on the primary."""
+        res, primary, replica = self.request(
+            "patch", recipe_detail_url(self.recipe.id), {"title": "Stew"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(any("UPDATE" in sql for sql in primary))
+        self.assertEqual(replica, [])
+
+    def test_reads_after_write_stay_on_primary(self):
+        """Test a user's reads go to the primary within the window after a write."""
+        self.request(
+            "post", RECIPES_URL, {"title": "Salad", "time_minute": 5, "price": "2.00"}
+        )
+
+        res, primary, replica = self.request("get", RECIPES_URL)
+
+        self.assertEqual(len(res.data), 2)
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    def test_write_window_is_per_user(self):
+        """Test another user's write does not pin this user to the primary."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        other_client.patch(ME_URL, {"name": "Other"}, format="json")
+
+        _, primary, replica = self.request("get", TAGS_URL)
+
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+
+    def test_profile_update_pins_user(self):
+        """Test updating the profile pins the user's subsequent reads."""
+        self.request("patch", ME_URL, {"name": "New Name"})
+
+        _, primary, replica = self.request("get", TAGS_URL)
+
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    def test_reads_return_to_replica_after_window(self):
+        """Test reads go back to the replica once the window has passed."""
+        self.request("patch", recipe_detail_url(self.recipe.id), {"title": "Stew"})
+        cache.clear()  # Equivalent to the window expiring.
+
+        _, primary, replica = self.request("get", RECIPES_URL)
+
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+
+    def test_pin_is_shared_between_processes(self):
+        """Test a write pins the user in every worker, not just this process."""
+        self.request("patch", recipe_detail_url(self.recipe.id), {"title": "Stew"})
+
+        db = connections["default"].settings_dict
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import django; django.setup();"
+                "from apps.core.models import User;"
+                "from apps.core.routers import is_pinned;"
+                f"print(is_pinned(User(pk={self.user.pk})))",
+            ],
+            env={
+                **os.environ,
+                "DJANGO_SETTINGS_MODULE": "project.settings",
+                "DB_HOST": db["HOST"] or "",
+                "DB_NAME": db["NAME"],
+                "DB_USER": db["USER"] or "",
+                "DB_PASS": db["PASSWORD"] or "",
+            },
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        self.assertEqual(result.stdout.strip(), "True")
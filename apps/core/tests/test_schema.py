@@ -0,0 +1,144 @@
+"""Tests for the precomputed OpenAPI schema"""
+
+import gzip
+import importlib.util
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from apps.core import schema
+from project import gunicorn_conf
+
+
+SCHEMA_URL = reverse("schema")
+
+
+class SchemaViewTests(SimpleTestCase):
+    """Test serving the cached schema."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        settings_override = override_settings(SCHEMA_CACHE_DIR=self.tmpdir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        schema.clear()
+        self.addCleanup(schema.clear)
+
+    def test_schema_is_generated_once(self):
+        """Test repeated requests reuse the same generated schema."""
+        with patch(
+            "apps.core.schema.generate_schema", wraps=schema.generate_schema
+        ) as generate:
+            self.client.get(SCHEMA_URL)
+            self.client.get(SCHEMA_URL)
+
+        self.assertEqual(generate.call_count, 1)
+
+    def test_yaml_by_default_and_json_on_request(self):
+        """Test the format follows `?format=` / `Accept`, YAML by default."""
+        res = self.client.get(SCHEMA_URL)
+        self.assertEqual(res["Content-Type"], "application/vnd.oai.openapi")
+        self.assertTrue(res.content.startswith(b"openapi:"))
+
+        res = self.client.get(SCHEMA_URL, {"format": "json"})
+        self.assertEqual(res["Content-Type"], "application/vnd.oai.openapi+json")
+        self.assertIn("/api/recipe/recipes/", json.loads(res.content)["paths"])
+
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT="application/json")
+        self.assertEqual(res["Content-Type"], "application/vnd.oai.openapi+json")
+
+    def test_etag_revalidation(self):
+        """Test a matching If-None-Match gets an empty 304."""
+        res = self.client.get(SCHEMA_URL)
+        etag = res["ETag"]
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b"")
+        self.assertEqual(res["ETag"], etag)
+
+    def test_gzip_precompressed(self):
+        """Test gzip clients get the pre-compressed body."""
+        plain = self.client.get(SCHEMA_URL)
+
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertNotEqual(res["ETag"], plain["ETag"])
+        self.assertIn("Accept-Encoding", res["Vary"])
+
+    def test_versioned_url_is_immutable(self):
+        """Test the versioned URL is cached long-term and unknown versions 404."""
+        version = self.client.get(SCHEMA_URL)["X-Schema-Version"]
+        url = reverse("core:schema-versioned", args=[version, "json"])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("immutable", res["Cache-Control"])
+        self.assertEqual(
+            self.client.get(
+                reverse("core:schema-versioned", args=["0" * 16, "json"])
+            ).status_code,
+            404,
+        )
+
+
+class BuildSchemaCommandTests(SimpleTestCase):
+    """Test the `build_schema` management command."""
+
+    def test_builds_artifact_once_per_version(self):
+        """Test the artifact is written and only rebuilt when forced."""
+        with tempfile.TemporaryDirectory() as directory:
+            out = StringIO()
+            call_command("build_schema", output_dir=directory, stdout=out)
+            version = schema.code_fingerprint()
+
+            self.assertIn(f"Built schema {version}", out.getvalue())
+            for name in (f"openapi-{version}.json", f"openapi-{version}.yaml.gz"):
+                self.assertTrue(os.path.exists(os.path.join(directory, name)))
+
+            out = StringIO()
+            call_command("build_schema", output_dir=directory, stdout=out)
+            self.assertIn("up to date", out.getvalue())
+
+            out = StringIO()
+            call_command("build_schema", output_dir=directory, force=True, stdout=out)
+            self.assertIn("Built schema", out.getvalue())
+
+
+class ApiOnlySchemaTests(SimpleTestCase):
+    """Test API-only workers neither build nor route the schema."""
+
+    def when_ready(self):
+        with patch("apps.core.schema.get_artifact") as get_artifact, patch(
+            "gc.freeze"
+        ), patch.object(gunicorn_conf, "preload_app", True):
+            gunicorn_conf.when_ready(Mock())
+        return get_artifact
+
+    def test_when_ready_skips_schema(self):
+        """Test the master only warms the schema when it can build it."""
+        self.assertTrue(self.when_ready().called)
+        with override_settings(API_ONLY=True):
+            self.assertFalse(self.when_ready().called)
+
+    def test_versioned_route_not_mounted(self):
+        """Test the versioned schema URL only exists outside API-only mode."""
+        spec = importlib.util.find_spec("apps.core.urls")
+        for api_only, mounted in ((False, True), (True, False)):
+            # A fresh copy of the URLconf, evaluated with the setting.
+            urls = importlib.util.module_from_spec(spec)
+            with override_settings(API_ONLY=api_only):
+                spec.loader.exec_module(urls)
+            names = {pattern.name for pattern in urls.urlpatterns}
+            self.assertEqual("schema-versioned" in names, mounted)
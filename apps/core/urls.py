@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.urls import path, re_path
+from apps.core import views
+
+app_name = "core"
+
+
+urlpatterns = [
+    path("metrics", views.metrics_view, name="metrics"),
+    path("healthz", views.healthz_view, name="healthz"),
+    path("readyz", views.readyz_view, name="readyz"),
+    path("api/jobs/", views.JobListView.as_view(), name="job-list"),
+    path("api/jobs/<int:pk>/", views.JobDetailView.as_view(), name="job-detail"),
+    path("api/profiles/", views.ProfileListView.as_view(), name="profile-list"),
+    path(
+        "api/profiles/<str:profile_id>/",
+        views.ProfileDetailView.as_view(),
+        name="profile-detail",
+    ),
+]
+
+if not settings.API_ONLY:
+    # Building the schema needs drf-spectacular, which API-only workers skip.
+    urlpatterns.append(
+        re_path(
+            r"^api/schema/(?P<version>[0-9a-f]{16})\.(?P<fmt>yaml|json)$",
+            views.schema_view,
+            name="schema-versioned",
+        )
+    )
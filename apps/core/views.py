@@ -0,0 +1,193 @@
+"""
+Operational views for the BiteSail backend.
+"""
+
+import os
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from rest_framework import generics
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.core import health, metrics, schema
+from apps.core.http import choose_encoding
+from apps.core.models import Job
+from apps.core.profiling import ProfileStore
+from apps.core.serializers import JobSerializer
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Expose request, latency and database metrics in Prometheus text format.
+
+    If `settings.METRICS_TOKEN` is set, scrapers must send it as a bearer
+    token; otherwise the endpoint is open and should be restricted at the
+    network level.
+    """
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token:
+        auth = request.headers.get("Authorization", "")
+        if not constant_time_compare(auth, f"Bearer {token}"):
+            return HttpResponse(status=401)
+
+    body = metrics.render_prometheus(metrics.registry.collect())
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@require_GET
+def healthz_view(request):
+    """
+    Liveness probe: the process is up and serving requests.
+
+    Deliberately independent of the database, so an outage does not make
+    the orchestrator restart every worker; use `/readyz` to take a worker
+    out of rotation instead.
+    """
+    return JsonResponse({"status": "ok"})
+
+
+@require_GET
+def readyz_view(request):
+    """
+    Readiness probe: the database answers and migrations are applied.
+
+    Runs `SELECT 1` on the worker's persistent connection (see
+    `apps.core.health`), without going through any model, so it is cheap
+    enough for frequent probes. Returns 503 while not ready.
+    """
+    ready, details = health.readiness(
+        check_migrations=settings.READINESS_CHECK_MIGRATIONS
+    )
+    return JsonResponse(
+        {"status": "ok" if ready else "unavailable", **details},
+        status=200 if ready else 503,
+    )
+
+
+@require_GET
+def schema_view(request, version=None, fmt=None):
+    """
+    Serve the precomputed OpenAPI schema (see `apps.core.schema`).
+
+    The format is chosen with `?format=json|yaml` or the `Accept` header
+    (YAML by default, like `SpectacularAPIView`), and a pre-compressed body
+    is picked from `Accept-Encoding`. Responses carry an ETag, so clients
+    revalidate with a 304. The versioned URL
+    (`/api/schema/<version>.<format>`) never changes content and is cached
+    for a year; the plain URL for `SCHEMA_CACHE_MAX_AGE` seconds.
+    """
+    artifact = schema.get_artifact()
+    if version is not None and version != artifact.version:
+        raise Http404
+
+    if fmt is None:
+        fmt = request.GET.get("format")
+        if fmt not in schema.FORMATS:
+            accept = request.headers.get("Accept", "")
+            fmt = "json" if "json" in accept else "yaml"
+
+    bodies = artifact.bodies[fmt]
+    encoding = choose_encoding(
+        request.headers.get("Accept-Encoding", ""),
+        [coding for coding in ("br", "gzip") if coding in bodies],
+    ) or "identity"
+    etag = artifact.etag(fmt, encoding)
+
+    if version is not None:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = f"public, max-age={settings.SCHEMA_CACHE_MAX_AGE}"
+
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(bodies[encoding], content_type=schema.FORMATS[fmt])
+        if encoding != "identity":
+            response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    response["Vary"] = "Accept, Accept-Encoding"
+    response["X-Schema-Version"] = artifact.version
+    return response
+
+
+class ProfileListView(APIView):
+    """
+    List the stored profiles of slow requests, newest first.
+
+    Only staff users can access profiles; they may contain SQL and paths.
+    """
+
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+    # Internal endpoint: keep it out of the OpenAPI schema.
+    schema = None
+
+    def get(self, request):
+        return Response(ProfileStore().list())
+
+
+class ProfileDetailView(APIView):
+    """
+    Return one profile: request metadata, SQL trace and top functions.
+
+    Pass `?download=1` to get the raw `.prof` file instead, for `pstats`
+    or a flame graph viewer.
+    """
+
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+    schema = None
+
+    def get(self, request, profile_id):
+        store = ProfileStore()
+        profile = store.get(profile_id)
+        if profile is None:
+            raise Http404
+
+        if request.query_params.get("download"):
+            path = os.path.join(store.directory, f"{profile_id}.prof")
+            try:
+                return FileResponse(
+                    open(path, "rb"), as_attachment=True, filename=f"{profile_id}.prof"
+                )
+            except FileNotFoundError:
+                raise Http404
+        return Response(profile)
+
+
+class JobMixin:
+    """The authenticated user's background jobs, newest first."""
+
+    serializer_class = JobSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user).order_by("-id")
+
+
+class JobListView(JobMixin, generics.ListAPIView):
+    """
+    List the user's background jobs (such as bulk deletes), newest first.
+
+    Filter with `?status=queued|running|succeeded|failed`. Finished jobs are
+    kept for `JOBS_RETENTION_DAYS` days.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        job_status = self.request.query_params.get("status")
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+        return queryset
+
+
+class JobDetailView(JobMixin, generics.RetrieveAPIView):
+    """Return the status of one background job, e.g. to poll until it ends."""
@@ -0,0 +1,102 @@
+"""
+Prefix autocomplete of a user's tag and ingredient names.
+
+`NameIndex` keeps one user's names sorted by their case-folded form
+(`str.casefold`), so the names starting with a prefix are found with a
+binary search (`bisect`) and read off in order. Indexes are kept by an
+`apps.recipe.indexes.IndexCache` and catch up with the change log like the
+recipe indexes. A user without a cached index is answered by
+`complete_query`, a prefix query on the `(user_id, folded_name)` index,
+while the index is built in the background. Both fold names and prefixes
+in Python, so they agree on names outside ASCII too.
+"""
+
+import threading
+from bisect import bisect_left, insort
+
+from apps.core.models import Change, Ingredient, Tag
+from apps.recipe.indexes import IndexCache
+
+
+class NameIndex:
+    """Names of one user's ``model`` objects, sorted, at change ``seq``."""
+
+    kind = None
+    model = None
+
+    def __init__(self, seq, rows=()):
+        self.seq = seq
+        self.lock = threading.Lock()
+        self.names = dict(rows)
+        self.entries = sorted((name.casefold(), pk) for pk, name in self.names.items())
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def load(cls, user_id, ids=None):
+        """Return the (id, name) pairs of ``user_id``'s objects, or of ``ids``."""
+        objects = cls.model.objects.filter(user_id=user_id)
+        if ids is not None:
+            objects = objects.filter(id__in=ids)
+        return objects.values_list("id", "name")
+
+    def refresh(self, user_id, ids):
+        """Reload the objects ``ids`` of ``user_id``."""
+        names = dict(self.load(user_id, ids))
+        for pk in ids:
+            self.remove(pk)
+            if pk in names:
+                self.add(pk, names[pk])
+
+    def add(self, pk, name):
+        self.names[pk] = name
+        insort(self.entries, (name.casefold(), pk))
+
+    def remove(self, pk):
+        name = self.names.pop(pk, None)
+        if name is not None:
+            del self.entries[bisect_left(self.entries, (name.casefold(), pk))]
+
+    def complete(self, prefix, limit):
+        """
+        Return up to ``limit`` (id, name) pairs of the names starting with
+        ``prefix``, ignoring case, in the order of their case-folded form.
+        """
+        prefix = prefix.casefold()
+        start = bisect_left(self.entries, (prefix,))
+        found = []
+        for folded, pk in self.entries[start:start + limit]:
+            if not folded.startswith(prefix):
+                break
+            found.append((pk, self.names[pk]))
+        return found
+
+
+class TagNameIndex(NameIndex):
+    kind = Change.Kind.TAG
+    model = Tag
+
+
+class IngredientNameIndex(NameIndex):
+    kind = Change.Kind.INGREDIENT
+    model = Ingredient
+
+
+def complete_query(model, user_id, prefix, limit):
+    """Return what `NameIndex.complete` would, from the database."""
+    return list(
+        model.objects.filter(user_id=user_id, folded_name__startswith=prefix.casefold())
+        .order_by("folded_name", "id")
+        .values_list("id", "name")[:limit]
+    )
+
+
+tags = IndexCache(TagNameIndex)
+ingredients = IndexCache(IngredientNameIndex)
+
+
+def clear():
+    """Forget every cached index."""
+    tags.clear()
+    ingredients.clear()
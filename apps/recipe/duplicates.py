@@ -0,0 +1,291 @@
+"""
+Near-duplicate recipes, found with MinHash signatures and LSH banding.
+
+A recipe is described by its shingles: the 3-character shingles of its
+normalized title, and the normalized names of its ingredients. Two recipes
+are near-duplicates when the Jaccard index of their shingles is at least
+`settings.DUPLICATES_THRESHOLD`.
+
+Each shingle is hashed to 32 bits (CRC-32, so that every process agrees),
+then by `PERMUTATIONS` multiply-shift hash functions; a recipe's signature
+holds the minimum of each function over its shingles, and the share of
+equal entries in two signatures estimates the Jaccard index of the two
+recipes. Signatures are cut into `BANDS` bands of `ROWS` rows, each hashed
+to a 64-bit key, and only recipes sharing a band key are compared: with 16
+bands of 4 rows, a pair at a Jaccard index of 0.8 shares a band with a
+probability of 0.9998, and one at 0.3 with a probability of 0.12.
+
+`find_clusters` groups a user's whole catalog (for the
+`find_duplicate_recipes` command), and `find` checks a new recipe against
+the user's `DuplicateIndex`, a `apps.recipe.indexes.RecipeIndex` whose
+features are band keys.
+"""
+
+import functools
+import re
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from apps.core.changes import record_changes
+from apps.core.models import Change, Recipe
+from apps.recipe.indexes import IndexCache, RecipeIndex
+
+
+RecipeIngredient = Recipe.ingredients.through
+RecipeTag = Recipe.tags.through
+
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+# Recipes hashed at once; the hashes of a batch take about 15 MiB.
+BATCH_SIZE = 1000
+# Candidate pairs whose signatures are compared at once (about 64 MiB).
+VERIFY_BATCH_SIZE = 2**20
+# Band buckets larger than this are linked in a chain instead of pairwise.
+MAX_BUCKET = 100
+# Candidates of a new recipe compared with it, most shared bands first.
+MAX_CANDIDATES = 50
+
+# A fixed seed: signatures must agree between processes and runs.
+_random = np.random.default_rng(0x5EED)
+MULTIPLIERS = _random.integers(1, 2**63, PERMUTATIONS, dtype=np.uint64) * 2 + 1
+OFFSETS = _random.integers(0, 2**63, PERMUTATIONS, dtype=np.uint64)
+BAND_MULTIPLIERS = _random.integers(1, 2**63, (BANDS, ROWS), dtype=np.uint64) * 2 + 1
+
+NON_WORD = re.compile(r"[\W_]+")
+
+
+@functools.lru_cache(maxsize=2**16)
+def normalize(text):
+    """Lowercase ``text``, keeping only words separated by single spaces."""
+    return NON_WORD.sub(" ", text.casefold()).strip()
+
+
+def shingles(title, ingredient_names):
+    """Return the shingles of a recipe: title 3-grams and ingredient names."""
+    title = normalize(title)
+    grams = {title[i:i + 3] for i in range(max(len(title) - 2, 1))}
+    # "#" never survives normalization, so names can't match title grams.
+    return grams | {"#" + normalize(name) for name in ingredient_names}
+
+
+def signatures(shingle_sets):
+    """Return the MinHash signatures of non-empty ``shingle_sets``, one per row."""
+    result = np.empty((len(shingle_sets), PERMUTATIONS), dtype=np.uint32)
+    for start in range(0, len(shingle_sets), BATCH_SIZE):
+        batch = shingle_sets[start:start + BATCH_SIZE]
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode()) for items in batch for shingle in items),
+            dtype=np.uint64,
+        )
+        offsets = np.cumsum([0] + [len(items) for items in batch[:-1]])
+        # Multiply-shift hashing: wraps modulo 2**64, keeps the top 32 bits.
+        hashed = (hashes[:, None] * MULTIPLIERS + OFFSETS) >> np.uint64(32)
+        result[start:start + len(batch)] = np.minimum.reduceat(hashed, offsets)
+    return result
+
+
+def band_keys(signatures):
+    """Return the ``BANDS`` band keys of each of ``signatures``, as int64."""
+    rows = signatures.astype(np.uint64).reshape(-1, BANDS, ROWS)
+    keys = (rows * BAND_MULTIPLIERS).sum(axis=2, dtype=np.uint64)
+    return keys.view(np.int64)
+
+
+def jaccard(a, b):
+    """Return the Jaccard index of the sets ``a`` and ``b``."""
+    return len(a & b) / len(a | b)
+
+
+def describe(user_id, recipe_ids=None):
+    """
+    Map ``user_id``'s recipes, or those of ``recipe_ids``, to their title
+    and ingredient names.
+    """
+    recipes = Recipe.objects.filter(user_id=user_id)
+    names = RecipeIngredient.objects.filter(recipe__user_id=user_id)
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+        names = names.filter(recipe_id__in=recipe_ids)
+    described = {pk: (title, []) for pk, title in recipes.values_list("id", "title")}
+    for recipe_id, name in names.values_list("recipe_id", "ingredient__name"):
+        if recipe_id in described:
+            described[recipe_id][1].append(name)
+    return described
+
+
+class DuplicateIndex(RecipeIndex):
+    """Band key to recipe index of one user's recipes."""
+
+    @classmethod
+    def load(cls, user_id, recipe_ids=None):
+        described = describe(user_id, recipe_ids)
+        keys = band_keys(signatures([shingles(*item) for item in described.values()]))
+        return [
+            (recipe_id, key)
+            for recipe_id, row in zip(described, keys.tolist())
+            for key in row
+        ]
+
+    def candidates(self, keys, limit):
+        """Return up to ``limit`` recipe ids sharing bands of ``keys``, most first."""
+        shared = self.overlap(keys)
+        if shared is None:
+            return []
+        slots = np.flatnonzero((shared > 0) & (self.totals[: self.size] > 0))
+        top = self.rank(slots, shared[slots], limit)
+        return self.recipe_ids[slots[top]].tolist()
+
+
+_cache = IndexCache(DuplicateIndex)
+
+
+def find(user_id, title, ingredient_names):
+    """
+    Find ``user_id``'s near-duplicates of a recipe with ``title`` and
+    ``ingredient_names``.
+
+    Returns ``(recipe_id, similarity)`` tuples for the recipes whose
+    shingles have a Jaccard index of at least `DUPLICATES_THRESHOLD` with
+    it, most similar first. Returns None, without checking, while the
+    user's index is not built: building it reads the whole catalog, so it
+    is started in the background instead (`IndexCache.warm_later`).
+    """
+    own = shingles(title, ingredient_names)
+    keys = band_keys(signatures([own]))[0].tolist()
+    with _cache.get(user_id, build=False) as index:
+        if index is not None:
+            candidates = index.candidates(keys, MAX_CANDIDATES)
+    if index is None:
+        _cache.warm_later(user_id)
+        return None
+    if not candidates:
+        return []
+    found = []
+    for recipe_id, item in describe(user_id, candidates).items():
+        similarity = jaccard(own, shingles(*item))
+        if similarity >= settings.DUPLICATES_THRESHOLD:
+            found.append((recipe_id, similarity))
+    return sorted(found, key=lambda match: (-match[1], -match[0]))
+
+
+def warm(user_id):
+    """Build ``user_id``'s index, for `find`, unless it is cached."""
+    with _cache.get(user_id):
+        pass
+
+
+def cluster(recipe_ids, signatures, threshold):
+    """
+    Group recipes whose signatures agree on at least ``threshold`` of
+    their entries, comparing only those sharing a band.
+
+    ``recipe_ids`` and ``signatures`` are parallel arrays. Returns the
+    groups of more than one recipe as sorted lists of ids, linking any
+    two recipes joined by a chain of near-duplicates.
+    """
+    keys = band_keys(signatures)
+    left, right = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for band in range(BANDS):
+        order = np.argsort(keys[:, band], kind="stable")
+        ordered = keys[order, band]
+        starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+        sizes = np.diff(np.r_[starts, len(ordered)])
+        # Buckets of each size at once: one row of members per bucket.
+        for size in np.unique(sizes[(sizes > 1) & (sizes <= MAX_BUCKET)]).tolist():
+            members = order[starts[sizes == size][:, None] + np.arange(size)]
+            first, second = np.triu_indices(size, 1)
+            left.append(members[:, first].ravel())
+            right.append(members[:, second].ravel())
+        for start, size in zip(
+            starts[sizes > MAX_BUCKET].tolist(), sizes[sizes > MAX_BUCKET].tolist()
+        ):
+            members = order[start:start + size]
+            left.append(members[:-1])
+            right.append(members[1:])
+    left, right = np.concatenate(left), np.concatenate(right)
+    pairs = np.sort(np.minimum(left, right) * len(keys) + np.maximum(left, right))
+    pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]][: len(pairs)]]
+    left, right = pairs // len(keys), pairs % len(keys)
+    linked = np.zeros(len(pairs), dtype=bool)
+    for start in range(0, len(pairs), VERIFY_BATCH_SIZE):
+        chunk = slice(start, start + VERIFY_BATCH_SIZE)
+        agree = signatures[left[chunk]] == signatures[right[chunk]]
+        linked[chunk] = agree.mean(axis=1) >= threshold
+
+    parents = list(range(len(keys)))
+
+    def root(node):
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    for a, b in zip(left[linked].tolist(), right[linked].tolist()):
+        parents[root(a)] = root(b)
+    groups = {}
+    for node in set(left[linked].tolist()) | set(right[linked].tolist()):
+        groups.setdefault(root(node), []).append(recipe_ids[node])
+    return sorted(sorted(group) for group in groups.values())
+
+
+def find_clusters(user_id, threshold=None):
+    """Group ``user_id``'s near-duplicate recipes (see `cluster`)."""
+    described = describe(user_id)
+    if not described:
+        return []
+    return cluster(
+        list(described),
+        signatures([shingles(*item) for item in described.values()]),
+        settings.DUPLICATES_THRESHOLD if threshold is None else threshold,
+    )
+
+
+@transaction.atomic
+def merge(user_id, recipe_ids, threshold=None):
+    """
+    Merge ``user_id``'s recipes ``recipe_ids`` into the oldest of them.
+
+    Clusters link recipes through chains of near-duplicates, so only the
+    recipes whose shingles have a Jaccard index of at least ``threshold``
+    (default `DUPLICATES_THRESHOLD`) with the oldest one are merged: it
+    keeps its fields and gets their tags and ingredients, and they are
+    deleted. Returns the id of the kept recipe (None if none of
+    ``recipe_ids`` is left), the ids merged into it and those left alone.
+    """
+    if threshold is None:
+        threshold = settings.DUPLICATES_THRESHOLD
+    described = describe(user_id, recipe_ids)
+    if not described:
+        return None, [], []
+    kept, *others = sorted(described)
+    own = shingles(*described[kept])
+    merged, left = [], []
+    for pk in others:
+        alike = jaccard(own, shingles(*described[pk])) >= threshold
+        (merged if alike else left).append(pk)
+    if not merged:
+        return kept, merged, left
+    for through, field in ((RecipeTag, "tag_id"), (RecipeIngredient, "ingredient_id")):
+        related = set(
+            through.objects.filter(recipe_id__in=merged).values_list(field, flat=True)
+        )
+        through.objects.bulk_create(
+            [through(recipe_id=kept, **{field: pk}) for pk in sorted(related)],
+            ignore_conflicts=True,
+        )
+    Recipe.objects.filter(id__in=merged).delete()
+    record_changes(
+        user_id,
+        updated=[(Change.Kind.RECIPE, kept)],
+        deleted=[(Change.Kind.RECIPE, pk) for pk in merged],
+    )
+    return kept, merged, left
+
+
+def clear():
+    """Forget every cached index."""
+    _cache.clear()
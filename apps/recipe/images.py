@@ -0,0 +1,96 @@
+"""
+Recipe image uploads and their thumbnails.
+
+`POST /api/recipe/recipes/<id>/upload-image/` streams the upload to a
+temporary file in 64 KiB chunks with `ImageUploadHandler` (never to memory,
+whatever its size), checks it is an image and moves it into `MEDIA_ROOT`.
+Thumbnails are rendered afterwards by the ``recipe.thumbnails`` job (see
+`apps.recipe.tasks`), which fills in `Recipe.thumbnails` and logs the recipe
+as changed, so clients pick up the URLs through sync or the change stream.
+
+Thumbnails are stored beside the image as ``<image stem>-<size>.webp``.
+Files of replaced images are deleted once the new one is committed; those
+of deleted recipes by `manage.py clean_recipe_images`.
+"""
+
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+
+from apps.core.models import Recipe
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = "recipes"
+
+
+def storage():
+    return Recipe._meta.get_field("image").storage
+
+
+def thumbnail_names(image):
+    """Storage names of the thumbnails of ``image``, by size."""
+    stem, _ = os.path.splitext(image)
+    return {size: f"{stem}-{size}.webp" for size in settings.RECIPE_THUMBNAIL_SIZES}
+
+
+def delete_files(image, thumbnails=None):
+    """Delete ``image`` and its thumbnails from storage."""
+    names = {image, *thumbnail_names(image).values(), *(thumbnails or {}).values()}
+    for name in names:
+        storage().delete(name)
+
+
+def delete_orphans(min_age_seconds):
+    """
+    Delete image files no recipe refers to; returns how many.
+
+    Files younger than ``min_age_seconds`` are kept, as their upload may
+    not have committed yet.
+    """
+    referenced = {
+        os.path.splitext(os.path.basename(name))[0]
+        for name in Recipe.objects.exclude(image="")
+        .values_list("image", flat=True)
+        .iterator(chunk_size=10000)
+    }
+    directory = storage().path(IMAGE_DIR)
+    cutoff = time.time() - min_age_seconds
+    count = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        # "<stem>.<ext>" or "<stem>-<size>.webp"; stems are UUIDs.
+        stem = entry.name.split(".", 1)[0].split("-", 1)[0]
+        if (
+            stem not in referenced
+            and entry.is_file()
+            and entry.stat().st_mtime < cutoff
+        ):
+            os.remove(entry.path)
+            count += 1
+    return count
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream uploads to temporary files, dropping any over the size limit.
+
+    Used on its own, so no upload is kept in memory. An upload larger than
+    `settings.RECIPE_IMAGE_MAX_BYTES` is skipped (and its temporary file
+    removed) as soon as it passes the limit, and ``too_large`` is set.
+    """
+
+    too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.too_large = True
+            raise SkipFile
+        return super().receive_data_chunk(raw_data, start)
@@ -0,0 +1,305 @@
+"""
+In-memory per-user indexes, kept up to date from the change log.
+
+A `RecipeIndex` is a sparse recipe by feature matrix, stored by feature:
+for each feature (say, an ingredient), the slots of the recipes that have
+it, plus each recipe's number of features. `RecipeIndex.overlap` counts how
+many of a set of features every recipe has by summing the posting arrays
+of those features with `numpy.bincount`, so its cost depends on how many
+recipes have them, not on the SQL over the recipe/tag/ingredient tables.
+
+Indexes (a `RecipeIndex`, or any class with its `kind`, `load` and
+`refresh`) are built lazily, one per user, and kept by an `IndexCache`, a
+per-process LRU of `settings.RECIPE_INDEX_MAX_USERS`. Before each use, the
+index catches up with the user's change log (`apps.core.changes`): only
+the objects of its `kind` changed since it was built are reloaded, so
+writes handled by any process are seen.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from apps.core.models import Change, ChangeSequence
+
+
+logger = logging.getLogger(__name__)
+
+EMPTY = np.zeros(0, dtype=np.int32)
+
+# Builds started by `IndexCache.warm_later`, one at a time per process.
+_builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-build")
+
+
+class RecipeIndex:
+    """
+    Feature to recipe index of one user's recipes, at change ``seq``.
+
+    Subclasses define `load`, the (recipe id, feature) pairs of recipes.
+    Recipes get consecutive slots. A recipe that changes is given a new
+    slot and its old one is left dead (no recipe, no features) until dead
+    slots outnumber live ones and the index is compacted.
+    """
+
+    kind = Change.Kind.RECIPE
+
+    def __init__(self, seq, pairs=()):
+        self.seq = seq
+        self.lock = threading.Lock()
+        self.slots = {}
+        self.recipe_ids = np.zeros(1024, dtype=np.int64)
+        self.totals = np.zeros(1024, dtype=np.int32)
+        self.postings = {}
+        self.size = 0
+        self.dead = 0
+
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        recipe_ids, slots = np.unique(pairs[:, 0], return_inverse=True)
+        self._reserve(len(recipe_ids))
+        self.size = len(recipe_ids)
+        self.recipe_ids[: self.size] = recipe_ids
+        self.totals[: self.size] = np.bincount(slots, minlength=self.size)
+        self.slots = dict(zip(recipe_ids.tolist(), range(self.size)))
+
+        order = np.argsort(pairs[:, 1], kind="stable")
+        features, starts = np.unique(pairs[order, 1], return_index=True)
+        grouped = np.split(slots[order].astype(np.int32), starts[1:])
+        self.postings = dict(zip(features.tolist(), grouped))
+
+    def __len__(self):
+        return len(self.slots)
+
+    @classmethod
+    def load(cls, user_id, recipe_ids=None):
+        """
+        Return the (recipe id, feature) pairs of ``user_id``'s recipes, or
+        of those among ``recipe_ids``.
+        """
+        raise NotImplementedError
+
+    def refresh(self, user_id, recipe_ids):
+        """Reload the recipes ``recipe_ids`` of ``user_id``."""
+        features = {pk: [] for pk in recipe_ids}
+        for recipe_id, feature in self.load(user_id, recipe_ids):
+            features[recipe_id].append(feature)
+        self.set_recipes(features)
+
+    def set_recipe(self, recipe_id, features):
+        """Index the recipe ``recipe_id`` as having ``features``."""
+        self.set_recipes({recipe_id: features})
+
+    def set_recipes(self, features_by_recipe):
+        """
+        Index each recipe of ``features_by_recipe`` as having its features.
+
+        Each posting array is extended once for the whole batch, so a
+        catch-up costs about the size of the postings it touches, not that
+        size for every recipe.
+        """
+        for recipe_id in features_by_recipe:
+            self.remove_recipe(recipe_id)
+        added = {}
+        for recipe_id, features in features_by_recipe.items():
+            features = set(features)
+            if not features:
+                continue
+            slot = self.size
+            self._reserve(slot + 1)
+            self.size += 1
+            self.slots[recipe_id] = slot
+            self.recipe_ids[slot] = recipe_id
+            self.totals[slot] = len(features)
+            for feature in features:
+                added.setdefault(feature, []).append(slot)
+        for feature, slots in added.items():
+            self.postings[feature] = np.concatenate(
+                (self.postings.get(feature, EMPTY), np.array(slots, dtype=np.int32))
+            )
+
+    def remove_recipe(self, recipe_id):
+        """Drop the recipe ``recipe_id`` from the index, if it is there."""
+        slot = self.slots.pop(recipe_id, None)
+        if slot is None:
+            return
+        self.recipe_ids[slot] = 0
+        self.totals[slot] = 0
+        self.dead += 1
+        if self.dead > max(1024, len(self.slots)):
+            self._compact()
+
+    def overlap(self, features):
+        """
+        Count the ``features`` of every slot, or return None if no recipe
+        has any of them.
+
+        Dead slots may be counted too: mask them with ``totals > 0``.
+        """
+        postings = [self.postings[key] for key in set(features) if key in self.postings]
+        if not postings:
+            return None
+        return np.bincount(np.concatenate(postings), minlength=self.size)
+
+    def rank(self, slots, score, limit):
+        """
+        Return the positions in ``slots`` of the ``limit`` best scored
+        recipes, best first and newest first among equals.
+        """
+        keep = np.arange(len(slots))
+        if len(slots) > limit:
+            # Keep every recipe tied with the last one, for the newest to win.
+            cutoff = np.partition(score, len(score) - limit)[len(score) - limit]
+            keep = np.flatnonzero(score >= cutoff)
+        order = np.lexsort((-self.recipe_ids[slots[keep]], -score[keep]))
+        return keep[order[:limit]]
+
+    def _reserve(self, size):
+        if size > len(self.recipe_ids):
+            capacity = max(size, 2 * len(self.recipe_ids))
+            self.recipe_ids = np.resize(self.recipe_ids, capacity)
+            self.totals = np.resize(self.totals, capacity)
+
+    def _compact(self):
+        alive = self.totals[: self.size] > 0
+        new_slots = (np.cumsum(alive) - 1).astype(np.int32)
+        postings = {}
+        for feature, slots in self.postings.items():
+            slots = new_slots[slots[alive[slots]]]
+            if len(slots):
+                postings[feature] = slots
+        self.postings = postings
+        self.recipe_ids = self.recipe_ids[: self.size][alive]
+        self.totals = self.totals[: self.size][alive]
+        self.size = len(self.recipe_ids)
+        self.slots = dict(zip(self.recipe_ids.tolist(), range(self.size)))
+        self.dead = 0
+        self._reserve(self.size + 1)
+
+
+def build(index_class, user_id):
+    """Build an ``index_class`` of ``user_id``'s objects from the database."""
+    # Read the counter first: changes made while loading are applied
+    # again by the next catch-up, which is harmless.
+    last_seq, _ = counter(user_id)
+    return index_class(last_seq, list(index_class.load(user_id)))
+
+
+def catch_up(index, user_id):
+    """
+    Apply ``user_id``'s changes since the index was built, in place.
+
+    Returns False (leaving the index as it was) if the change log no longer
+    covers them, or they are too many to apply one by one; rebuild then.
+    """
+    last_seq, compacted_seq = counter(user_id)
+    if last_seq == index.seq:
+        return True
+    if (
+        index.seq < compacted_seq
+        or not 0 < last_seq - index.seq <= settings.RECIPE_INDEX_MAX_CATCHUP
+    ):
+        return False
+    changed = set(
+        Change.objects.filter(
+            user_id=user_id, kind=index.kind, seq__gt=index.seq
+        ).values_list("object_id", flat=True)
+    )
+    if changed:
+        index.refresh(user_id, changed)
+    index.seq = last_seq
+    return True
+
+
+class IndexCache:
+    """Per-process LRU of the ``index_class`` indexes of recently used users."""
+
+    def __init__(self, index_class):
+        self.index_class = index_class
+        self.indexes = OrderedDict()
+        self.lock = threading.Lock()
+        self.warming = set()
+
+    @contextmanager
+    def get(self, user_id, build=True):
+        """
+        Yield ``user_id``'s index, up to date and locked for the block.
+
+        Without ``build``, yields None instead of building a missing index.
+        """
+        with self.lock:
+            index = self.indexes.get(user_id)
+            if index is not None:
+                self.indexes.move_to_end(user_id)
+        if index is not None:
+            with index.lock:
+                if catch_up(index, user_id):
+                    yield index
+                    return
+        if not build:
+            yield None
+            return
+
+        index = self.warm(user_id)
+        with index.lock:
+            yield index
+
+    def warm(self, user_id):
+        """Build and cache ``user_id``'s index; returns it."""
+        index = build(self.index_class, user_id)
+        with self.lock:
+            self.indexes[user_id] = index
+            self.indexes.move_to_end(user_id)
+            while len(self.indexes) > settings.RECIPE_INDEX_MAX_USERS:
+                self.indexes.popitem(last=False)
+        return index
+
+    def warm_later(self, user_id):
+        """
+        Build and cache ``user_id``'s index in the background.
+
+        Builds run one at a time on a thread of their own, so requests that
+        find an index missing don't wait for it; a user whose build is
+        already queued or running is not queued again. With
+        `settings.RECIPE_INDEX_WARM_IN_BACKGROUND` off (under test), the
+        index is built right away instead.
+        """
+        if not settings.RECIPE_INDEX_WARM_IN_BACKGROUND:
+            self.warm(user_id)
+            return
+        with self.lock:
+            if user_id in self.warming:
+                return
+            self.warming.add(user_id)
+        _builder.submit(self._warm_in_background, user_id)
+
+    def _warm_in_background(self, user_id):
+        try:
+            self.warm(user_id)
+        except Exception:
+            logger.exception(
+                "Building the %s of user %s failed.", self.index_class.__name__, user_id
+            )
+        finally:
+            with self.lock:
+                self.warming.discard(user_id)
+            # The thread outlives requests: don't keep their connection.
+            connection.close()
+
+    def clear(self):
+        """Forget every cached index."""
+        with self.lock:
+            self.indexes.clear()
+
+
+def counter(user_id):
+    """Return ``user_id``'s ``(last_seq, compacted_seq)`` in the change log."""
+    return (
+        ChangeSequence.objects.filter(user_id=user_id)
+        .values_list("last_seq", "compacted_seq")
+        .first()
+    ) or (0, 0)
@@ -0,0 +1,71 @@
+"""
+"What can I cook": match the ingredients a user has against their recipes.
+
+`PantryIndex` is a `apps.recipe.indexes.RecipeIndex` of one user's recipes
+by ingredient. Matching a pantry counts, for every recipe, how many of its
+ingredients are at hand, in one `numpy.bincount` over the posting arrays
+of the pantry's ingredients, and keeps the recipes that are covered enough.
+"""
+
+import numpy as np
+
+from apps.core.models import Recipe
+from apps.recipe.indexes import IndexCache, RecipeIndex
+
+
+RecipeIngredient = Recipe.ingredients.through
+
+
+class PantryIndex(RecipeIndex):
+    """Ingredient to recipe index of one user's recipes, at change ``seq``."""
+
+    @classmethod
+    def load(cls, user_id, recipe_ids=None):
+        pairs = RecipeIngredient.objects.filter(recipe__user_id=user_id)
+        if recipe_ids is not None:
+            pairs = pairs.filter(recipe_id__in=recipe_ids)
+        return pairs.values_list("recipe_id", "ingredient_id")
+
+    def match(self, have, min_coverage, limit):
+        """
+        Rank the recipes by the share of their ingredients in ``have``.
+
+        Returns up to ``limit`` ``(recipe_id, matched, total)`` tuples for
+        the recipes with at least ``min_coverage`` (0 to 1) of their
+        ingredients covered and at least one, best coverage first, then
+        fewest missing ingredients, then newest.
+        """
+        matched = self.overlap(have)
+        if matched is None:
+            return []
+        totals = self.totals[: self.size]
+        # The epsilon keeps e.g. 7 of 10 at a 0.7 coverage despite rounding.
+        needed = np.maximum(totals * min_coverage - 1e-9, 1)
+        # Dead slots are still in the postings, but have no ingredients.
+        candidates = np.flatnonzero((matched >= needed) & (totals > 0))
+        matched, totals = matched[candidates], totals[candidates]
+        # Coverage, with fewer missing ingredients breaking ties: coverages
+        # of distinct fractions differ far more than the missing term.
+        score = matched / totals - (totals - matched) * 1e-10
+        top = self.rank(candidates, score, limit)
+        return list(
+            zip(
+                self.recipe_ids[candidates[top]].tolist(),
+                matched[top].tolist(),
+                totals[top].tolist(),
+            )
+        )
+
+
+_cache = IndexCache(PantryIndex)
+
+
+def match(user_id, have, min_coverage, limit):
+    """Match the ingredient ids ``have`` against ``user_id``'s recipes."""
+    with _cache.get(user_id) as index:
+        return index.match(have, min_coverage, limit)
+
+
+def clear():
+    """Forget every cached index."""
+    _cache.clear()
@@ -2,12 +2,43 @@
 Serializers for recipe APIs
 """
 
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 
-from apps.core.models import Recipe, Tag, Ingredient
+from apps.core import jobs
+from apps.core.changes import record_changes
+from apps.core.fieldsets import SparseFieldsetSerializerMixin
+from apps.core.instrumentation import TimedSerializerMixin
+from apps.core.models import Change, Recipe, Tag, Ingredient
+from apps.recipe import duplicates
+from apps.recipe.images import delete_files, storage
 
 
-class TagSerializer(serializers.ModelSerializer):
+class UniqueNameMixin:
+    """
+    Reject renaming a tag or ingredient to a name the user already has.
+
+    Only applies when the serializer is used on its own: nested in a recipe,
+    an existing name refers to the existing object.
+    """
+
+    def validate_name(self, value):
+        if self.parent is None:
+            existing = self.Meta.model.objects.filter(
+                user=self.context["request"].user, name=value
+            )
+            if self.instance is not None:
+                existing = existing.exclude(pk=self.instance.pk)
+            if existing.exists():
+                raise serializers.ValidationError(
+                    f"You already have a {self.Meta.model._meta.verbose_name} "
+                    "with this name."
+                )
+        return value
+
+
+class TagSerializer(UniqueNameMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tags."""
 
     class Meta:
@@ -16,17 +47,27 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(
+    UniqueNameMixin, TimedSerializerMixin, serializers.ModelSerializer
+):
     """Serializer for Ingredient."""
 
     class Meta:
-        model = Tag
+        model = Ingredient
         fields = ["id", "name"]
         read_only_fields = ["id"]
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    """Serializer for recipes."""
+class RecipeSerializer(
+    SparseFieldsetSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer
+):
+    """
+    Serializer for recipes.
+
+    A created recipe is also returned with `duplicates`: the ids of the
+    user's recipes that look like near-duplicates of it, most alike first,
+    or null if they were not checked (see `apps.recipe.duplicates.find`).
+    """
 
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -38,51 +79,255 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def _get_or_create_tags(self, tags, recipe):
         auth_user = self.context["request"].user
-        for tag in tags:
-            tag_obj, _ = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
+        names = [tag["name"] for tag in tags]
+        objs = Tag.objects.get_or_create_many(auth_user, names)
+        recipe.tags.add(*objs)
+        return objs
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         auth_user = self.context["request"].user
-        for ingredient in ingredients:
-            ingredients_obj, _ = Ingredient.objects.get_or_create(
-                user=auth_user, **ingredient
-            )
-            recipe.ingredients.add(ingredients_obj)
+        names = [ingredient["name"] for ingredient in ingredients]
+        objs = Ingredient.objects.get_or_create_many(auth_user, names)
+        recipe.ingredients.add(*objs)
+        return objs
+
+    def _record_changes(self, recipe, tags, ingredients, created=False):
+        """Log the recipe and the tags and ingredients it was given for sync."""
+        recipe_change = [(Change.Kind.RECIPE, recipe.id)]
+        record_changes(
+            recipe.user_id,
+            created=recipe_change if created else [],
+            updated=([] if created else recipe_change)
+            + [(Change.Kind.TAG, tag.id) for tag in tags]
+            + [(Change.Kind.INGREDIENT, ingredient.id) for ingredient in ingredients],
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         """Create a recipe."""
         tags = validated_data.pop("tags", [])
         ingredients = validated_data.pop("ingredients", [])
+        found = duplicates.find(
+            self.context["request"].user.id,
+            validated_data["title"],
+            [ingredient["name"] for ingredient in ingredients],
+        )
 
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_ingredients(ingredients=ingredients, recipe=recipe)
-        self._get_or_create_tags(tags=tags, recipe=recipe)
+        ingredient_objs = self._get_or_create_ingredients(
+            ingredients=ingredients, recipe=recipe
+        )
+        tag_objs = self._get_or_create_tags(tags=tags, recipe=recipe)
+        self._record_changes(recipe, tag_objs, ingredient_objs, created=True)
+        recipe.duplicates = (
+            None if found is None else [recipe_id for recipe_id, _ in found]
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop("tags", None)
         ingredients = validated_data.pop("ingredients", None)
+        tag_objs, ingredient_objs = [], []
         if tags is not None:
             instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            tag_objs = self._get_or_create_tags(tags, instance)
 
         if ingredients is not None:
             instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            ingredient_objs = self._get_or_create_ingredients(ingredients, instance)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
         instance.save()
+        self._record_changes(instance, tag_objs, ingredient_objs)
         return instance
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if hasattr(instance, "duplicates"):
+            data["duplicates"] = instance.duplicates
+        return data
+
+
+class ThumbnailURLField(serializers.URLField):
+    """The URL of a thumbnail, given its storage name."""
+
+    def to_representation(self, value):
+        url = storage().url(value)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request is not None else url
+
 
 class RecipeDetailSerializer(RecipeSerializer):
-    """Serializer for recipe detail view."""
+    """
+    Serializer for recipe detail view.
+
+    ``thumbnails`` maps sizes to URLs; it is empty until the thumbnails of a
+    newly uploaded image have been rendered.
+    """
+
+    thumbnails = serializers.DictField(child=ThumbnailURLField(), read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ["description", "image", "thumbnails"]
+        read_only_fields = RecipeSerializer.Meta.read_only_fields + ["image"]
+
+
+class RecipeImageSerializer(serializers.ModelSerializer):
+    """Serializer for uploading an image to a recipe."""
+
+    thumbnails = serializers.DictField(child=ThumbnailURLField(), read_only=True)
+
+    class Meta:
+        model = Recipe
+        fields = ["id", "image", "thumbnails"]
+        read_only_fields = ["id"]
+        extra_kwargs = {"image": {"required": True, "allow_empty_file": False}}
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Store the image and queue the rendering of its thumbnails."""
+        old_image, old_thumbnails = instance.image.name, instance.thumbnails
+        instance.image = validated_data["image"]
+        instance.thumbnails = {}
+        instance.save(update_fields=["image", "thumbnails"])
+        jobs.enqueue(
+            "recipe.thumbnails",
+            user_id=instance.user_id,
+            recipe_id=instance.id,
+            image=instance.image.name,
+        )
+        record_changes(instance.user_id, updated=[(Change.Kind.RECIPE, instance.id)])
+        if old_image:
+            transaction.on_commit(lambda: delete_files(old_image, old_thumbnails))
+        return instance
+
+
+class CookableQuerySerializer(serializers.Serializer):
+    """Serializer for the query parameters of the cookable recipes search."""
+
+    have = serializers.CharField(
+        help_text="Comma-separated ids of the ingredients at hand."
+    )
+    min_coverage = serializers.FloatField(
+        default=0.5,
+        min_value=0,
+        max_value=1,
+        help_text="Smallest share of a recipe's ingredients at hand (1: all).",
+    )
+    limit = serializers.IntegerField(
+        default=20, min_value=1, max_value=settings.PANTRY_MAX_RESULTS
+    )
+
+    def validate_have(self, value):
+        try:
+            ids = {int(pk) for pk in value.split(",") if pk.strip()}
+        except ValueError:
+            raise serializers.ValidationError("Expected comma-separated ids.")
+        if not ids:
+            raise serializers.ValidationError("List at least one ingredient id.")
+        if len(ids) > settings.PANTRY_MAX_HAVE:
+            raise serializers.ValidationError(
+                f"List at most {settings.PANTRY_MAX_HAVE} ingredient ids."
+            )
+        return ids
+
+
+class CookableRecipeSerializer(RecipeSerializer):
+    """Serializer for a recipe matched against the ingredients at hand."""
+
+    coverage = serializers.FloatField(
+        read_only=True, help_text="Share of the recipe's ingredients at hand."
+    )
+    missing_ingredients = serializers.ListField(
+        child=serializers.IntegerField(), read_only=True
+    )
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ["coverage", "missing_ingredients"]
+
+
+class SimilarQuerySerializer(serializers.Serializer):
+    """Serializer for the query parameters of the similar recipes search."""
+
+    limit = serializers.IntegerField(
+        default=10, min_value=1, max_value=settings.SIMILAR_MAX_RESULTS
+    )
+
+
+class SimilarRecipeSerializer(RecipeSerializer):
+    """Serializer for a recipe ranked by similarity to another."""
+
+    similarity = serializers.FloatField(
+        read_only=True,
+        help_text="Shared tags and ingredients over all those of both recipes.",
+    )
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ["description"]
+        fields = RecipeSerializer.Meta.fields + ["similarity"]
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    """Serializer for the query parameters of a name autocomplete."""
+
+    q = serializers.CharField(
+        max_length=255,
+        trim_whitespace=False,
+        help_text="Prefix of the names to complete, in any case.",
+    )
+    limit = serializers.IntegerField(
+        default=10, min_value=1, max_value=settings.AUTOCOMPLETE_MAX_RESULTS
+    )
+
+
+class AutocompleteItemSerializer(serializers.Serializer):
+    """A tag or ingredient completing a prefix."""
+
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    """Serializer for the names completing a prefix."""
+
+    q = serializers.CharField(
+        help_text="The completed prefix, to tell the responses to quick "
+        "successive keystrokes apart."
+    )
+    results = AutocompleteItemSerializer(many=True)
+
+
+class BulkDeleteSerializer(serializers.Serializer):
+    """Serializer for the ids of a bulk delete."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_DELETE_MAX_IDS,
+    )
+
+
+class SyncTombstoneSerializer(serializers.Serializer):
+    """Ids of the objects deleted since the sync token."""
+
+    recipes = serializers.ListField(child=serializers.IntegerField())
+    tags = serializers.ListField(child=serializers.IntegerField())
+    ingredients = serializers.ListField(child=serializers.IntegerField())
+
+
+class SyncSerializer(serializers.Serializer):
+    """Serializer for a page of delta sync results."""
+
+    token = serializers.CharField(help_text="Pass as `since` on the next sync.")
+    reset = serializers.BooleanField(
+        help_text="The response is a full snapshot: replace all local data."
+    )
+    has_more = serializers.BooleanField(
+        help_text="More changes are pending: sync again with the new token."
+    )
+    recipes = RecipeDetailSerializer(many=True)
+    tags = TagSerializer(many=True)
+    ingredients = IngredientSerializer(many=True)
+    deleted = SyncTombstoneSerializer()
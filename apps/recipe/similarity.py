@@ -0,0 +1,83 @@
+"""
+Similar recipes: rank a user's recipes by the tags and ingredients they
+share with one recipe.
+
+`SimilarityIndex` is a `apps.recipe.indexes.RecipeIndex` of one user's
+recipes by tag and ingredient (tags as negative ids, so both fit in one
+index). The similarity of two recipes is the Jaccard index of their
+features, shared / (features of one + features of the other - shared). The
+shared counts of every recipe come from one `numpy.bincount` over the
+posting arrays of the recipe's features, and the best are picked with a
+partial sort instead of sorting every candidate.
+"""
+
+import numpy as np
+from django.db.models import F
+
+from apps.core.models import Recipe
+from apps.recipe.indexes import IndexCache, RecipeIndex
+
+
+RecipeIngredient = Recipe.ingredients.through
+RecipeTag = Recipe.tags.through
+
+
+def features(recipe):
+    """Return the features of ``recipe``: ingredient ids and negated tag ids."""
+    return {ingredient.id for ingredient in recipe.ingredients.all()} | {
+        -tag.id for tag in recipe.tags.all()
+    }
+
+
+class SimilarityIndex(RecipeIndex):
+    """Tag and ingredient to recipe index of one user's recipes."""
+
+    @classmethod
+    def load(cls, user_id, recipe_ids=None):
+        filters = {"recipe__user_id": user_id}
+        if recipe_ids is not None:
+            filters["recipe_id__in"] = recipe_ids
+        ingredients = RecipeIngredient.objects.filter(**filters).values_list(
+            "recipe_id", "ingredient_id"
+        )
+        tags = RecipeTag.objects.filter(**filters).values_list(
+            "recipe_id", -F("tag_id")
+        )
+        return ingredients.union(tags, all=True)
+
+    def similar(self, recipe_id, features, limit):
+        """
+        Rank the other recipes by their similarity to ``features``.
+
+        Returns up to ``limit`` ``(recipe_id, similarity)`` tuples for the
+        recipes sharing at least one feature, most similar first, then
+        newest; the recipe ``recipe_id`` itself is left out.
+        """
+        features = set(features)
+        shared = self.overlap(features)
+        if shared is None:
+            return []
+        totals = self.totals[: self.size]
+        # Dead slots are still in the postings, but have no features.
+        candidates = np.flatnonzero((shared > 0) & (totals > 0))
+        candidates = candidates[candidates != self.slots.get(recipe_id, -1)]
+        shared = shared[candidates]
+        score = shared / (totals[candidates] + len(features) - shared)
+        top = self.rank(candidates, score, limit)
+        return list(
+            zip(self.recipe_ids[candidates[top]].tolist(), score[top].tolist())
+        )
+
+
+_cache = IndexCache(SimilarityIndex)
+
+
+def similar_to(recipe, limit):
+    """Rank the recipes of ``recipe``'s owner by similarity to it."""
+    with _cache.get(recipe.user_id) as index:
+        return index.similar(recipe.id, features(recipe), limit)
+
+
+def clear():
+    """Forget every cached index."""
+    _cache.clear()
@@ -0,0 +1,45 @@
+"""
+Background tasks of the recipe app, run by `manage.py run_worker`.
+"""
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.core.changes import record_changes
+from apps.core.jobs import task
+from apps.core.models import Change, Recipe
+from apps.recipe import thumbnails
+from apps.recipe.images import delete_files, storage, thumbnail_names
+
+
+@task("recipe.thumbnails")
+def make_thumbnails(recipe_id, image):
+    """
+    Render the thumbnails of ``image``, the image uploaded to the recipe.
+
+    Does nothing if the recipe was deleted or given another image since.
+    """
+    if not Recipe.objects.filter(id=recipe_id, image=image).exists():
+        return None
+    names = thumbnail_names(image)
+    thumbnails.generate(
+        storage().path(image),
+        [(size, storage().path(name)) for size, name in names.items()],
+        quality=settings.RECIPE_THUMBNAIL_QUALITY,
+        processes=settings.RECIPE_THUMBNAIL_PROCESSES,
+    )
+    with transaction.atomic():
+        recipe = (
+            Recipe.objects.select_for_update()
+            .filter(id=recipe_id, image=image)
+            .only("id", "user_id")
+            .first()
+        )
+        if recipe is None:
+            transaction.on_commit(lambda: delete_files(image))
+            return None
+        Recipe.objects.filter(id=recipe_id).update(
+            thumbnails={str(size): name for size, name in names.items()}
+        )
+        record_changes(recipe.user_id, updated=[(Change.Kind.RECIPE, recipe_id)])
+    return {"sizes": sorted(names)}
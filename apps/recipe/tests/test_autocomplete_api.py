@@ -0,0 +1,176 @@
+"""Tests for tag and ingredient name autocomplete"""
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core.models import Ingredient, Tag
+from apps.recipe import autocomplete
+
+
+TAGS_AUTOCOMPLETE_URL = reverse("recipe:tag-autocomplete")
+INGREDIENTS_AUTOCOMPLETE_URL = reverse("recipe:ingredient-autocomplete")
+
+
+class NameIndexTests(SimpleTestCase):
+    """Test completing prefixes from a sorted name index."""
+
+    def setUp(self):
+        self.index = autocomplete.NameIndex(
+            0, [(1, "Pasta"), (2, "pepper"), (3, "Peas"), (4, "Rice"), (5, "PEAS")]
+        )
+
+    def test_complete_ignores_case(self):
+        """Test names starting with the prefix are listed alphabetically."""
+        self.assertEqual(
+            self.index.complete("pe", 10), [(3, "Peas"), (5, "PEAS"), (2, "pepper")]
+        )
+        self.assertEqual(self.index.complete("PAS", 10), [(1, "Pasta")])
+        self.assertEqual(self.index.complete("x", 10), [])
+
+    def test_complete_limit(self):
+        """Test at most ``limit`` names are listed."""
+        self.assertEqual(self.index.complete("p", 2), [(1, "Pasta"), (3, "Peas")])
+
+    def test_add_and_remove(self):
+        """Test added, renamed and removed names are completed accordingly."""
+        self.index.add(6, "Penne")
+        self.index.remove(2)
+        self.index.remove(2)
+        self.index.remove(4)
+        self.index.add(4, "Pesto")
+
+        self.assertEqual(
+            [name for _, name in self.index.complete("pe", 10)],
+            ["Peas", "PEAS", "Penne", "Pesto"],
+        )
+        self.assertEqual(len(self.index), 5)
+
+
+class AutocompleteApiTests(TestCase):
+    """Test the autocomplete endpoints."""
+
+    def setUp(self):
+        autocomplete.clear()
+        self.addCleanup(autocomplete.clear)
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for name in ["Dinner", "dessert", "Breakfast", "Desi"]:
+            Tag.objects.create(user=self.user, name=name)
+
+    def names(self, res):
+        return [item["name"] for item in res.data["results"]]
+
+    def test_autocomplete_requires_auth(self):
+        """Test authentication is required."""
+        res = APIClient().get(TAGS_AUTOCOMPLETE_URL, {"q": "d"})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cold_then_warm(self):
+        """Test the database answers until the index is built, and agrees with it."""
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "de"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["q"], "de")
+        self.assertEqual(self.names(res), ["Desi", "dessert"])
+        # The cold request built the index (in the request, under test).
+        with autocomplete.tags.get(self.user.id, build=False) as index:
+            self.assertIsNotNone(index)
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "de"})
+        self.assertEqual(self.names(res), ["Desi", "dessert"])
+
+    def test_non_ascii_names(self):
+        """Test the database and the index agree on names outside ASCII."""
+        for name in ["Straße", "STRASSE", "Éclair", "éclair", "Ölkuchen"]:
+            Tag.objects.create(user=self.user, name=name)
+        typed = ["stras", "STRAß", "é", "É", "e", "öl", "OL"]
+
+        def complete():
+            return [
+                self.names(self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": prefix}))
+                for prefix in typed
+            ]
+
+        with patch.object(autocomplete.tags, "warm_later"):
+            cold = complete()
+        autocomplete.tags.warm(self.user.id)
+        warm = complete()
+
+        self.assertEqual(cold, warm)
+        self.assertEqual(cold[0], ["Straße", "STRASSE"])
+        self.assertEqual(cold[1], ["Straße", "STRASSE"])
+        self.assertEqual(cold[2], ["Éclair", "éclair"])
+        self.assertEqual(cold[4], [])
+        self.assertEqual(cold[5], ["Ölkuchen"])
+
+    def test_limit(self):
+        """Test the limit caps the results, and is validated."""
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "D", "limit": 2})
+
+        self.assertEqual(self.names(res), ["Desi", "dessert"])
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "D", "limit": 0})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sees_writes(self):
+        """Test renamed and deleted tags are completed accordingly."""
+        autocomplete.tags.warm(self.user.id)
+        tag = Tag.objects.get(name="Breakfast")
+
+        self.client.patch(
+            reverse("recipe:tag-detail", args=[tag.id]), {"name": "Dumplings"}
+        )
+        self.client.delete(
+            reverse("recipe:tag-detail", args=[Tag.objects.get(name="Desi").id])
+        )
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "d"})
+
+        self.assertEqual(self.names(res), ["dessert", "Dinner", "Dumplings"])
+
+    def test_only_own_names(self):
+        """Test other users' names are not completed."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        Ingredient.objects.create(user=other, name="Salt")
+        Ingredient.objects.create(user=self.user, name="Sugar")
+
+        for _ in range(2):
+            res = self.client.get(INGREDIENTS_AUTOCOMPLETE_URL, {"q": "s"})
+            self.assertEqual(
+                res.data["results"],
+                [{"id": Ingredient.objects.get(name="Sugar").id, "name": "Sugar"}],
+            )
+
+    def test_etag(self):
+        """Test repeated requests get a 304 until the names change."""
+        res = self.client.get(TAGS_AUTOCOMPLETE_URL, {"q": "de"})
+        etag = res["ETag"]
+        self.assertIn("max-age", res["Cache-Control"])
+
+        res = self.client.get(
+            TAGS_AUTOCOMPLETE_URL, {"q": "de"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        res = self.client.get(
+            TAGS_AUTOCOMPLETE_URL, {"q": "des"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        tag = Tag.objects.get(name="Desi")
+        self.client.patch(reverse("recipe:tag-detail", args=[tag.id]), {"name": "Deli"})
+        res = self.client.get(
+            TAGS_AUTOCOMPLETE_URL, {"q": "de"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.names(res), ["Deli", "dessert"])
@@ -0,0 +1,227 @@
+"""Tests for matching recipes against the ingredients at hand"""
+
+import threading
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core.models import ChangeSequence, Ingredient, Recipe
+from apps.recipe import indexes, pantry
+
+
+COOKABLE_URL = reverse("recipe:recipe-cookable")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def recipe_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+class PantryIndexTests(SimpleTestCase):
+    """Test the in-memory ingredient index."""
+
+    def setUp(self):
+        # Recipe 1: ingredients 10, 11; recipe 2: 10, 11, 12, 13; recipe 3: 12.
+        self.index = pantry.PantryIndex(
+            0, [(1, 10), (1, 11), (2, 10), (2, 11), (2, 12), (2, 13), (3, 12)]
+        )
+
+    def test_match_ranks_by_coverage(self):
+        """Test fully covered recipes come first, then partial ones."""
+        self.assertEqual(self.index.match({10, 11}, 0.5, 10), [(1, 2, 2), (2, 2, 4)])
+        self.assertEqual(self.index.match({10, 11}, 1, 10), [(1, 2, 2)])
+        self.assertEqual(self.index.match({99}, 0, 10), [])
+
+    def test_ties_prefer_fewer_missing_then_newest(self):
+        """Test equal coverage ranks fewer missing ingredients, then newer."""
+        index = pantry.PantryIndex(
+            0,
+            [(1, 10), (1, 11), (2, 10), (3, 10), (3, 11), (3, 12), (3, 13)]
+            + [(4, 10), (4, 14)],
+        )
+        self.assertEqual(
+            index.match({10, 12}, 0.5, 10),
+            [(2, 1, 1), (4, 1, 2), (1, 1, 2), (3, 2, 4)],
+        )
+        self.assertEqual(index.match({10, 12}, 0.5, 2), [(2, 1, 1), (4, 1, 2)])
+
+    def test_limit_keeps_best(self):
+        """Test the limit keeps the best ranked recipes."""
+        self.assertEqual(self.index.match({10, 11, 12}, 0, 2), [(3, 1, 1), (1, 2, 2)])
+
+    def test_incremental_updates(self):
+        """Test recipes can be added, changed and removed in place."""
+        self.index.set_recipe(4, [10])
+        self.index.set_recipe(1, [10, 14])
+        self.index.remove_recipe(3)
+
+        self.assertEqual(self.index.match({10, 14}, 1, 10), [(4, 1, 1), (1, 2, 2)])
+        self.assertEqual(self.index.match({12}, 0, 10), [(2, 1, 4)])
+        self.assertEqual(len(self.index), 3)
+
+    def test_catch_up_many_changes(self):
+        """Test a batch of changes matches like an index built from scratch."""
+        # Every recipe has ingredient 1, like salt.
+        pairs = [(pk, 1) for pk in range(1, 5001)] + [(pk, 2 + pk % 7) for pk in range(1, 5001)]
+        index = pantry.PantryIndex(0, pairs)
+        changed = {pk: [1, 10 + pk % 5] for pk in range(1, 5001, 3)}
+        changed[7] = []
+
+        index.set_recipes(changed)
+
+        final = {pk: {1, 2 + pk % 7} for pk in range(1, 5001)}
+        final.update((pk, set(features)) for pk, features in changed.items())
+        rebuilt = pantry.PantryIndex(
+            0, [(pk, feature) for pk, features in final.items() for feature in features]
+        )
+        self.assertEqual(len(index), len(rebuilt))
+        for have in ({1}, {1, 11}, {3, 12}, {1, 2, 3, 4, 5, 6, 7, 8}):
+            self.assertEqual(index.match(have, 0.5, 50), rebuilt.match(have, 0.5, 50))
+
+    def test_compaction(self):
+        """Test dead slots are reclaimed without changing results."""
+        for n in range(3000):
+            self.index.set_recipe(100 + n % 10, [10, 20 + n % 3])
+
+        self.assertLess(self.index.size, 2048)
+        self.assertEqual(len(self.index), 13)
+        self.assertEqual(
+            [recipe_id for recipe_id, _, _ in self.index.match({10, 22}, 1, 20)],
+            [109, 106, 103, 100],
+        )
+
+
+@override_settings(RECIPE_INDEX_WARM_IN_BACKGROUND=True)
+class IndexCacheTests(SimpleTestCase):
+    """Test building indexes in the background."""
+
+    def test_warm_later_builds_once(self):
+        """Test a user's index is built once, however often it is asked for."""
+        cache = indexes.IndexCache(pantry.PantryIndex)
+        started, release = threading.Event(), threading.Event()
+
+        def warm(user_id):
+            started.set()
+            release.wait(5)
+
+        with patch.object(cache, "warm", side_effect=warm) as build:
+            cache.warm_later(1)
+            self.assertTrue(started.wait(5))
+            cache.warm_later(1)
+            cache.warm_later(2)
+            release.set()
+            indexes._builder.submit(lambda: None).result(5)
+            self.assertEqual(cache.warming, set())
+            cache.warm_later(1)
+            indexes._builder.submit(lambda: None).result(5)
+
+        self.assertEqual(
+            [call.args for call in build.call_args_list], [(1,), (2,), (1,)]
+        )
+
+
+class CookableApiTests(TestCase):
+    """Test the cookable recipes endpoint."""
+
+    def setUp(self):
+        pantry.clear()
+        self.addCleanup(pantry.clear)
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rice, self.egg, self.salt, self.lime = (
+            Ingredient.objects.get_or_create_many(
+                self.user, ["Rice", "Egg", "Salt", "Lime"]
+            )
+        )
+
+    def create_recipe(self, title, ingredients, user=None):
+        recipe = Recipe.objects.create(
+            user=user or self.user, title=title, time_minute=10, price=Decimal("1")
+        )
+        recipe.ingredients.set(ingredients)
+        return recipe
+
+    def cookable(self, have, **params):
+        res = self.client.get(
+            COOKABLE_URL, {"have": ",".join(str(i.id) for i in have), **params}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_cookable_recipes(self):
+        """Test recipes are ranked by coverage with their missing ingredients."""
+        fried_rice = self.create_recipe("Fried rice", [self.rice, self.egg, self.salt])
+        boiled_egg = self.create_recipe("Boiled egg", [self.egg, self.salt])
+        self.create_recipe("Lime rice", [self.rice, self.lime, self.salt])
+
+        data = self.cookable([self.egg, self.salt], min_coverage=0.6)
+
+        self.assertEqual([r["id"] for r in data], [boiled_egg.id, fried_rice.id])
+        self.assertEqual(data[0]["coverage"], 1.0)
+        self.assertEqual(data[0]["missing_ingredients"], [])
+        self.assertAlmostEqual(data[1]["coverage"], 2 / 3)
+        self.assertEqual(data[1]["missing_ingredients"], [self.rice.id])
+        self.assertEqual(data[1]["title"], "Fried rice")
+
+    def test_only_own_recipes(self):
+        """Test other users' recipes are never matched."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        self.create_recipe("Theirs", [self.rice], user=other)
+
+        self.assertEqual(self.cookable([self.rice]), [])
+
+    def test_index_follows_writes(self):
+        """Test the cached index catches up with updates and deletes."""
+        fried_rice = self.create_recipe("Fried rice", [self.rice, self.egg])
+        boiled_egg = self.create_recipe("Boiled egg", [self.egg])
+        self.assertEqual(len(self.cookable([self.egg], min_coverage=1)), 1)
+
+        res = self.client.patch(
+            recipe_url(fried_rice.id),
+            {"ingredients": [{"name": "Egg"}]},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {r["id"] for r in self.cookable([self.egg], min_coverage=1)},
+            {fried_rice.id, boiled_egg.id},
+        )
+
+        self.client.delete(recipe_url(boiled_egg.id))
+        self.assertEqual([r["id"] for r in self.cookable([self.egg])], [fried_rice.id])
+
+    def test_rebuild_after_compaction(self):
+        """Test an index behind the compacted log is rebuilt."""
+        self.create_recipe("Boiled egg", [self.egg])
+        self.cookable([self.egg])
+        # Written without the change log, then the log is compacted past it.
+        recipe = self.create_recipe("Salted egg", [self.egg, self.salt])
+        ChangeSequence.objects.update_or_create(
+            user=self.user, defaults={"last_seq": 10, "compacted_seq": 10}
+        )
+
+        data = self.cookable([self.egg, self.salt], min_coverage=1)
+
+        self.assertIn(recipe.id, [r["id"] for r in data])
+
+    def test_invalid_parameters(self):
+        """Test malformed pantry queries are rejected."""
+        for params in (
+            {},
+            {"have": ""},
+            {"have": "1,x"},
+            {"have": "1", "min_coverage": 2},
+            {"have": "1", "limit": 0},
+        ):
+            res = self.client.get(COOKABLE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)
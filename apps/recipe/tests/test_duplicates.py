@@ -0,0 +1,205 @@
+"""Tests for near-duplicate recipe detection"""
+
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core.models import Change, Ingredient, Recipe, Tag
+from apps.recipe import duplicates
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+class MinHashTests(SimpleTestCase):
+    """Test shingling, signatures and clustering."""
+
+    def test_shingles_ignore_case_and_punctuation(self):
+        """Test title variants that differ in case and punctuation match."""
+        self.assertEqual(
+            duplicates.shingles("Fried Rice!", ["Egg"]),
+            duplicates.shingles("fried  rice", ["EGG "]),
+        )
+        self.assertIn("#egg", duplicates.shingles("Fried rice", ["Egg"]))
+
+    def test_signatures_estimate_jaccard(self):
+        """Test equal signature entries estimate the Jaccard index."""
+        a = {f"s{n}" for n in range(100)}
+        b = {f"s{n}" for n in range(20, 120)}
+        sigs = duplicates.signatures([a, b, a])
+
+        self.assertEqual(sigs.shape, (3, duplicates.PERMUTATIONS))
+        self.assertTrue((sigs[0] == sigs[2]).all())
+        estimate = (sigs[0] == sigs[1]).mean()
+        self.assertAlmostEqual(estimate, duplicates.jaccard(a, b), delta=0.2)
+
+    def test_cluster(self):
+        """Test near-duplicates are grouped, transitively, and others not."""
+        items = [
+            ("Chicken curry", ["Chicken", "Rice", "Curry paste"]),
+            ("Chicken Curry!", ["Chicken", "Rice", "Curry paste"]),
+            ("Chicken curry.", ["chicken", "rice", "curry paste"]),
+            ("Banana bread", ["Banana", "Flour"]),
+            ("Lentil soup", ["Lentils", "Onion"]),
+            ("Lentil soup", ["Lentils", "Onion"]),
+        ]
+        sigs = duplicates.signatures([duplicates.shingles(*item) for item in items])
+
+        clusters = duplicates.cluster([10, 11, 12, 13, 14, 15], sigs, 0.8)
+
+        self.assertEqual(clusters, [[10, 11, 12], [14, 15]])
+
+    def test_band_keys(self):
+        """Test each signature gets one key per band, equal for equal bands."""
+        sigs = duplicates.signatures([{"a", "b"}, {"a", "b"}, {"c"}])
+        keys = duplicates.band_keys(sigs)
+
+        self.assertEqual(keys.shape, (3, duplicates.BANDS))
+        self.assertTrue(np.array_equal(keys[0], keys[1]))
+        self.assertFalse(np.intersect1d(keys[0], keys[2]).size)
+
+
+class DuplicateDetectionTests(TestCase):
+    """Test the on-create check and the duplicates command."""
+
+    def setUp(self):
+        duplicates.clear()
+        self.addCleanup(duplicates.clear)
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, title, ingredients=(), tags=(), user=None):
+        user = user or self.user
+        recipe = Recipe.objects.create(
+            user=user, title=title, time_minute=10, price=Decimal("1")
+        )
+        recipe.ingredients.set(Ingredient.objects.get_or_create_many(user, ingredients))
+        recipe.tags.set(Tag.objects.get_or_create_many(user, tags))
+        return recipe
+
+    def post_recipe(self, title, ingredients):
+        res = self.client.post(
+            RECIPES_URL,
+            {
+                "title": title,
+                "time_minute": 10,
+                "price": "1.00",
+                "ingredients": [{"name": name} for name in ingredients],
+            },
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data
+
+    def test_create_reports_duplicates(self):
+        """Test creating a near-duplicate returns the recipes it duplicates."""
+        original = self.create_recipe("Chicken curry", ["Chicken", "Rice"])
+        self.create_recipe("Banana bread", ["Banana", "Flour"])
+        duplicates.warm(self.user.id)
+
+        data = self.post_recipe("Chicken Curry!", ["chicken", "rice"])
+
+        self.assertEqual(data["duplicates"], [original.id])
+        data = self.post_recipe("Lentil soup", ["Lentils"])
+        self.assertEqual(data["duplicates"], [])
+
+    def test_cold_index_is_built_for_later_creates(self):
+        """Test a create with no index built skips the check and builds it."""
+        self.create_recipe("Pad thai", ["Noodles", "Peanuts"])
+
+        with patch.object(duplicates, "describe", wraps=duplicates.describe) as load:
+            data = self.post_recipe("Pad Thai", ["Noodles", "Peanuts"])
+            # Loaded to build the index (in the request, under test).
+            load.assert_called_once_with(self.user.id, None)
+
+        self.assertIsNone(data["duplicates"])
+        data = self.post_recipe("Pad thai!", ["Noodles", "Peanuts"])
+        self.assertEqual(len(data["duplicates"]), 2)
+
+    def test_create_sees_new_recipes(self):
+        """Test recipes created since the index was built are checked too."""
+        duplicates.warm(self.user.id)
+        first = self.post_recipe("Pad thai", ["Noodles", "Peanuts"])
+
+        data = self.post_recipe("Pad Thai", ["Noodles", "Peanuts"])
+
+        self.assertEqual(data["duplicates"], [first["id"]])
+        res = self.client.get(reverse("recipe:recipe-detail", args=[first["id"]]))
+        self.assertNotIn("duplicates", res.data)
+
+    def test_only_own_recipes(self):
+        """Test other users' recipes are not reported."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        self.create_recipe("Chicken curry", ["Chicken"], user=other)
+        duplicates.warm(self.user.id)
+
+        data = self.post_recipe("Chicken curry", ["Chicken"])
+
+        self.assertEqual(data["duplicates"], [])
+
+    def test_command_reports_clusters(self):
+        """Test the command lists clusters without changing anything."""
+        first = self.create_recipe("Chicken curry", ["Chicken", "Rice"])
+        second = self.create_recipe("Chicken Curry", ["Chicken", "Rice"])
+        self.create_recipe("Banana bread", ["Banana"])
+
+        out = StringIO()
+        call_command("find_duplicate_recipes", stdout=out)
+
+        self.assertIn(f"user@example.com: {first.id} (Chicken curry), {second.id}", out.getvalue())
+        self.assertIn("Found 1 clusters of 2 recipes.", out.getvalue())
+        self.assertEqual(Recipe.objects.count(), 3)
+
+    def test_command_merges(self):
+        """Test merging keeps the oldest recipe with everyone's tags and ingredients."""
+        first = self.create_recipe("Chicken curry", ["Chicken", "Rice"], ["Dinner"])
+        second = self.create_recipe("Chicken curry", ["Chicken", "Rice"], ["Spicy"])
+
+        out = StringIO()
+        call_command("find_duplicate_recipes", "--merge", stdout=out)
+
+        self.assertIn("Merged 1 clusters of 2 recipes.", out.getvalue())
+        self.assertFalse(Recipe.objects.filter(id=second.id).exists())
+        self.assertEqual(
+            sorted(first.tags.values_list("name", flat=True)), ["Dinner", "Spicy"]
+        )
+        self.assertEqual(first.ingredients.count(), 2)
+        self.assertTrue(
+            Change.objects.filter(object_id=second.id, deleted=True).exists()
+        )
+
+    def test_merge_skips_chained_recipes(self):
+        """Test a chain A~B~C merges B into A but leaves C, unlike A."""
+        names = [f"Ingredient {n}" for n in range(12)]
+        title = "Slow cooked vegetable lentil soup"
+        a = self.create_recipe(title, names[:8])
+        b = self.create_recipe(title, names[2:10])
+        c = self.create_recipe(title, names[4:12])
+
+        out = StringIO()
+        call_command(
+            "find_duplicate_recipes", "--merge", "--threshold", "0.85", stdout=out
+        )
+
+        self.assertIn(f"{a.id} (", out.getvalue())
+        self.assertIn(f"{c.id} (", out.getvalue())
+        self.assertIn(f"merged {b.id} into {a.id}", out.getvalue())
+        self.assertIn(f"left {c.id}: less alike {a.id}", out.getvalue())
+        self.assertIn("Merged 1 clusters of 2 recipes.", out.getvalue())
+        self.assertEqual(
+            sorted(Recipe.objects.values_list("id", flat=True)), [a.id, c.id]
+        )
+        self.assertEqual(a.ingredients.count(), 10)
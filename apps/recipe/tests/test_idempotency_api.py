@@ -0,0 +1,163 @@
+"""Tests for Idempotency-Key support on recipe writes"""
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core.models import IdempotencyKey, Recipe
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+
+PAYLOAD = {
+    "title": "Curry",
+    "time_minute": 20,
+    "price": Decimal("4.50"),
+    "tags": [{"name": "Dinner"}],
+}
+
+
+def recipe_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+class IdempotencyKeyApiTests(TestCase):
+    """Test retried recipe writes with an Idempotency-Key header."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client.force_authenticate(self.user)
+
+    def post(self, payload=PAYLOAD, key="key-1"):
+        return self.client.post(
+            RECIPES_URL, payload, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_first_response(self):
+        """Test a retried create returns the first response and writes nothing."""
+        first = self.post()
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.post()
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", first)
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(len(queries), 1)
+
+    def test_keys_are_per_user(self):
+        """Test another user's key does not replay this user's response."""
+        self.post()
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        self.client.force_authenticate(other)
+
+        res = self.post()
+
+        self.assertNotIn("Idempotent-Replayed", res)
+        self.assertEqual(Recipe.objects.filter(user=other).count(), 1)
+
+    def test_key_reused_for_different_request(self):
+        """Test reusing a key with another payload is rejected."""
+        self.post()
+
+        res = self.post({**PAYLOAD, "title": "Soup"})
+
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_request_in_progress(self):
+        """Test a duplicate of a running request gets 409 with Retry-After."""
+        self.post()
+        IdempotencyKey.objects.update(status_code=None, response=None)
+
+        res = self.post()
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res["Retry-After"], "1")
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_abandoned_claim_is_taken_over(self):
+        """Test a claim whose request never finished can be claimed again."""
+        self.post()
+        IdempotencyKey.objects.update(
+            status_code=None,
+            response=None,
+            created_at=timezone.now() - timedelta(minutes=5),
+        )
+
+        res = self.post()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_failed_request_releases_key(self):
+        """Test a request that fails validation can be retried with its key."""
+        invalid = self.post({"title": "Curry"})
+
+        res = self.post()
+
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_patch(self):
+        """Test a retried partial update is replayed."""
+        recipe_id = self.post().data["id"]
+        url = recipe_url(recipe_id)
+
+        first = self.client.patch(
+            url, {"title": "Soup"}, format="json", HTTP_IDEMPOTENCY_KEY="patch-1"
+        )
+        Recipe.objects.filter(id=recipe_id).update(title="Changed elsewhere")
+        retry = self.client.patch(
+            url, {"title": "Soup"}, format="json", HTTP_IDEMPOTENCY_KEY="patch-1"
+        )
+
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Recipe.objects.get(id=recipe_id).title, "Changed elsewhere")
+
+    def test_without_key(self):
+        """Test requests without the header are not deduplicated."""
+        self.client.post(RECIPES_URL, PAYLOAD, format="json")
+        self.client.post(RECIPES_URL, PAYLOAD, format="json")
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_keys(self):
+        """Test expired keys are reusable and purged."""
+        self.post()
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        res = self.post()
+        IdempotencyKey.objects.create(
+            user=self.user,
+            key="old",
+            fingerprint=b"",
+            created_at=timezone.now() - timedelta(days=2),
+        )
+        call_command("purge_idempotency_keys", stdout=StringIO())
+
+        self.assertNotIn("Idempotent-Replayed", res)
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)), ["key-1"]
+        )
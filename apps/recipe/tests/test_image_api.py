@@ -0,0 +1,209 @@
+"""Tests for recipe image uploads and thumbnails"""
+
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core import jobs
+from apps.core.models import Job, Recipe
+from apps.recipe import thumbnails
+
+
+def image_upload_url(recipe_id):
+    return reverse("recipe:recipe-upload-image", args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def image_file(size=(1200, 800), fmt="JPEG", color="orange"):
+    """Return an open temporary file holding an image."""
+    file = tempfile.NamedTemporaryFile(suffix=f".{fmt.lower()}")
+    mode = "RGBA" if isinstance(color, tuple) and len(color) == 4 else "RGB"
+    Image.new(mode, size, color).save(file, format=fmt)
+    file.seek(0)
+    return file
+
+
+def run_jobs():
+    return [jobs.execute(*row) for row in jobs.claim(10)]
+
+
+@override_settings(RECIPE_THUMBNAIL_SIZES=[100, 400], RECIPE_THUMBNAIL_PROCESSES=0)
+class ImageUploadTests(TestCase):
+    """Test uploading images to recipes."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Curry", time_minute=10, price=Decimal("1.00")
+        )
+
+    def upload(self, file, recipe=None):
+        return self.client.post(
+            image_upload_url((recipe or self.recipe).id),
+            {"image": file},
+            format="multipart",
+        )
+
+    def test_upload_image_queues_thumbnails(self):
+        """Test the image is stored at once and thumbnails are made later."""
+        with image_file() as file:
+            res = self.upload(file)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertTrue(res.data["image"].endswith(self.recipe.image.url))
+        self.assertEqual(res.data["thumbnails"], {})
+        job = Job.objects.get()
+        self.assertEqual(job.name, "recipe.thumbnails")
+        self.assertEqual(job.user, self.user)
+
+        self.assertEqual(run_jobs(), [Job.Status.SUCCEEDED])
+
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(sorted(res.data["thumbnails"]), ["100", "400"])
+        self.recipe.refresh_from_db()
+        for size, name in self.recipe.thumbnails.items():
+            self.assertTrue(res.data["thumbnails"][size].startswith("http://testserver/"))
+            with Image.open(os.path.join(self.media_root, name)) as thumbnail:
+                self.assertEqual(thumbnail.format, "WEBP")
+                self.assertEqual(max(thumbnail.size), int(size))
+
+    def test_upload_keeps_transparency(self):
+        """Test PNGs with an alpha channel keep it in their thumbnails."""
+        with image_file(fmt="PNG", color=(255, 165, 0, 128)) as file:
+            self.upload(file)
+        run_jobs()
+
+        self.recipe.refresh_from_db()
+        name = self.recipe.thumbnails["100"]
+        with Image.open(os.path.join(self.media_root, name)) as thumbnail:
+            self.assertEqual(thumbnail.mode, "RGBA")
+
+    def test_upload_invalid_image(self):
+        """Test files that are not images are rejected."""
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as file:
+            file.write(b"not an image")
+            file.seek(0)
+            res = self.upload(file)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(os.listdir(self.media_root), [])
+
+    @override_settings(RECIPE_IMAGE_MAX_BYTES=1000)
+    def test_upload_too_large(self):
+        """Test uploads over the size limit are rejected."""
+        with image_file() as file:
+            res = self.upload(file)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("at most", res.data["image"][0])
+
+    def test_upload_other_users_recipe(self):
+        """Test images can't be uploaded to another user's recipe."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        recipe = Recipe.objects.create(
+            user=other, title="Soup", time_minute=10, price=Decimal("1.00")
+        )
+        with image_file() as file:
+            res = self.upload(file, recipe)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_replace_image(self):
+        """Test a new image deletes the old one and its thumbnails."""
+        with image_file() as file:
+            self.upload(file)
+        run_jobs()
+        self.recipe.refresh_from_db()
+        old = [self.recipe.image.name, *self.recipe.thumbnails.values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with image_file() as file:
+                self.upload(file)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.thumbnails, {})
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.media_root, "recipes"))),
+            [os.path.basename(self.recipe.image.name)],
+        )
+        self.assertNotIn(self.recipe.image.name, old)
+
+    def test_stale_thumbnail_job(self):
+        """Test a job for a replaced image leaves the recipe alone."""
+        with image_file() as file:
+            self.upload(file)
+        with image_file() as file:
+            self.upload(file)
+
+        run_jobs()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(len(self.recipe.thumbnails), 2)
+        stem = os.path.splitext(self.recipe.image.name)[0]
+        self.assertTrue(
+            all(name.startswith(stem) for name in self.recipe.thumbnails.values())
+        )
+
+    def test_clean_orphans(self):
+        """Test files of deleted recipes are removed by the cleanup command."""
+        with image_file() as file:
+            self.upload(file)
+        run_jobs()
+        self.recipe.delete()
+
+        out = StringIO()
+        call_command("clean_recipe_images", "--min-age-hours", 0, stdout=out)
+
+        self.assertIn("Deleted 3 image files.", out.getvalue())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "recipes")), [])
+
+
+class ThumbnailPoolTests(TestCase):
+    """Test rendering thumbnails in the process pool."""
+
+    def test_render_in_pool(self):
+        """Test the pool renders every size, shrinking but never enlarging."""
+        self.addCleanup(thumbnails.shutdown)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        targets = [
+            (size, os.path.join(directory, f"thumb-{size}.webp"))
+            for size in (50, 300, 2000)
+        ]
+
+        with image_file(size=(600, 300)) as file:
+            sizes = thumbnails.generate(file.name, targets, processes=1)
+
+        self.assertEqual(sizes, [2000, 300, 50])
+        expected = {50: (50, 25), 300: (300, 150), 2000: (600, 300)}
+        for size, path in targets:
+            with Image.open(path) as thumbnail:
+                self.assertEqual(thumbnail.size, expected[size])
@@ -1,7 +1,9 @@
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -342,3 +344,94 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(ingredient2, recipe.ingredients.all())
         # Ensure ingredient1 (Chili) is no longer in the recipe's ingredients
         self.assertNotIn(ingredient1, recipe.ingredients.all())
+
+    def test_create_recipe_resolves_names_in_one_statement(self):
+        """Test tags are resolved with one insert, however many names are sent."""
+        Tag.objects.create(user=self.user, name="Indian")
+        payload = {
+            "title": "Dal",
+            "time_minute": 30,
+            "price": Decimal("3.00"),
+            "tags": [{"name": n} for n in ("Indian", "Lunch", "Vegan", "Lunch")],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        inserts = [q for q in queries if 'INSERT INTO "core_tag"' in q["sql"]]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+        recipe = Recipe.objects.get(id=res.data["id"])
+        self.assertEqual(
+            sorted(recipe.tags.values_list("name", flat=True)),
+            ["Indian", "Lunch", "Vegan"],
+        )
+
+    def test_sparse_fieldset(self):
+        """Test ?fields= returns only the requested fields."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Vegan"))
+
+        res = self.client.get(RECIPES_URL, {"fields": "id,title,tags"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data,
+            [
+                {
+                    "id": recipe.id,
+                    "title": recipe.title,
+                    "tags": [{"id": recipe.tags.get().id, "name": "Vegan"}],
+                }
+            ],
+        )
+
+    def test_sparse_fieldset_skips_prefetches(self):
+        """Test leaving out M2M fields drops their prefetch queries."""
+        for n in range(3):
+            recipe = create_recipe(user=self.user, title=f"Recipe {n}")
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f"Tag {n}"))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f"Ingredient {n}")
+            )
+
+        with CaptureQueriesContext(connection) as full:
+            self.client.get(RECIPES_URL)
+        with CaptureQueriesContext(connection) as sparse:
+            res = self.client.get(RECIPES_URL, {"fields": "id,title"})
+
+        self.assertEqual(len(full), 3)
+        self.assertEqual(len(sparse), 1)
+        self.assertEqual(len(res.data), 3)
+        # Unrequested columns are deferred.
+        self.assertNotIn('"core_recipe"."description"', sparse[0]["sql"])
+        self.assertNotIn('"core_recipe"."price"', sparse[0]["sql"])
+
+    def test_sparse_fieldset_detail(self):
+        """Test ?fields= applies to the detail view, including description."""
+        recipe = create_recipe(user=self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(detail_url(recipe.id), {"fields": "description"})
+
+        self.assertEqual(res.data, {"description": recipe.description})
+        self.assertEqual(len(queries), 1)
+
+    def test_sparse_fieldset_unknown_field(self):
+        """Test unknown field names are rejected."""
+        res = self.client.get(RECIPES_URL, {"fields": "id,secret"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("fields", res.data)
+
+    def test_sparse_fieldset_ignored_on_write(self):
+        """Test ?fields= does not restrict what a write accepts or returns."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.patch(
+            f"{detail_url(recipe.id)}?fields=id", {"title": "New"}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["title"], "New")
+        self.assertIn("tags", res.data)
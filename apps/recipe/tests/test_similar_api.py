@@ -0,0 +1,139 @@
+"""Tests for finding recipes similar to a recipe"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core.models import Ingredient, Recipe, Tag
+from apps.recipe import similarity
+
+
+def similar_url(recipe_id):
+    return reverse("recipe:recipe-similar", args=[recipe_id])
+
+
+def recipe_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+class SimilarityIndexTests(SimpleTestCase):
+    """Test ranking recipes by Jaccard similarity."""
+
+    def setUp(self):
+        # Recipe 1: features 10, 11, -1; 2: 10, 11; 3: 10, 12, 13; 4: 14.
+        self.index = similarity.SimilarityIndex(
+            0,
+            [(1, 10), (1, 11), (1, -1), (2, 10), (2, 11)]
+            + [(3, 10), (3, 12), (3, 13), (4, 14)],
+        )
+
+    def test_similar_ranks_by_jaccard(self):
+        """Test recipes are ranked by shared over combined features."""
+        results = self.index.similar(1, {10, 11, -1}, 10)
+
+        self.assertEqual([recipe_id for recipe_id, _ in results], [2, 3])
+        self.assertAlmostEqual(results[0][1], 2 / 3)
+        self.assertAlmostEqual(results[1][1], 1 / 5)
+
+    def test_limit_and_ties(self):
+        """Test the limit keeps the best, with the newest first among equals."""
+        self.index.set_recipe(5, [10, 11])
+
+        self.assertEqual(
+            [recipe_id for recipe_id, _ in self.index.similar(1, {10, 11, -1}, 1)],
+            [5],
+        )
+
+    def test_updates_and_unknown_features(self):
+        """Test changed and removed recipes are ranked on their new features."""
+        self.index.set_recipe(4, [10, 11, -1])
+        self.index.remove_recipe(2)
+
+        self.assertEqual(self.index.similar(1, {10, 11, -1}, 10)[0], (4, 1.0))
+        self.assertEqual(self.index.similar(9, {99}, 10), [])
+
+
+class SimilarApiTests(TestCase):
+    """Test the similar recipes endpoint."""
+
+    def setUp(self):
+        similarity.clear()
+        self.addCleanup(similarity.clear)
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rice, self.egg, self.lime = Ingredient.objects.get_or_create_many(
+            self.user, ["Rice", "Egg", "Lime"]
+        )
+        self.vegan = Tag.objects.create(user=self.user, name="Vegan")
+
+    def create_recipe(self, title, ingredients=(), tags=(), user=None):
+        recipe = Recipe.objects.create(
+            user=user or self.user, title=title, time_minute=10, price=Decimal("1")
+        )
+        recipe.ingredients.set(ingredients)
+        recipe.tags.set(tags)
+        return recipe
+
+    def similar(self, recipe, **params):
+        res = self.client.get(similar_url(recipe.id), params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_similar_recipes(self):
+        """Test recipes sharing tags and ingredients are ranked by similarity."""
+        recipe = self.create_recipe("Lime rice", [self.rice, self.lime], [self.vegan])
+        close = self.create_recipe("Rice", [self.rice], [self.vegan])
+        far = self.create_recipe("Egg rice", [self.rice, self.egg])
+        self.create_recipe("Boiled egg", [self.egg])
+
+        data = self.similar(recipe)
+
+        self.assertEqual([r["id"] for r in data], [close.id, far.id])
+        self.assertAlmostEqual(data[0]["similarity"], 2 / 3)
+        self.assertAlmostEqual(data[1]["similarity"], 1 / 4)
+        self.assertEqual(data[0]["title"], "Rice")
+        self.assertEqual(len(self.similar(recipe, limit=1)), 1)
+
+    def test_only_own_recipes(self):
+        """Test other users' recipes are never listed or compared."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        theirs = self.create_recipe("Theirs", [self.rice], user=other)
+        recipe = self.create_recipe("Rice", [self.rice])
+
+        self.assertEqual(self.similar(recipe), [])
+        res = self.client.get(similar_url(theirs.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_index_follows_writes(self):
+        """Test the cached index catches up with updates and deletes."""
+        recipe = self.create_recipe("Rice", [self.rice])
+        other = self.create_recipe("Egg", [self.egg])
+        self.assertEqual(self.similar(recipe), [])
+
+        res = self.client.patch(
+            recipe_url(other.id),
+            {"ingredients": [{"name": "Egg"}, {"name": "Rice"}]},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in self.similar(recipe)], [other.id])
+
+        self.client.delete(recipe_url(other.id))
+        self.assertEqual(self.similar(recipe), [])
+
+    def test_invalid_limit(self):
+        """Test out of range limits are rejected."""
+        recipe = self.create_recipe("Rice", [self.rice])
+
+        res = self.client.get(similar_url(recipe.id), {"limit": 0})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,284 @@
+"""Tests for the delta sync API"""
+
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.core import changes
+from apps.core.models import Change, ChangeSequence, Ingredient, Recipe, Tag
+
+
+SYNC_URL = reverse("recipe:sync")
+RECIPES_URL = reverse("recipe:recipe-list")
+
+
+def recipe_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def tag_url(tag_id):
+    return reverse("recipe:tag-detail", args=[tag_id])
+
+
+class SyncApiTests(TestCase):
+    """Test snapshots and deltas served from the change log."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, title="Curry", **extra):
+        payload = {
+            "title": title,
+            "time_minute": 20,
+            "price": Decimal("4.50"),
+            "tags": [{"name": "Dinner"}],
+            "ingredients": [{"name": "Rice"}],
+            **extra,
+        }
+        res = self.client.post(RECIPES_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return Recipe.objects.get(id=res.data["id"])
+
+    def sync(self, since=None):
+        params = {} if since is None else {"since": since}
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_snapshot_without_token(self):
+        """Test the first sync returns everything with a reset flag."""
+        recipe = self.create_recipe()
+
+        data = self.sync()
+
+        self.assertTrue(data["reset"])
+        self.assertEqual([r["id"] for r in data["recipes"]], [recipe.id])
+        self.assertEqual([t["name"] for t in data["tags"]], ["Dinner"])
+        self.assertEqual([i["name"] for i in data["ingredients"]], ["Rice"])
+        self.assertEqual(data["token"], "3")
+
+    def test_delta_returns_only_changes(self):
+        """Test a delta holds only objects changed since the token."""
+        self.create_recipe("Old")
+        token = self.sync()["token"]
+        recipe = self.create_recipe("New", tags=[{"name": "Lunch"}], ingredients=[])
+
+        data = self.sync(token)
+
+        self.assertFalse(data["reset"])
+        self.assertEqual([r["title"] for r in data["recipes"]], ["New"])
+        self.assertEqual([t["name"] for t in data["tags"]], ["Lunch"])
+        self.assertEqual(data["ingredients"], [])
+        self.assertEqual(self.sync(data["token"])["recipes"], [])
+        self.assertEqual(recipe.title, "New")
+
+    def test_m2m_update_logs_recipe(self):
+        """Test replacing a recipe's tags reports the recipe as changed."""
+        recipe = self.create_recipe()
+        token = self.sync()["token"]
+
+        self.client.patch(
+            recipe_url(recipe.id), {"tags": [{"name": "Vegan"}]}, format="json"
+        )
+        data = self.sync(token)
+
+        self.assertEqual(len(data["recipes"]), 1)
+        self.assertEqual([t["name"] for t in data["recipes"][0]["tags"]], ["Vegan"])
+
+    def test_delete_recipe_leaves_tombstone(self):
+        """Test deleted recipes are reported by id."""
+        recipe = self.create_recipe()
+        token = self.sync()["token"]
+
+        self.client.delete(recipe_url(recipe.id))
+        data = self.sync(token)
+
+        self.assertEqual(data["recipes"], [])
+        self.assertEqual(data["deleted"]["recipes"], [recipe.id])
+
+    def test_created_then_deleted_is_only_a_tombstone(self):
+        """Test only the latest change to an object is reported."""
+        token = self.sync()["token"]
+        recipe = self.create_recipe()
+        self.client.delete(recipe_url(recipe.id))
+
+        data = self.sync(token)
+
+        self.assertEqual(data["recipes"], [])
+        self.assertEqual(data["deleted"]["recipes"], [recipe.id])
+
+    def test_tag_rename_and_delete_update_recipes(self):
+        """Test recipes embedding a renamed or deleted tag are resent."""
+        recipe = self.create_recipe()
+        tag = Tag.objects.get(name="Dinner")
+        token = self.sync()["token"]
+
+        self.client.patch(tag_url(tag.id), {"name": "Supper"})
+        data = self.sync(token)
+        self.assertEqual([t["name"] for t in data["tags"]], ["Supper"])
+        self.assertEqual(data["recipes"][0]["tags"][0]["name"], "Supper")
+
+        self.client.delete(tag_url(tag.id))
+        data = self.sync(data["token"])
+        self.assertEqual(data["deleted"]["tags"], [tag.id])
+        self.assertEqual(data["recipes"][0]["id"], recipe.id)
+        self.assertEqual(data["recipes"][0]["tags"], [])
+
+    def test_changes_are_per_user(self):
+        """Test a user's sync never includes another user's changes."""
+        token = self.sync()["token"]
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        self.client.force_authenticate(other)
+        self.create_recipe()
+        self.client.force_authenticate(self.user)
+
+        data = self.sync(token)
+
+        self.assertEqual(data["recipes"], [])
+        self.assertEqual(data["token"], token)
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_paging(self):
+        """Test large deltas are split into pages with has_more."""
+        token = self.sync()["token"]
+        self.create_recipe("A", tags=[], ingredients=[])
+        self.create_recipe("B", tags=[], ingredients=[])
+        self.create_recipe("C", tags=[], ingredients=[])
+
+        first = self.sync(token)
+        second = self.sync(first["token"])
+
+        self.assertTrue(first["has_more"])
+        self.assertEqual([r["title"] for r in first["recipes"]], ["A", "B"])
+        self.assertFalse(second["has_more"])
+        self.assertEqual([r["title"] for r in second["recipes"]], ["C"])
+
+    def test_delta_cost_independent_of_catalog_size(self):
+        """Test a delta runs the same queries however many objects exist."""
+        for n in range(20):
+            self.create_recipe(f"Recipe {n}")
+        token = self.sync()["token"]
+        self.create_recipe("Latest")
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.sync(token)
+
+        self.assertEqual([r["title"] for r in data["recipes"]], ["Latest"])
+        self.assertLessEqual(len(queries), 7)
+
+    def test_invalid_token(self):
+        """Test a malformed token is rejected."""
+        res = self.client.get(SYNC_URL, {"since": "abc"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ChangeLogTests(TestCase):
+    """Test recording and compacting the change log."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="Test@1234"
+        )
+
+    def test_record_changes_in_one_statement(self):
+        """Test changes get consecutive sequence numbers in one query."""
+        changes.record_changes(self.user.id, updated=[(Change.Kind.TAG, 1)])
+        with CaptureQueriesContext(connection) as queries:
+            changes.record_changes(
+                self.user.id,
+                updated=[(Change.Kind.RECIPE, 7)],
+                deleted=[(Change.Kind.TAG, 1)],
+            )
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            list(Change.objects.order_by("seq").values_list("seq", "kind", "deleted")),
+            [(1, "tag", False), (2, "recipe", False), (3, "tag", True)],
+        )
+        self.assertEqual(ChangeSequence.objects.get(user=self.user).last_seq, 3)
+
+    def test_compaction(self):
+        """Test compaction drops superseded entries and expired tombstones."""
+        changes.record_changes(self.user.id, updated=[(Change.Kind.RECIPE, 1)])
+        changes.record_changes(self.user.id, updated=[(Change.Kind.RECIPE, 1)])
+        changes.record_changes(self.user.id, deleted=[(Change.Kind.RECIPE, 2)])
+        changes.record_changes(self.user.id, updated=[(Change.Kind.TAG, 3)])
+        Change.objects.filter(deleted=True).update(
+            changed_at=timezone.now() - timedelta(days=31)
+        )
+
+        out = StringIO()
+        call_command("compact_changes", "--tombstone-days", "30", stdout=out)
+
+        self.assertIn(
+            "Removed 1 superseded entries and 1 expired tombstones.", out.getvalue()
+        )
+
+        self.assertEqual(
+            list(Change.objects.order_by("seq").values_list("seq", "kind")),
+            [(2, "recipe"), (4, "tag")],
+        )
+        counter = ChangeSequence.objects.get(user=self.user)
+        self.assertEqual((counter.last_seq, counter.compacted_seq), (4, 3))
+
+    def test_compaction_in_batches(self):
+        """Test small batches compact every user's log completely."""
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="Test@1234"
+        )
+        for user in (self.user, other):
+            for _ in range(3):
+                changes.record_changes(
+                    user.id,
+                    updated=[(Change.Kind.RECIPE, 1), (Change.Kind.TAG, 2)],
+                )
+            changes.record_changes(user.id, deleted=[(Change.Kind.TAG, 3)])
+            changes.record_changes(user.id, deleted=[(Change.Kind.TAG, 4)])
+        Change.objects.filter(deleted=True).update(
+            changed_at=timezone.now() - timedelta(days=31)
+        )
+
+        self.assertEqual(changes.compact(30, batch_size=2), (8, 4))
+
+        for user in (self.user, other):
+            self.assertEqual(
+                list(
+                    Change.objects.filter(user=user)
+                    .order_by("seq")
+                    .values_list("seq", flat=True)
+                ),
+                [5, 6],
+            )
+            self.assertEqual(ChangeSequence.objects.get(user=user).compacted_seq, 8)
+
+    def test_token_before_compaction_gets_snapshot(self):
+        """Test clients behind the compacted part of the log are reset."""
+        Ingredient.objects.create(user=self.user, name="Salt")
+        changes.record_changes(self.user.id, deleted=[(Change.Kind.RECIPE, 1)])
+        changes.record_changes(self.user.id, updated=[(Change.Kind.TAG, 2)])
+        ChangeSequence.objects.filter(user=self.user).update(compacted_seq=1)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        data = client.get(SYNC_URL, {"since": "0"}).data
+        self.assertTrue(data["reset"])
+        data = client.get(SYNC_URL, {"since": "1"}).data
+        self.assertFalse(data["reset"])
+        self.assertEqual(data["token"], "2")
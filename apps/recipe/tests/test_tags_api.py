@@ -70,3 +70,11 @@ class PrivateTagsAPITest(TestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(models.Tag.objects.filter(user=self.user).exists())
+
+    def test_rename_to_existing_tag_fails(self):
+        models.Tag.objects.create(user=self.user, name="vegan")
+        tag = models.Tag.objects.create(user=self.user, name="dessert")
+        response = self.client.patch(detail_url(tag.id), {"name": "vegan"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, "dessert")
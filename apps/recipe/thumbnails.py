@@ -0,0 +1,73 @@
+"""
+Rendering of recipe image thumbnails.
+
+Decoding and resizing a photo is CPU-bound and holds the GIL, so `render`
+runs in a pool of processes (`settings.RECIPE_THUMBNAIL_PROCESSES` of them,
+started on first use) rather than on the job worker's threads. This module
+imports nothing from Django, so the pool's processes start quickly.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def render(source, targets, quality=80):
+    """
+    Write a WebP thumbnail of the image file ``source`` per ``(size, path)``.
+
+    Each thumbnail fits in ``size`` x ``size`` pixels, keeping the aspect
+    ratio; images are never enlarged. The image is decoded once, at the
+    smallest scale that still covers the largest size. Returns the sizes.
+    """
+    targets = sorted(targets, reverse=True)
+    with Image.open(source) as image:
+        largest = targets[0][0]
+        # JPEGs are decoded at 1/2, 1/4 or 1/8 scale when that is enough.
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        # Largest first, each one shrunk from the last.
+        for size, path in targets:
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            partial = f"{path}.part"
+            image.save(partial, "WEBP", quality=quality)
+            os.replace(partial, path)
+    return [size for size, _ in targets]
+
+
+def generate(source, targets, quality=80, processes=0):
+    """`render` in the process pool, or in this thread if ``processes`` is 0."""
+    if not processes:
+        return render(source, targets, quality)
+    return get_pool(processes).submit(render, source, targets, quality).result()
+
+
+def get_pool(processes):
+    """Return the pool of ``processes`` processes, starting it if needed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Not forked: the job worker's other threads may hold locks.
+            _pool = ProcessPoolExecutor(
+                processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown():
+    """Stop the pool's processes; a new pool is started on next use."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -13,5 +13,6 @@ app_name = "recipe"
 
 # Define the URL patterns to include the automatically generated URLs from the router.
 urlpatterns = [
+    path("sync/", views.SyncView.as_view(), name="sync"),
     path("", include(router.urls)),  # Include all the URLs generated by the router
 ]
@@ -1,27 +1,135 @@
-from rest_framework import viewsets, mixins
+import hashlib
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import generics, viewsets, mixins, status
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-from apps.core.models import Recipe, Tag, Ingredient
+from apps.core import purge
+from apps.core.changes import record_changes
+from apps.core.fieldsets import SparseFieldsetMixin
+from apps.core.idempotency import IdempotentMixin
+from apps.core.models import Change, ChangeSequence, Purge, Recipe, Tag, Ingredient
+from apps.core.routers import ReplicaReadMixin
+from apps.recipe import autocomplete, indexes, pantry, similarity
+from apps.recipe.images import ImageUploadHandler
 from apps.recipe.serializers import (
+    AutocompleteQuerySerializer,
+    AutocompleteSerializer,
+    BulkDeleteSerializer,
+    CookableQuerySerializer,
+    CookableRecipeSerializer,
+    RecipeImageSerializer,
     RecipeSerializer,
     RecipeDetailSerializer,
+    SimilarQuerySerializer,
+    SimilarRecipeSerializer,
+    SyncSerializer,
     TagSerializer,
     IngredientSerializer,
 )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class BulkDeleteMixin:
+    """
+    Queue the deletion of many objects with `POST <list URL>/bulk-delete/`.
+
+    The objects are deleted by the job worker in batches, so the response
+    is 202 Accepted with the job's id, whose progress is at
+    `/api/jobs/<id>/`; sync clients see the tombstones as batches complete.
+    """
+
+    change_kind = None
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="bulk-delete",
+        serializer_class=BulkDeleteSerializer,
+    )
+    def bulk_delete(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+        job = purge.delete_objects(
+            request.user.id, Purge.Kind(self.change_kind), ids
+        )
+        return Response({"ids": ids, "job": job.id}, status=status.HTTP_202_ACCEPTED)
+
+
+class AutocompleteMixin:
+    """
+    Complete name prefixes with `GET <list URL>/autocomplete/?q=<prefix>`.
+
+    Names are matched case-insensitively and listed in alphabetical order,
+    from the user's in-memory `autocomplete_index` or, while it is not
+    built, from the database. Responses echo `q`, carry an ETag (repeated
+    requests get a 304) and may be cached privately for
+    `AUTOCOMPLETE_MAX_AGE` seconds, so clients can debounce keystrokes.
+    """
+
+    autocomplete_index = None
+
+    @action(detail=False, serializer_class=AutocompleteSerializer)
+    def autocomplete(self, request):
+        query = AutocompleteQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        prefix, limit = query.validated_data["q"], query.validated_data["limit"]
+        cache = self.autocomplete_index
+        with cache.get(request.user.id, build=False) as index:
+            if index is not None:
+                seq = index.seq
+                found = index.complete(prefix, limit)
+        if index is None:
+            seq, _ = indexes.counter(request.user.id)
+            found = autocomplete.complete_query(
+                cache.index_class.model, request.user.id, prefix, limit
+            )
+
+        digest = hashlib.sha256(f"{limit}:{prefix}".encode()).hexdigest()[:16]
+        etag = f'"{request.user.id}-{seq}-{digest}"'
+        if etag in request.headers.get("If-None-Match", "").replace("W/", ""):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            # Plain data already: `serializer_class` only documents it.
+            results = [{"id": pk, "name": name} for pk, name in found]
+            response = Response({"q": prefix, "results": results})
+        if index is None:
+            cache.warm_later(request.user.id)
+        response["ETag"] = etag
+        response["Cache-Control"] = f"private, max-age={settings.AUTOCOMPLETE_MAX_AGE}"
+        return response
+
+
+class RecipeViewSet(
+    IdempotentMixin,
+    BulkDeleteMixin,
+    SparseFieldsetMixin,
+    ReplicaReadMixin,
+    viewsets.ModelViewSet,
+):
     """
     View for managing recipe APIs.
 
     This viewset provides the standard CRUD actions for the Recipe model.
     It uses token-based authentication and requires the user to be authenticated.
     The queryset is filtered to only include recipes created by the authenticated user.
+    List and retrieve accept `?fields=id,title,...` to return only some fields.
+    Creates and updates accept an `Idempotency-Key` header so that retries
+    replay the first response instead of writing again. Many recipes are
+    deleted at once, in the background, with `bulk-delete/`. Images are
+    uploaded with `<id>/upload-image/`. `cookable/?have=<ids>` finds the
+    recipes that can be made from the ingredients at hand, and
+    `<id>/similar/` the recipes most like one.
     """
 
     serializer_class = RecipeDetailSerializer
     queryset = Recipe.objects.all()
+    change_kind = Change.Kind.RECIPE
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
@@ -29,10 +137,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """
         Override to filter recipes by the authenticated user and order by ID.
 
+        Tags and ingredients are prefetched so serializing a page of recipes
+        costs a fixed number of queries instead of two per recipe. With
+        `?fields=`, relations that are not requested are not prefetched and
+        unrequested columns are deferred.
+
         Returns:
             Queryset of Recipe objects filtered by the authenticated user.
         """
-        return self.queryset.filter(user=self.request.user).order_by("-id")
+        queryset = self.queryset.filter(user=self.request.user).order_by("-id")
+        return self.select_fields(queryset, prefetch=["tags", "ingredients"])
 
     def get_serializer_class(self):
         """
@@ -58,8 +172,141 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """
         serializer.save(user=self.request.user)
 
+    @action(detail=False, serializer_class=CookableRecipeSerializer)
+    def cookable(self, request):
+        """
+        List the recipes that can be made from the ingredients at hand.
+
+        `?have=<ids>` lists the ingredient ids at hand. Returns the recipes
+        with at least `min_coverage` (default 0.5) of their ingredients at
+        hand, best covered first, with their coverage and the ids of the
+        missing ingredients. Matching uses the in-memory index of
+        `apps.recipe.pantry`.
+        """
+        query = CookableQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        have = query.validated_data["have"]
+        matches = pantry.match(
+            request.user.id,
+            have,
+            query.validated_data["min_coverage"],
+            query.validated_data["limit"],
+        )
+        recipes = self.get_queryset().in_bulk([recipe_id for recipe_id, _, _ in matches])
+        results = []
+        for recipe_id, matched, total in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                # Deleted since the index caught up.
+                continue
+            recipe.coverage = matched / total
+            recipe.missing_ingredients = sorted(
+                ingredient.id
+                for ingredient in recipe.ingredients.all()
+                if ingredient.id not in have
+            )
+            results.append(recipe)
+        return Response(self.get_serializer(results, many=True).data)
+
+    @action(detail=True, serializer_class=SimilarRecipeSerializer)
+    def similar(self, request, pk=None):
+        """
+        List the recipes most like this one, by shared tags and ingredients.
+
+        Recipes are ranked by the Jaccard index of their tags and
+        ingredients with this recipe's, computed over the in-memory index
+        of `apps.recipe.similarity`; `?limit=` caps the results (default 10).
+        """
+        query = SimilarQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        matches = similarity.similar_to(
+            self.get_object(), query.validated_data["limit"]
+        )
+        recipes = self.get_queryset().in_bulk([recipe_id for recipe_id, _ in matches])
+        results = []
+        for recipe_id, score in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                # Deleted since the index caught up.
+                continue
+            recipe.similarity = score
+            results.append(recipe)
+        return Response(self.get_serializer(results, many=True).data)
+
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="upload-image",
+        serializer_class=RecipeImageSerializer,
+    )
+    def upload_image(self, request, pk=None):
+        """
+        Upload an image to the recipe, as the multipart field ``image``.
+
+        The upload is streamed to disk rather than read into memory, and
+        thumbnails are rendered in the background: ``thumbnails`` stays
+        empty until they are ready.
+        """
+        recipe = self.get_object()
+        handler = ImageUploadHandler(request)
+        request.upload_handlers = [handler]
+        serializer = self.get_serializer(recipe, data=request.data)
+        if handler.too_large:
+            limit = settings.RECIPE_IMAGE_MAX_BYTES / 2**20
+            raise ValidationError(
+                {"image": [f"Ensure the image is at most {limit:g} MiB."]}
+            )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        """Delete the recipe and leave a tombstone for sync."""
+        recipe_id = instance.id
+        instance.delete()
+        record_changes(instance.user_id, deleted=[(Change.Kind.RECIPE, recipe_id)])
+
+
+class NamedItemChangesMixin:
+    """
+    Log tag and ingredient updates and deletes for sync.
+
+    Recipes embed the names of their tags and ingredients, so the recipes
+    using a renamed or deleted item are logged as changed too.
+    """
+
+    change_kind = None
+
+    def affected_recipe_ids(self, item):
+        return list(item.recipe_set.values_list("id", flat=True))
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        item = serializer.save()
+        record_changes(
+            item.user_id,
+            updated=[(self.change_kind, item.id)]
+            + [(Change.Kind.RECIPE, pk) for pk in self.affected_recipe_ids(item)],
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        item_id = instance.id
+        recipe_ids = self.affected_recipe_ids(instance)
+        instance.delete()
+        record_changes(
+            instance.user_id,
+            updated=[(Change.Kind.RECIPE, pk) for pk in recipe_ids],
+            deleted=[(self.change_kind, item_id)],
+        )
+
 
 class TagViewSet(
+    NamedItemChangesMixin,
+    AutocompleteMixin,
+    BulkDeleteMixin,
+    ReplicaReadMixin,
     mixins.ListModelMixin,
     mixins.UpdateModelMixin,
     mixins.DestroyModelMixin,
@@ -71,10 +318,13 @@ class TagViewSet(
     This viewset provides a list view for the Tag model, allowing users to retrieve
     the tags they have created. It uses token-based authentication and requires the user
     to be authenticated. The queryset is filtered to only include tags created by the authenticated user.
+    `autocomplete/?q=<prefix>` completes tag names.
     """
 
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
+    change_kind = Change.Kind.TAG
+    autocomplete_index = autocomplete.tags
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
@@ -89,15 +339,125 @@ class TagViewSet(
 
 
 class IngredientViewSet(
+    NamedItemChangesMixin,
+    AutocompleteMixin,
+    BulkDeleteMixin,
+    ReplicaReadMixin,
     mixins.ListModelMixin,
     mixins.UpdateModelMixin,
     mixins.DestroyModelMixin,
     viewsets.GenericViewSet,
 ):
+    """
+    View for managing ingredient APIs.
+
+    Lists, updates and deletes the authenticated user's ingredients;
+    `autocomplete/?q=<prefix>` completes their names.
+    """
+
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
+    change_kind = Change.Kind.INGREDIENT
+    autocomplete_index = autocomplete.ingredients
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return self.queryset.filter(user=self.request.user).order_by("-name")
+
+
+class SyncView(generics.GenericAPIView):
+    """
+    Delta sync for offline clients.
+
+    Without `since`, returns every recipe, tag and ingredient of the user
+    with ``reset: true``. With `since=<token>` (the `token` of the previous
+    response), returns only the objects created or updated since then, and
+    the ids of those deleted, read from the user's change log, so the cost
+    depends on the number of changes, not on the size of the catalog;
+    `since=0` reads the log from its start. At most `SYNC_PAGE_SIZE`
+    changes are returned at once, and `has_more` tells the client to sync
+    again. A token older than the compacted part of the log gets a full
+    snapshot again.
+    """
+
+    serializer_class = SyncSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    kinds = {
+        Change.Kind.RECIPE: ("recipes", Recipe),
+        Change.Kind.TAG: ("tags", Tag),
+        Change.Kind.INGREDIENT: ("ingredients", Ingredient),
+    }
+
+    def get(self, request):
+        since = self.parse_token(request.query_params.get("since"))
+        last_seq, compacted_seq = (
+            ChangeSequence.objects.filter(user=request.user)
+            .values_list("last_seq", "compacted_seq")
+            .first()
+        ) or (0, 0)
+
+        if since is None or since < compacted_seq or since > last_seq:
+            # Read after the counter, so nothing up to `last_seq` is missed;
+            # a concurrent change may be sent again on the next sync.
+            payload = self.snapshot(request.user)
+            payload.update(token=str(last_seq), reset=True, has_more=False)
+        else:
+            payload = self.delta(request.user, since)
+        return Response(self.get_serializer(payload).data)
+
+    def parse_token(self, value):
+        if value is None:
+            return None
+        try:
+            since = int(value)
+        except ValueError:
+            since = -1
+        if since < 0:
+            raise ValidationError({"since": ["Invalid sync token."]})
+        return since
+
+    def snapshot(self, user):
+        payload = {
+            key: self.get_objects(model, model.objects.filter(user=user))
+            for key, model in self.kinds.values()
+        }
+        payload["deleted"] = {key: [] for key, _ in self.kinds.values()}
+        return payload
+
+    def delta(self, user, since):
+        limit = settings.SYNC_PAGE_SIZE
+        entries = list(
+            Change.objects.filter(user=user, seq__gt=since)
+            .order_by("seq")
+            .values_list("seq", "kind", "object_id", "deleted")[: limit + 1]
+        )
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        # Only the latest entry for each object counts.
+        latest = {(kind, object_id): deleted for _, kind, object_id, deleted in entries}
+        payload = {"deleted": {}}
+        for kind, (key, model) in self.kinds.items():
+            changed = [pk for (k, pk), deleted in latest.items() if k == kind and not deleted]
+            payload[key] = (
+                self.get_objects(model, model.objects.filter(user=user, id__in=changed))
+                if changed
+                else []
+            )
+            payload["deleted"][key] = sorted(
+                pk for (k, pk), deleted in latest.items() if k == kind and deleted
+            )
+        payload.update(
+            token=str(entries[-1][0] if entries else since),
+            reset=False,
+            has_more=has_more,
+        )
+        return payload
+
+    def get_objects(self, model, queryset):
+        if model is Recipe:
+            queryset = queryset.prefetch_related("tags", "ingredients")
+        return queryset.order_by("id")
@@ -1,6 +1,9 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, authentication, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from apps.core import purge
+from apps.core.routers import ReplicaReadMixin
 from .serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -41,12 +44,13 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ReplicaReadMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     View for retrieving details of the authenticated user.
 
     This view ensures that only authenticated users can access their profile
-    information using token-based authentication.
+    information using token-based authentication. Deleting deactivates the
+    account at once; its data is purged in the background.
     """
 
     serializer_class = UserSerializer  # Serializer to handle user data conversion
@@ -64,3 +68,13 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
         (the user who made the request).
         """
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Deactivate the account, revoke its token and queue its purge.
+
+        Returns 202 Accepted: the account's data is deleted in batches by
+        the job worker.
+        """
+        purge.delete_account(request.user)
+        return Response(status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,71 @@
+"""
+Reproducible benchmarks for the BiteSail backend.
+
+Each module in this package is a standalone script, run from the project
+root with ``python -m benchmarks.<name>``. Benchmarks run against a
+throwaway test database (created and destroyed the same way
+``manage.py test`` does), so they never touch development data.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+
+def setup():
+    """Configure Django so benchmark scripts can use the ORM."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database(verbosity=0):
+    """
+    Create a throwaway test database for the duration of the block.
+
+    Uses the same machinery as the Django test runner, so the database is
+    migrated from scratch and dropped again on exit.
+    """
+    from django.test.utils import (
+        setup_databases,
+        setup_test_environment,
+        teardown_databases,
+        teardown_test_environment,
+    )
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=verbosity, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=verbosity)
+        teardown_test_environment()
+
+
+@contextmanager
+def timer():
+    """Measure wall-clock time; the yielded dict gets an ``elapsed`` key."""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["elapsed"] = time.perf_counter() - start
+
+
+def percentile(values, pct):
+    """Return the ``pct`` percentile (0-100) of ``values`` by nearest rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def report(label, count, elapsed, unit="ops"):
+    """Print a single throughput line."""
+    rate = count / elapsed if elapsed else float("inf")
+    print(f"{label:<40} {count:>9} {unit} in {elapsed:8.3f}s  ({rate:,.1f} {unit}/s)")
@@ -0,0 +1,131 @@
+"""
+Benchmark tag and ingredient name autocomplete.
+
+For each of ``--names``, generates that many made-up names, builds an
+`apps.recipe.autocomplete.NameIndex` of them and times completing random
+prefixes as typed (the first 1-4 characters of a name), 10 results each.
+
+With ``--endpoint-names``, also stores that many ingredients for one user
+and times `GET /api/recipe/ingredient/autocomplete/?q=` end to end:
+cold, with the cache cleared before each request so the indexed prefix
+query answers; warm, from the in-memory index; and, for comparison,
+listing every ingredient as the editor did before.
+
+Usage:
+    python -m benchmarks.autocomplete [--names 1000 10000 100000] [--endpoint-names 20000]
+"""
+
+import argparse
+import random
+import time
+from unittest.mock import patch
+
+from benchmarks import percentile, setup, test_database, timer
+from benchmarks.duplicates import SYLLABLES
+
+
+def generate(names, rng):
+    """Return ``names`` distinct made-up names of one or two words."""
+    found = set()
+    while len(found) < names:
+        words = [
+            "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+            for _ in range(rng.randint(1, 2))
+        ]
+        found.add(" ".join(words).capitalize())
+    return sorted(found)
+
+
+def prefixes(names, queries, rng):
+    """Return ``queries`` prefixes of random ``names``, in random case."""
+    typed = []
+    for name in rng.choices(names, k=queries):
+        prefix = name[: rng.randint(1, 4)]
+        typed.append(prefix.lower() if rng.random() < 0.5 else prefix)
+    return typed
+
+
+def report_ms(label, seconds):
+    ms = [value * 1000 for value in seconds]
+    print(
+        f"  {label:<10} p50 {percentile(ms, 50):9.3f} ms"
+        f"  p99 {percentile(ms, 99):9.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--names", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--endpoint-names", type=int, default=20000)
+    parser.add_argument("--endpoint-queries", type=int, default=300)
+    args = parser.parse_args()
+
+    setup()
+    from apps.recipe.autocomplete import NameIndex
+
+    rng = random.Random(42)
+    for count in args.names:
+        names = generate(count, rng)
+        with timer() as t:
+            index = NameIndex(0, enumerate(names, 1))
+        print(f"== {count} names: index built in {t['elapsed'] * 1000:.0f} ms ==")
+        timings = []
+        for prefix in prefixes(names, args.queries, rng):
+            start = time.perf_counter()
+            index.complete(prefix, 10)
+            timings.append(time.perf_counter() - start)
+        report_ms("complete", timings)
+        print()
+
+    if args.endpoint_names:
+        endpoint(args.endpoint_names, args.endpoint_queries, rng)
+
+
+def endpoint(count, queries, rng):
+    with test_database():
+        from django.contrib.auth import get_user_model
+        from django.urls import resolve, reverse
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        from apps.core.models import Ingredient
+        from apps.recipe import autocomplete
+
+        user = get_user_model().objects.create_user(
+            email="bench@example.com", password="Bench@1234"
+        )
+        names = generate(count, rng)
+        Ingredient.objects.bulk_create(
+            [Ingredient(user=user, name=name) for name in names], batch_size=5000
+        )
+        factory = APIRequestFactory()
+
+        def get(url, params=None):
+            request = factory.get(url, params)
+            force_authenticate(request, user)
+            start = time.perf_counter()
+            res = resolve(url).func(request).render()
+            elapsed = time.perf_counter() - start
+            assert res.status_code == 200, res.status_code
+            return elapsed
+
+        url = reverse("recipe:ingredient-autocomplete")
+        typed = prefixes(names, queries, rng)
+        print(f"== endpoint, {count} stored ingredients ==")
+        timings = []
+        # Keep cold requests cold: don't build the index in the background.
+        with patch.object(autocomplete.ingredients, "warm_later"):
+            for prefix in typed:
+                autocomplete.clear()
+                timings.append(get(url, {"q": prefix}))
+        report_ms("cold", timings)
+
+        with timer() as t:
+            autocomplete.ingredients.warm(user.id)
+        print(f"  index built in {t['elapsed'] * 1000:.0f} ms")
+        report_ms("warm", [get(url, {"q": prefix}) for prefix in typed])
+        report_ms("list all", [get(reverse("recipe:ingredient-list")) for _ in range(5)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark user provisioning: `create_user` loop vs `bulk_create_users`.
+
+Usage:
+    python -m benchmarks.bulk_create_users [--count 2000] [--workers 1 4 8]
+"""
+
+import argparse
+import os
+from io import StringIO
+
+from benchmarks import report, setup, test_database, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1})
+    )
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    User = get_user_model()
+
+    with test_database():
+        with timer() as t:
+            for n in range(args.count):
+                User.objects.create_user(
+                    email=f"baseline{n}@example.com", password="Pass!2024"
+                )
+        report("create_user loop", args.count, t["elapsed"], "users")
+        User.objects.all().delete()
+
+        for workers in args.workers:
+            with timer() as t:
+                call_command(
+                    "bulk_create_users",
+                    count=args.count,
+                    batch_size=args.batch_size,
+                    workers=workers,
+                    tokens=True,
+                    stdout=StringIO(),
+                )
+            report(f"bulk_create_users workers={workers}", args.count, t["elapsed"], "users")
+            User.objects.all().delete()
+
+
+if __name__ == "__main__":
+    main()
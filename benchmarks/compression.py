@@ -0,0 +1,110 @@
+"""
+Benchmark gzip and Brotli levels on generated recipe list responses.
+
+Renders recipe lists shaped like the `/api/recipe/recipes/` response (the
+same fields `RecipeSerializer` returns) at several sizes and reports, per
+coding and level, the compressed size and the CPU time spent per
+response. Used to pick `COMPRESSION_GZIP_LEVEL` and
+`COMPRESSION_BROTLI_QUALITY`: past the knee of the curve, extra CPU buys
+little size.
+
+Usage:
+    python -m benchmarks.compression [--recipes 10 100 1000] [--repeat 20]
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks import setup
+
+
+TAGS = [
+    "Vegan", "Vegetarian", "Dessert", "Breakfast", "Dinner", "Quick",
+    "Gluten free", "Spicy", "Comfort food", "Meal prep", "Italian", "Thai",
+]
+INGREDIENTS = [
+    "Salt", "Pepper", "Olive oil", "Garlic", "Onion", "Tomato", "Butter",
+    "Flour", "Sugar", "Eggs", "Milk", "Basil", "Chicken", "Rice", "Lemon",
+    "Ginger", "Soy sauce", "Coconut milk", "Chickpeas", "Spinach",
+]
+WORDS = [
+    "roasted", "creamy", "crispy", "lemon", "garlic", "herb", "baked",
+    "spiced", "summer", "classic", "easy", "one-pot", "grilled", "fresh",
+]
+
+LEVELS = {"gzip": [1, 3, 5, 6, 9], "br": [1, 3, 4, 5, 6, 9, 11]}
+
+
+def generate_recipes(count, seed=42):
+    """Return ``count`` recipe dicts as `RecipeSerializer` renders them."""
+    rng = random.Random(seed)
+    tag_ids = {name: n for n, name in enumerate(TAGS, start=1)}
+    ingredient_ids = {name: n for n, name in enumerate(INGREDIENTS, start=1)}
+    recipes = []
+    for n in range(1, count + 1):
+        title = " ".join(rng.sample(WORDS, 3)).capitalize()
+        recipes.append(
+            {
+                "id": n,
+                "title": f"{title} {n}",
+                "time_minute": rng.randint(5, 120),
+                "price": f"{rng.uniform(1, 40):.2f}",
+                "link": f"https://example.com/recipes/{title.lower().replace(' ', '-')}-{n}",
+                "tags": [
+                    {"id": tag_ids[name], "name": name}
+                    for name in rng.sample(TAGS, rng.randint(1, 4))
+                ],
+                "ingredients": [
+                    {"id": ingredient_ids[name], "name": name}
+                    for name in rng.sample(INGREDIENTS, rng.randint(3, 10))
+                ],
+            }
+        )
+    return recipes
+
+
+def measure(data, encoding, level, repeat):
+    """Return ``(compressed size, best CPU seconds)`` for one level."""
+    from apps.core.http import compress
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        body = compress(data, encoding, level)
+        best = min(best, time.process_time() - start)
+    return len(body), best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.renderers import JSONRenderer
+
+    from apps.core.http import available_encodings
+
+    encodings = [coding for coding in ("gzip", "br") if coding in available_encodings()]
+    if "br" not in encodings:
+        print("brotli is not installed; only gzip is measured.\n")
+
+    for count in args.recipes:
+        data = JSONRenderer().render(generate_recipes(count))
+        print(f"== {count} recipes: {len(data):,} bytes ==")
+        print(f"  {'coding':<10}{'bytes':>10}{'ratio':>8}{'CPU ms':>9}{'MB/s':>9}")
+        for encoding in encodings:
+            for level in LEVELS[encoding]:
+                size, cpu = measure(data, encoding, level, args.repeat)
+                throughput = len(data) / cpu / 1e6 if cpu else float("inf")
+                print(
+                    f"  {encoding + ' ' + str(level):<10}{size:>10,}"
+                    f"{len(data) / size:>8.1f}{cpu * 1000:>9.3f}{throughput:>9.0f}"
+                )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark near-duplicate detection with MinHash and LSH banding.
+
+For each of ``--recipes``, generates a catalog in memory: titles of 2-4
+made-up words and 5-12 ingredients drawn from small vocabularies, with
+``--duplicates`` of the recipes being variants of another one (changed
+case and punctuation, a typo, or one ingredient more or less). Reports:
+
+* signatures: shingling and MinHash throughput, in recipes per second;
+* clustering: the time `duplicates.cluster` takes for the whole catalog
+  with banding, and its recall of the generated duplicates and precision;
+* lookup: p50/p99 of finding a new recipe's candidates in a
+  `DuplicateIndex` of the catalog, as the on-create check does.
+
+Usage:
+    python -m benchmarks.duplicates [--recipes 100000 1000000] [--duplicates 0.05]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmarks import percentile, report, setup, timer
+
+
+SYLLABLES = "ba ko ri su me la to ni pa de go ru fi ma so ke li ta ne po".split()
+
+
+def vocabulary(size, rng):
+    """Return ``size`` made-up words of 2-4 syllables."""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def generate(recipes, duplicate_share, rng):
+    """Return the catalog items (title, ingredients) and the duplicate pairs."""
+    words = vocabulary(2000, rng)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    ingredients = [f"ingredient {n}" for n in range(3000)]
+    items, pairs = [], []
+    for n in range(recipes):
+        if n and rng.random() < duplicate_share:
+            original = rng.randrange(n)
+            title, names = items[original]
+            change = rng.randrange(3)
+            if change == 0:
+                title = title.upper() + "!"
+            elif change == 1:
+                position = rng.randrange(len(title))
+                title = title[:position] + title[position + 1:]
+            else:
+                names = names[:-1] if len(names) > 5 else names + [rng.choice(ingredients)]
+            items.append((title, names))
+            pairs.append((original, n))
+        else:
+            items.append(
+                (
+                    " ".join(rng.choices(words, weights, k=rng.randint(2, 4))),
+                    rng.sample(ingredients, rng.randint(5, 12)),
+                )
+            )
+    return items, pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--duplicates", type=float, default=0.05)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+    from apps.recipe import duplicates
+
+    rng = random.Random(42)
+    for recipes in args.recipes:
+        items, expected = generate(recipes, args.duplicates, rng)
+        print(f"== {recipes} recipes, {len(expected)} generated duplicates ==")
+
+        with timer() as t:
+            sigs = duplicates.signatures([duplicates.shingles(*item) for item in items])
+        report("signatures", recipes, t["elapsed"], "recipes")
+
+        with timer() as t:
+            clusters = duplicates.cluster(list(range(recipes)), sigs, args.threshold)
+        report("clustering", recipes, t["elapsed"], "recipes")
+        cluster_of = {pk: n for n, members in enumerate(clusters) for pk in members}
+        # Some variants (e.g. a typo in a short title) fall below the threshold.
+        expected = [
+            (a, b)
+            for a, b in expected
+            if duplicates.jaccard(
+                duplicates.shingles(*items[a]), duplicates.shingles(*items[b])
+            )
+            >= args.threshold
+        ]
+        found = sum(
+            a in cluster_of and cluster_of[a] == cluster_of.get(b) for a, b in expected
+        )
+        # Pairs in a cluster that really are near-duplicates of each other.
+        linked = [(members[0], pk) for members in clusters for pk in members[1:]]
+        true = sum(
+            duplicates.jaccard(
+                duplicates.shingles(*items[a]), duplicates.shingles(*items[b])
+            )
+            >= args.threshold - 0.1
+            for a, b in linked
+        )
+        print(
+            f"  {len(clusters)} clusters; recall {found / max(len(expected), 1):.3f} "
+            f"of the {len(expected)} generated duplicates at {args.threshold}; "
+            f"{true / max(len(linked), 1):.3f} of clustered pairs within 0.1 of it"
+        )
+
+        keys = duplicates.band_keys(sigs)
+        with timer() as t:
+            index = duplicates.DuplicateIndex(
+                0,
+                np.column_stack(
+                    (np.repeat(np.arange(recipes), duplicates.BANDS), keys.ravel())
+                ),
+            )
+        print(f"  index built in {t['elapsed']:.1f} s")
+        timings = []
+        for pk in rng.choices(range(recipes), k=args.lookups):
+            start = time.perf_counter()
+            index.candidates(keys[pk].tolist(), duplicates.MAX_CANDIDATES)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(
+            f"  lookup p50 {percentile(timings, 50):.3f} ms"
+            f"  p99 {percentile(timings, 99):.3f} ms"
+        )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark idle change streams and notification fan-out in one process.
+
+Opens ``--streams`` change streams (`apps.core.events.event_stream`)
+spread over ``--users`` users on a single event loop, the way a uvicorn
+worker holds them, and reports the memory each idle stream costs. Then
+delivers ``--events`` notifications to random users and reports how long
+it takes until every stream of that user has produced its `change` event.
+
+Uses the in-memory broker, so no database is needed; with Postgres
+LISTEN/NOTIFY, each worker adds one notification round trip on top.
+
+Usage:
+    python -m benchmarks.event_stream [--streams 1000 5000] [--users 500] [--events 200]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+import tracemalloc
+
+from benchmarks import percentile, setup
+
+
+async def run(streams, users, events_count):
+    from apps.core import events
+
+    events.reset_broker()
+    broker = events.get_broker()
+    received = {}
+
+    async def consume(user_id):
+        stream = events.event_stream(user_id, 0, 0)
+        await anext(stream)  # Subscribed.
+        async for chunk in stream:
+            if b"event: change" in chunk:
+                received.setdefault(user_id, []).append(time.perf_counter())
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tasks = [asyncio.create_task(consume(n % users + 1)) for n in range(streams)]
+    while len(broker.hub) < streams:
+        await asyncio.sleep(0.01)
+    used = sum(
+        stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename")
+    )
+    tracemalloc.stop()
+
+    per_user = {}
+    for n in range(streams):
+        per_user[n % users + 1] = per_user.get(n % users + 1, 0) + 1
+
+    rng = random.Random(42)
+    seqs = {}
+    latencies = []
+    for _ in range(events_count):
+        user_id = rng.randint(1, users)
+        seq = seqs[user_id] = seqs.get(user_id, 0) + 1
+        received.pop(user_id, None)
+        start = time.perf_counter()
+        broker.hub.deliver(
+            events.make_event(user_id, [(seq, "recipe", seq, "updated")])
+        )
+        while len(received.get(user_id, ())) < per_user[user_id]:
+            await asyncio.sleep(0)
+        latencies.append(max(received[user_id]) - start)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return used, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--events", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ["EVENTS_BROKER"] = "apps.core.events.InMemoryBroker"
+    setup()
+
+    print(f"{'streams':>8}{'KiB/stream':>12}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for streams in args.streams:
+        used, latencies = asyncio.run(run(streams, args.users, args.events))
+        ms = [latency * 1000 for latency in latencies]
+        print(
+            f"{streams:>8}{used / streams / 1024:>12.1f}{percentile(ms, 50):>9.3f}"
+            f"{percentile(ms, 99):>9.3f}{max(ms):>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
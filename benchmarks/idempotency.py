@@ -0,0 +1,118 @@
+"""
+Benchmark a retry storm against recipe creation.
+
+Simulates clients on a flaky network: each of ``--requests`` logical
+creates is sent ``--retries`` times at once from a thread pool, either with
+a shared `Idempotency-Key` or without one. A retry answered with 409 (the
+first attempt is still running) is sent again after ``--retry-after``
+seconds, as a client honouring `Retry-After` would. Reports the recipes
+actually created, and the count and latency of first writes, replays and
+409s.
+
+Usage:
+    python -m benchmarks.idempotency [--requests 200] [--retries 5] [--threads 16]
+"""
+
+import argparse
+import logging
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import percentile, report, setup, test_database, timer
+
+
+PAYLOAD = {
+    "title": "Retry storm curry",
+    "time_minute": 20,
+    "price": "4.50",
+    "tags": [{"name": "Dinner"}, {"name": "Quick"}],
+    "ingredients": [{"name": "Rice"}, {"name": "Salt"}],
+}
+
+
+def storm(user, requests, retries, threads, with_key, retry_after):
+    """Send every request ``retries`` times; return (outcome, latency) pairs."""
+    from django.db import connections
+    from rest_framework.test import APIClient
+
+    def send(key):
+        client = APIClient()
+        client.force_authenticate(user)
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if with_key else {}
+        results = []
+        while True:
+            start = time.perf_counter()
+            res = client.post(
+                "/api/recipe/recipes/", PAYLOAD, format="json", **headers
+            )
+            elapsed = time.perf_counter() - start
+            if res.status_code != 409:
+                break
+            results.append(("409", elapsed))
+            time.sleep(retry_after)
+        connections.close_all()
+        if res.status_code == 201:
+            outcome = "replayed" if res.has_header("Idempotent-Replayed") else "created"
+        else:
+            outcome = str(res.status_code)
+        return results + [(outcome, elapsed)]
+
+    # Retries of one request are adjacent, so they run concurrently.
+    keys = [str(uuid.uuid4()) for _ in range(requests)]
+    keys = [key for key in keys for _ in range(retries)]
+    with ThreadPoolExecutor(threads) as pool:
+        return [result for results in pool.map(send, keys) for result in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--retry-after", type=float, default=0.05)
+    args = parser.parse_args()
+
+    setup()
+    # 409s are expected here; don't log each one.
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+    with test_database():
+        from django.contrib.auth import get_user_model
+
+        from apps.core.models import Recipe
+
+        user = get_user_model().objects.create_user(
+            email="storm@example.com", password="Test@1234"
+        )
+        for with_key in (False, True):
+            Recipe.objects.all().delete()
+            with timer() as t:
+                results = storm(
+                    user,
+                    args.requests,
+                    args.retries,
+                    args.threads,
+                    with_key,
+                    args.retry_after,
+                )
+            label = "with Idempotency-Key" if with_key else "without key"
+            print(f"== {label} ==")
+            report("requests", len(results), t["elapsed"], "req")
+            print(
+                f"  recipes created: {Recipe.objects.count()} "
+                f"for {args.requests} logical requests"
+            )
+            latencies = defaultdict(list)
+            for outcome, elapsed in results:
+                latencies[outcome].append(elapsed * 1000)
+            for outcome, ms in sorted(latencies.items()):
+                print(
+                    f"  {outcome:<10}{len(ms):>7}  p50 {percentile(ms, 50):7.2f} ms"
+                    f"  p99 {percentile(ms, 99):7.2f} ms"
+                )
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark recipe image uploads and thumbnail jobs.
+
+Uploads: posts ``--uploads`` copies of a generated ``--megapixels`` JPEG
+to `upload-image/` through the WSGI handler, reading the request body from
+a file as a server would, and reports throughput and the peak Python
+memory of one upload (which stays far below the image size, since it is
+streamed to disk).
+
+Thumbnails: queues ``--thumbnails`` thumbnail jobs and drains them with a
+4-thread job worker, rendering in the calling threads
+(``RECIPE_THUMBNAIL_PROCESSES=0``) and in process pools of each
+``--processes`` size, and reports jobs per second.
+
+Usage:
+    python -m benchmarks.images [--uploads 20] [--thumbnails 40] [--processes 1 2 4]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import tracemalloc
+from decimal import Decimal
+
+from benchmarks import report, setup, test_database, timer
+
+
+BOUNDARY = "benchmarkboundary"
+
+
+def make_photo(path, megapixels):
+    """Write a photo-like JPEG (gradients and noise) of ``megapixels``."""
+    from PIL import Image
+
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    size = (width, width * 3 // 4)
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 40)
+    photo = Image.merge(
+        "RGB", (gradient, noise, gradient.transpose(Image.Transpose.ROTATE_180))
+    )
+    photo.save(path, "JPEG", quality=90)
+
+
+def write_multipart(photo, path):
+    """Write a multipart/form-data body uploading ``photo`` as "image"."""
+    with open(path, "wb") as body, open(photo, "rb") as image:
+        body.write(
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"image\"; "
+            f"filename=\"photo.jpg\"\r\nContent-Type: image/jpeg\r\n\r\n".encode()
+        )
+        shutil.copyfileobj(image, body)
+        body.write(f"\r\n--{BOUNDARY}--\r\n".encode())
+
+
+def upload(handler, url, body_path, token):
+    """Send the body at ``body_path`` to ``url``; returns the status line."""
+    statuses = []
+    with open(body_path, "rb") as body:
+        environ = {
+            "REQUEST_METHOD": "POST",
+            "PATH_INFO": url,
+            "QUERY_STRING": "",
+            "CONTENT_TYPE": f"multipart/form-data; boundary={BOUNDARY}",
+            "CONTENT_LENGTH": str(os.path.getsize(body_path)),
+            "HTTP_HOST": "testserver",
+            "HTTP_AUTHORIZATION": f"Token {token}",
+            "SERVER_NAME": "testserver",
+            "SERVER_PORT": "80",
+            "wsgi.url_scheme": "http",
+            "wsgi.input": body,
+            "wsgi.errors": None,
+        }
+        response = handler(environ, lambda status, headers: statuses.append(status))
+        response.close()
+    return statuses[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--thumbnails", type=int, default=40)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    setup()
+    workdir = tempfile.mkdtemp()
+    try:
+        run(args, workdir)
+    finally:
+        shutil.rmtree(workdir)
+
+
+def run(args, workdir):
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.test import override_settings
+
+    media_root = os.path.join(workdir, "media")
+    photo = os.path.join(workdir, "photo.jpg")
+    body = os.path.join(workdir, "body")
+    make_photo(photo, args.megapixels)
+    write_multipart(photo, body)
+    image_mib = os.path.getsize(photo) / 2**20
+    print(f"image: {args.megapixels:g} MP JPEG, {image_mib:.1f} MiB")
+
+    with test_database(), override_settings(
+        MEDIA_ROOT=media_root, FILE_UPLOAD_TEMP_DIR=workdir
+    ):
+        from django.contrib.auth import get_user_model
+        from rest_framework.authtoken.models import Token
+
+        from apps.core import jobs
+        from apps.core.models import Job, Recipe
+        from apps.recipe import thumbnails
+
+        user = get_user_model().objects.create_user(
+            email="images@example.com", password="Test@1234"
+        )
+        token = Token.objects.create(user=user).key
+        recipe = Recipe.objects.create(
+            user=user, title="Photo", time_minute=5, price=Decimal("1")
+        )
+        handler = WSGIHandler()
+        url = f"/api/recipe/recipes/{recipe.id}/upload-image/"
+
+        with timer() as t:
+            for _ in range(args.uploads):
+                status = upload(handler, url, body, token)
+                assert status.startswith("200"), status
+        report("uploads", args.uploads, t["elapsed"], "uploads")
+        print(f"  {args.uploads * image_mib / t['elapsed']:.1f} MiB/s")
+        tracemalloc.start()
+        upload(handler, url, body, token)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  peak Python memory per upload: {peak / 2**20:.2f} MiB")
+        print()
+
+        Job.objects.all().delete()
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(user=user, title=f"Photo {n}", time_minute=5, price=1)
+                for n in range(args.thumbnails)
+            ]
+        )
+        for n, recipe in enumerate(recipes):
+            name = f"recipes/photo{n}.jpg"
+            shutil.copy(photo, os.path.join(media_root, name))
+            recipe.image = name
+        Recipe.objects.bulk_update(recipes, ["image"])
+
+        for processes in [0, *args.processes]:
+            Job.objects.all().delete()
+            for recipe in recipes:
+                jobs.enqueue(
+                    "recipe.thumbnails", recipe_id=recipe.id, image=recipe.image.name
+                )
+            worker = jobs.Worker(concurrency=4)
+            with override_settings(RECIPE_THUMBNAIL_PROCESSES=processes):
+                if processes:
+                    # Start the pool outside the timing.
+                    thumbnails.get_pool(processes)
+                with timer() as t:
+                    worker.run(until_empty=True)
+                thumbnails.shutdown()
+            assert (
+                Job.objects.filter(status=Job.Status.SUCCEEDED).count()
+                == args.thumbnails
+            )
+            label = f"{processes} processes" if processes else "worker threads only"
+            report(f"thumbnail jobs, {label}", args.thumbnails, t["elapsed"], "jobs")
+
+
+if __name__ == "__main__":
+    main()
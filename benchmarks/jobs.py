@@ -0,0 +1,57 @@
+"""
+Benchmark job queue throughput against the number of worker threads.
+
+Queues ``--jobs`` jobs of a task that sleeps ``--task-ms`` milliseconds
+(standing in for I/O such as a batch of deletes or an upload), then drains
+the queue with a `Worker` of each ``--workers`` size and reports jobs per
+second. With ``--task-ms 0`` it measures the queue's own overhead: the
+claim with ``FOR UPDATE SKIP LOCKED`` and the status update.
+
+Usage:
+    python -m benchmarks.jobs [--jobs 2000] [--workers 1 2 4 8 16] [--task-ms 0 10]
+"""
+
+import argparse
+import time
+
+from benchmarks import report, setup, test_database, timer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--task-ms", type=float, nargs="+", default=[0, 10])
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        from apps.core import jobs
+        from apps.core.models import Job
+
+        @jobs.task("benchmarks.sleep")
+        def sleep(ms):
+            time.sleep(ms / 1000)
+
+        for task_ms in args.task_ms:
+            print(f"== task of {task_ms:g} ms ==")
+            for workers in args.workers:
+                Job.objects.all().delete()
+                Job.objects.bulk_create(
+                    [
+                        Job(name="benchmarks.sleep", kwargs={"ms": task_ms})
+                        for _ in range(args.jobs)
+                    ],
+                    batch_size=1000,
+                )
+                worker = jobs.Worker(concurrency=workers)
+                with timer() as t:
+                    worker.run(until_empty=True)
+                succeeded = Job.objects.filter(status=Job.Status.SUCCEEDED).count()
+                assert succeeded == args.jobs == worker.processed, succeeded
+                report(f"{workers} worker threads", succeeded, t["elapsed"], "jobs")
+            print()
+
+
+if __name__ == "__main__":
+    main()
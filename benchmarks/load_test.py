@@ -0,0 +1,208 @@
+"""
+Replay mixed API traffic and report latency, throughput and query counts.
+
+By default the dataset is seeded into a throwaway test database with
+`seed_perf_data` and requests are replayed in-process through the Django
+test client, which lets every request's SQL queries be counted. Pass
+``--base-url`` to drive a running server over HTTP instead; users and
+tokens are then read from the configured database (seed it first with
+``manage.py seed_perf_data``).
+
+Usage:
+    python -m benchmarks.load_test [--requests 2000] [--users 50] [--seed 42]
+    python -m benchmarks.load_test --base-url http://localhost:8000 --threads 8
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from benchmarks import percentile, setup, test_database
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+# (weight, name, method, path template, needs recipe id)
+TRAFFIC_MIX = [
+    (40, "recipe-list", "GET", "/api/recipe/recipes/", False),
+    (25, "recipe-detail", "GET", "/api/recipe/recipes/{id}/", True),
+    (10, "tag-list", "GET", "/api/recipe/tags/", False),
+    (5, "ingredient-list", "GET", "/api/recipe/ingredient/", False),
+    (5, "recipe-create", "POST", "/api/recipe/recipes/", False),
+    (5, "recipe-update", "PATCH", "/api/recipe/recipes/{id}/", True),
+    (10, "user-me", "GET", "/api/user/me/", False),
+]
+
+
+def build_plan(rng, users, count):
+    """
+    Build a deterministic list of requests to replay.
+
+    Users are picked with Zipfian skew, so the heaviest accounts receive most
+    of the traffic, as in production.
+    """
+    weights = [w for w, *_ in TRAFFIC_MIX]
+    user_weights = [1 / (rank + 1) for rank in range(len(users))]
+    plan = []
+    for _ in range(count):
+        _, name, method, path, needs_id = rng.choices(TRAFFIC_MIX, weights)[0]
+        user = rng.choices(users, user_weights)[0]
+        if needs_id:
+            if not user["recipe_ids"]:
+                name, method, path = "recipe-list", "GET", "/api/recipe/recipes/"
+            else:
+                path = path.format(id=rng.choice(user["recipe_ids"]))
+        body = None
+        if method == "POST":
+            body = {
+                "title": f"Load test recipe {rng.randint(0, 10**6)}",
+                "time_minute": rng.randint(5, 120),
+                "price": "9.99",
+                "tags": [{"name": rng.choice(["Dinner", "Quick", "Vegan"])}],
+                "ingredients": [{"name": "Salt"}, {"name": "Pepper"}],
+            }
+        elif method == "PATCH":
+            body = {"time_minute": rng.randint(5, 120)}
+        plan.append((name, method, path, user["token"], body))
+    return plan
+
+
+def load_users(limit):
+    """Return seeded users with their token and recipe ids, heaviest first."""
+    from rest_framework.authtoken.models import Token
+
+    from apps.core.models import Recipe
+
+    users = []
+    for token in Token.objects.order_by("user_id")[:limit]:
+        recipe_ids = list(
+            Recipe.objects.filter(user=token.user_id).values_list("id", flat=True)
+        )
+        users.append({"token": token.key, "recipe_ids": recipe_ids})
+    users.sort(key=lambda user: len(user["recipe_ids"]), reverse=True)
+    return users
+
+
+def run_in_process(plan):
+    """Replay the plan through the test client, counting queries per request."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    results = []
+    for name, method, path, token, body in plan:
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            res = getattr(client, method.lower())(path, body, format="json")
+            elapsed = time.perf_counter() - start
+        results.append((name, res.status_code, elapsed, len(queries)))
+    return results
+
+
+def run_http(plan, base_url, threads):
+    """
+    Replay the plan over HTTP with a thread pool.
+
+    Query counts are read from the `Server-Timing` header set by
+    `RequestMetricsMiddleware`, when the server sends it.
+    """
+
+    def send(item):
+        name, method, path, token, body = item
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(
+            base_url.rstrip("/") + path,
+            data=data,
+            method=method,
+            headers={
+                "Authorization": f"Token {token}",
+                "Content-Type": "application/json",
+            },
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req) as res:
+                res.read()
+                status, headers = res.status, res.headers
+        except urllib.error.HTTPError as exc:
+            status, headers = exc.code, exc.headers
+        elapsed = time.perf_counter() - start
+        match = SERVER_TIMING_QUERIES.search(headers.get("Server-Timing", ""))
+        return (name, status, elapsed, int(match.group(1)) if match else None)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(send, plan))
+
+
+def print_report(results, wall_time):
+    """Print per-endpoint and overall latency percentiles, RPS and queries."""
+    groups = defaultdict(list)
+    for row in results:
+        groups[row[0]].append(row)
+    groups["ALL"] = results
+
+    header = f"{'endpoint':<18}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, rows in sorted(groups.items(), key=lambda kv: kv[0] == "ALL"):
+        latencies = [row[2] * 1000 for row in rows]
+        errors = sum(1 for row in rows if row[1] >= 400)
+        queries = [row[3] for row in rows if row[3] is not None]
+        q_per_req = f"{sum(queries) / len(queries):.1f}" if queries else "n/a"
+        print(
+            f"{name:<18}{len(rows):>7}{errors:>8}"
+            f"{percentile(latencies, 50):>9.2f}"
+            f"{percentile(latencies, 95):>9.2f}"
+            f"{percentile(latencies, 99):>9.2f}"
+            f"{q_per_req:>8}"
+        )
+    print(f"\n{len(results)} requests in {wall_time:.2f}s ({len(results) / wall_time:,.1f} req/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=50, help="Users to seed / replay as.")
+    parser.add_argument("--recipes-per-user", type=float, default=50)
+    parser.add_argument("--base-url", help="Drive a running server over HTTP.")
+    parser.add_argument("--threads", type=int, default=8, help="HTTP mode concurrency.")
+    args = parser.parse_args()
+
+    setup()
+    rng = random.Random(args.seed)
+
+    if args.base_url:
+        plan = build_plan(rng, load_users(args.users), args.requests)
+        start = time.perf_counter()
+        results = run_http(plan, args.base_url, args.threads)
+        print_report(results, time.perf_counter() - start)
+        return
+
+    from django.core.management import call_command
+
+    with test_database():
+        call_command(
+            "seed_perf_data",
+            users=args.users,
+            recipes_per_user=args.recipes_per_user,
+            seed=args.seed,
+            stdout=StringIO(),
+        )
+        plan = build_plan(rng, load_users(args.users), args.requests)
+        start = time.perf_counter()
+        results = run_in_process(plan)
+        print_report(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
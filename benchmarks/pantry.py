@@ -0,0 +1,170 @@
+"""
+Benchmark "what can I cook" matching: SQL aggregation versus the index.
+
+Creates a user with ``--recipes`` recipes of 5-12 ingredients each, drawn
+from ``--ingredients`` ingredients with a skewed popularity (a few, like
+salt, are in most recipes). For random pantries of ``--have`` ingredients
+it compares an aggregate over the recipe/ingredient table with
+`apps.recipe.pantry`: the index alone, and `pantry.match` as the endpoint
+calls it (including the change log check). Also reports the index's build
+time, its size, the cost of catching up with one changed recipe, and that
+of applying ``--changes`` changed recipes to the index at once.
+
+Usage:
+    python -m benchmarks.pantry [--recipes 1000 10000 100000] [--have 10 30]
+"""
+
+import argparse
+import random
+import time
+from decimal import Decimal
+
+from benchmarks import percentile, setup, test_database, timer
+
+
+MATCH_SQL = """
+SELECT ri.recipe_id,
+    count(*) FILTER (WHERE ri.ingredient_id = ANY(%(have)s)) AS matched,
+    count(*) AS total
+FROM core_recipe_ingredients ri
+JOIN core_recipe r ON r.id = ri.recipe_id
+WHERE r.user_id = %(user_id)s
+GROUP BY ri.recipe_id
+HAVING count(*) FILTER (WHERE ri.ingredient_id = ANY(%(have)s))
+    >= GREATEST(count(*) * %(coverage)s, 1)
+ORDER BY
+    count(*) FILTER (WHERE ri.ingredient_id = ANY(%(have)s))::float / count(*) DESC,
+    count(*) - count(*) FILTER (WHERE ri.ingredient_id = ANY(%(have)s)),
+    ri.recipe_id DESC
+LIMIT %(limit)s
+"""
+
+
+def create_catalog(recipes, ingredients, rng):
+    """Create a user owning ``recipes`` recipes; returns (user, ingredient ids)."""
+    from django.contrib.auth import get_user_model
+
+    from apps.core.models import Ingredient, Recipe
+
+    user = get_user_model().objects.create_user(
+        email=f"pantry{time.monotonic_ns()}@example.com", password="Test@1234"
+    )
+    ingredient_ids = [
+        ingredient.id
+        for ingredient in Ingredient.objects.get_or_create_many(
+            user, [f"Ingredient {n}" for n in range(ingredients)]
+        )
+    ]
+    weights = [1 / (rank + 1) for rank in range(ingredients)]
+    created = Recipe.objects.bulk_create(
+        [
+            Recipe(user=user, title=f"Recipe {n}", time_minute=10, price=Decimal("1"))
+            for n in range(recipes)
+        ],
+        batch_size=5000,
+    )
+    RecipeIngredient = Recipe.ingredients.through
+    rows = []
+    for recipe in created:
+        chosen = set(rng.choices(ingredient_ids, weights, k=rng.randint(5, 12)))
+        rows.extend(
+            RecipeIngredient(recipe_id=recipe.id, ingredient_id=pk) for pk in chosen
+        )
+    RecipeIngredient.objects.bulk_create(rows, batch_size=10000)
+    return user, ingredient_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--have", type=int, nargs="+", default=[10, 30])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--coverage", type=float, default=0.5)
+    parser.add_argument("--changes", type=int, default=5000)
+    args = parser.parse_args()
+
+    setup()
+    rng = random.Random(42)
+    with test_database():
+        from django.db import connection
+
+        from apps.core.changes import record_changes
+        from apps.core.models import Change, Recipe
+        from apps.recipe import indexes, pantry
+
+        for recipes in args.recipes:
+            user, ingredient_ids = create_catalog(recipes, args.ingredients, rng)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            with timer() as t:
+                index = indexes.build(pantry.PantryIndex, user.id)
+            size = sum(p.nbytes for p in index.postings.values()) + (
+                index.recipe_ids.nbytes + index.totals.nbytes
+            )
+            print(
+                f"== {recipes} recipes: index built in {t['elapsed'] * 1000:.0f} ms, "
+                f"{size / 2**20:.1f} MiB of arrays =="
+            )
+
+            for have in args.have:
+                # Pantries favour common ingredients, as real ones do.
+                pantries = [
+                    set(rng.sample(ingredient_ids[:200], have // 2))
+                    | set(rng.sample(ingredient_ids, have - have // 2))
+                    for _ in range(args.queries)
+                ]
+                timings = {"sql": [], "index": [], "pantry.match": []}
+                for items in pantries:
+                    start = time.perf_counter()
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            MATCH_SQL,
+                            {
+                                "have": list(items),
+                                "user_id": user.id,
+                                "coverage": args.coverage,
+                                "limit": 20,
+                            },
+                        )
+                        expected = cursor.fetchall()
+                    timings["sql"].append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    found = index.match(items, args.coverage, 20)
+                    timings["index"].append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    pantry.match(user.id, items, args.coverage, 20)
+                    timings["pantry.match"].append(time.perf_counter() - start)
+                    assert found == [tuple(row) for row in expected]
+                for label, values in timings.items():
+                    ms = [value * 1000 for value in values]
+                    print(
+                        f"  have {have:>3}  {label:<13} p50 {percentile(ms, 50):8.3f} ms"
+                        f"  p99 {percentile(ms, 99):8.3f} ms"
+                    )
+
+            recipe = Recipe.objects.filter(user=user).first()
+            recipe.ingredients.set(rng.sample(ingredient_ids, 6))
+            record_changes(user.id, updated=[(Change.Kind.RECIPE, recipe.id)])
+            with timer() as t:
+                pantry.match(user.id, ingredient_ids[:10], args.coverage, 20)
+            print(f"  catch up with 1 changed recipe and match: {t['elapsed'] * 1000:.2f} ms")
+
+            recipe_ids = index.recipe_ids[: index.size].tolist()
+            changed = {
+                pk: [ingredient_ids[0]] + rng.sample(ingredient_ids, 7)
+                for pk in rng.sample(recipe_ids, min(args.changes, len(recipe_ids)))
+            }
+            with timer() as t:
+                index.set_recipes(changed)
+            print(
+                f"  apply {len(changed)} changed recipes to the index: "
+                f"{t['elapsed'] * 1000:.2f} ms"
+            )
+            print()
+
+
+if __name__ == "__main__":
+    main()
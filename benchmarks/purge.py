@@ -0,0 +1,124 @@
+"""
+Benchmark deleting a large account: ORM cascade versus batched purge.
+
+Creates a user owning ``--recipes`` recipes (each with a few tags and
+ingredients) and deletes it twice: once with ``user.delete()``, Django's
+cascade in one transaction, and once with the purge worker's batched
+deletes. Reports total time, the longest transaction (how long row locks are
+held; for the purge, its slowest batch) and peak Python memory.
+
+Usage:
+    python -m benchmarks.purge [--recipes 1000 20000] [--batch-size 1000]
+"""
+
+import argparse
+import time
+import tracemalloc
+from decimal import Decimal
+
+from benchmarks import setup, test_database
+
+
+def create_account(recipes):
+    """Create a user with ``recipes`` recipes; returns the user."""
+    from django.contrib.auth import get_user_model
+
+    from apps.core.models import Ingredient, Recipe, Tag
+
+    user = get_user_model().objects.create_user(
+        email=f"purge{time.monotonic_ns()}@example.com", password="Test@1234"
+    )
+    tags = Tag.objects.get_or_create_many(user, [f"Tag {n}" for n in range(20)])
+    ingredients = Ingredient.objects.get_or_create_many(
+        user, [f"Ingredient {n}" for n in range(100)]
+    )
+    created = Recipe.objects.bulk_create(
+        [
+            Recipe(user=user, title=f"Recipe {n}", time_minute=10, price=Decimal("1"))
+            for n in range(recipes)
+        ],
+        batch_size=2000,
+    )
+    RecipeTag = Recipe.tags.through
+    RecipeIngredient = Recipe.ingredients.through
+    RecipeTag.objects.bulk_create(
+        [
+            RecipeTag(recipe=recipe, tag=tags[(n + k) % len(tags)])
+            for n, recipe in enumerate(created)
+            for k in range(3)
+        ],
+        batch_size=5000,
+    )
+    RecipeIngredient.objects.bulk_create(
+        [
+            RecipeIngredient(
+                recipe=recipe, ingredient=ingredients[(n + k) % len(ingredients)]
+            )
+            for n, recipe in enumerate(created)
+            for k in range(8)
+        ],
+        batch_size=5000,
+    )
+    return user
+
+
+def measure(delete):
+    """Run ``delete``; return (seconds, peak MiB, slowest statement seconds)."""
+    from django.db import connection
+
+    durations = []
+
+    def timed(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with connection.execute_wrapper(timed):
+        delete()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, max(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipes", type=int, nargs="+", default=[1000, 20000])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        from apps.core import purge
+
+        def batched(user):
+            purge.delete_account(user)
+            purge.run_pending(args.batch_size)
+
+        print(
+            f"{'recipes':>8}  {'method':<10}{'total s':>9}"
+            f"{'longest tx s':>14}{'peak MiB':>10}"
+        )
+        for recipes in args.recipes:
+            user = create_account(recipes)
+            elapsed, peak, _ = measure(user.delete)
+            # The cascade is a single transaction.
+            print(
+                f"{recipes:>8}  {'cascade':<10}{elapsed:>9.2f}"
+                f"{elapsed:>14.3f}{peak:>10.1f}"
+            )
+            user = create_account(recipes)
+            elapsed, peak, slowest = measure(lambda: batched(user))
+            # Each batch is a transaction around one DELETE.
+            print(
+                f"{recipes:>8}  {'batched':<10}{elapsed:>9.2f}"
+                f"{slowest:>14.3f}{peak:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
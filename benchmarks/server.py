@@ -0,0 +1,120 @@
+"""
+Benchmark the production server: startup time and throughput per worker class.
+
+Starts gunicorn with `project.gunicorn_conf` as a subprocess and measures
+the time until it answers its first request, with and without
+`preload_app`. Then it seeds a throwaway database with `seed_perf_data`
+and replays the mixed API traffic of `benchmarks.load_test` over HTTP
+against each worker class.
+
+Usage:
+    python -m benchmarks.server [--workers 2] [--requests 2000] [--threads 16]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from io import StringIO
+
+from benchmarks import setup, test_database
+from benchmarks.load_test import build_plan, load_users, print_report, run_http
+
+
+def start_server(port, worker_class, workers, preload=True, env=None):
+    """Start gunicorn; return the process and seconds until it served a request."""
+    env = dict(
+        env or os.environ,
+        PORT=str(port),
+        WEB_WORKER_CLASS=worker_class,
+        WEB_CONCURRENCY=str(workers),
+        WEB_PRELOAD="1" if preload else "0",
+        WEB_ACCESS_LOG="",
+        WEB_LOG_LEVEL="warning",
+    )
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "python:project.gunicorn_conf"],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}/metrics"
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as res:
+                res.read()
+            return process, time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.01)
+
+
+def stop_server(process):
+    """Stop gunicorn gracefully and return the shutdown time in seconds."""
+    start = time.perf_counter()
+    process.terminate()
+    process.wait()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--worker-classes", nargs="+", default=["sync", "gthread", "uvicorn"]
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16, help="Client concurrency.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--startup-runs", type=int, default=3)
+    args = parser.parse_args()
+
+    setup()
+    from django.core.management import call_command
+    from django.db import connection
+
+    print(f"Startup (time to first response, {args.workers} worker(s)):")
+    for worker_class in args.worker_classes:
+        for preload in (False, True):
+            timings = []
+            for _ in range(args.startup_runs):
+                process, elapsed = start_server(
+                    args.port, worker_class, args.workers, preload
+                )
+                stop_server(process)
+                timings.append(elapsed)
+            print(
+                f"  {worker_class:<8} preload={preload!s:<5} "
+                f"best {min(timings) * 1000:7.0f} ms   "
+                f"mean {sum(timings) / len(timings) * 1000:7.0f} ms"
+            )
+
+    with test_database():
+        call_command(
+            "seed_perf_data", users=args.users, seed=args.seed, stdout=StringIO()
+        )
+        users = load_users(args.users)
+        # The server processes must use the throwaway database too.
+        env = dict(os.environ, DB_NAME=connection.settings_dict["NAME"])
+        connection.close()
+
+        for worker_class in args.worker_classes:
+            plan = build_plan(random.Random(args.seed), users, args.requests)
+            process, _ = start_server(args.port, worker_class, args.workers, env=env)
+            try:
+                print(f"\n== {worker_class} ({args.workers} worker(s)) ==")
+                start = time.perf_counter()
+                results = run_http(plan, f"http://127.0.0.1:{args.port}", args.threads)
+                print_report(results, time.perf_counter() - start)
+            finally:
+                stop_server(process)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark similar recipes: pairwise Python sets versus the NumPy index.
+
+For each of ``--recipes``, generates a catalog in memory (3-6 of
+``--tags`` tags and 5-12 of ``--ingredients`` ingredients per recipe, with
+a skewed popularity), builds an `apps.recipe.similarity.SimilarityIndex`
+from it and times finding the 10 most similar recipes to random recipes:
+with the index, and by computing the Jaccard index of Python sets against
+every recipe. Catalogs are generated rather than stored so that they can
+reach a million recipes; the index is the same one the endpoint queries.
+
+With ``--endpoint-recipes``, also stores a catalog of that size and times
+`GET /api/recipe/recipes/<id>/similar/` end to end, change log check and
+serialization included.
+
+Usage:
+    python -m benchmarks.similar [--recipes 1000 10000 100000 1000000]
+"""
+
+import argparse
+import heapq
+import random
+import time
+
+from benchmarks import percentile, setup, test_database, timer
+
+
+def generate(recipes, tags, ingredients, rng):
+    """Return the (recipe id, feature) pairs of a generated catalog."""
+    tag_weights = [1 / (rank + 1) for rank in range(tags)]
+    ingredient_weights = [1 / (rank + 1) for rank in range(ingredients)]
+    pairs = []
+    for recipe_id in range(1, recipes + 1):
+        features = {
+            -tag
+            for tag in rng.choices(range(1, tags + 1), tag_weights, k=rng.randint(3, 6))
+        } | set(
+            rng.choices(
+                range(1, ingredients + 1), ingredient_weights, k=rng.randint(5, 12)
+            )
+        )
+        pairs.extend((recipe_id, feature) for feature in features)
+    return pairs
+
+
+def pairwise(catalog, recipe_id, limit):
+    """Rank ``catalog`` by Jaccard similarity to ``recipe_id`` in Python."""
+    features = catalog[recipe_id]
+    scores = (
+        (len(features & other) / len(features | other), pk)
+        for pk, other in catalog.items()
+        if pk != recipe_id and not features.isdisjoint(other)
+    )
+    return heapq.nlargest(limit, scores)
+
+
+def report_ms(label, seconds):
+    ms = [value * 1000 for value in seconds]
+    print(
+        f"  {label:<10} p50 {percentile(ms, 50):9.3f} ms"
+        f"  p99 {percentile(ms, 99):9.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--recipes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000]
+    )
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--pairwise-queries", type=int, default=20)
+    parser.add_argument("--endpoint-recipes", type=int, default=10000)
+    args = parser.parse_args()
+
+    setup()
+    from apps.recipe.similarity import SimilarityIndex
+
+    rng = random.Random(42)
+    for recipes in args.recipes:
+        pairs = generate(recipes, args.tags, args.ingredients, rng)
+        with timer() as t:
+            index = SimilarityIndex(0, pairs)
+        size = sum(p.nbytes for p in index.postings.values()) + (
+            index.recipe_ids.nbytes + index.totals.nbytes
+        )
+        print(
+            f"== {recipes} recipes, {len(pairs)} features: index built in "
+            f"{t['elapsed'] * 1000:.0f} ms, {size / 2**20:.1f} MiB of arrays =="
+        )
+        catalog = {}
+        for recipe_id, feature in pairs:
+            catalog.setdefault(recipe_id, set()).add(feature)
+        del pairs
+
+        timings = []
+        for recipe_id in rng.choices(range(1, recipes + 1), k=args.queries):
+            start = time.perf_counter()
+            index.similar(recipe_id, catalog[recipe_id], 10)
+            timings.append(time.perf_counter() - start)
+        report_ms("index", timings)
+
+        timings = []
+        for recipe_id in rng.choices(range(1, recipes + 1), k=args.pairwise_queries):
+            start = time.perf_counter()
+            expected = pairwise(catalog, recipe_id, 10)
+            timings.append(time.perf_counter() - start)
+            found = index.similar(recipe_id, catalog[recipe_id], 10)
+            # Equal scores may be ordered differently; compare the scores.
+            assert [round(s, 9) for _, s in found] == [
+                round(s, 9) for s, _ in expected
+            ]
+        report_ms("pairwise", timings)
+        print()
+
+    if args.endpoint_recipes:
+        endpoint(args.endpoint_recipes, args.ingredients, args.queries, rng)
+
+
+def endpoint(recipes, ingredients, queries, rng):
+    from benchmarks.pantry import create_catalog
+
+    with test_database():
+        from rest_framework.test import APIClient
+
+        from apps.core.models import Recipe
+
+        user, _ = create_catalog(recipes, ingredients, rng)
+        client = APIClient()
+        client.force_authenticate(user)
+        recipe_ids = list(Recipe.objects.filter(user=user).values_list("id", flat=True))
+        with timer() as t:
+            client.get(f"/api/recipe/recipes/{recipe_ids[0]}/similar/")
+        print(f"== endpoint, {recipes} stored recipes ==")
+        print(f"  first request (builds the index): {t['elapsed'] * 1000:.0f} ms")
+        timings = []
+        for recipe_id in rng.choices(recipe_ids, k=queries):
+            start = time.perf_counter()
+            res = client.get(f"/api/recipe/recipes/{recipe_id}/similar/")
+            timings.append(time.perf_counter() - start)
+            assert res.status_code == 200, res.status_code
+        report_ms("GET", timings)
+
+
+if __name__ == "__main__":
+    main()
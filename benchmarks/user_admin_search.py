@@ -0,0 +1,108 @@
+"""
+Benchmark the user admin search on a generated user table.
+
+Compares the stock `ILIKE '%term%'` search over email and name with the
+index-backed search used by `UserAdmin` (exact email, prefix, trigram
+fallback), and an exact `COUNT(*)` with the planner estimate used by
+the changelist paginator.
+
+Usage:
+    python -m benchmarks.user_admin_search [--users 200000] [--repeat 20]
+"""
+
+import argparse
+import random
+
+from benchmarks import percentile, setup, test_database, timer
+
+
+FIRST_NAMES = [
+    "Alice", "Bob", "Carol", "David", "Erin", "Frank", "Grace", "Heidi",
+    "Ivan", "Judy", "Mallory", "Niaj", "Olivia", "Peggy", "Rupert", "Sybil",
+]
+LAST_NAMES = [
+    "Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Johnson",
+    "Davies", "Robinson", "Wright", "Thompson", "Evans", "Walker", "White",
+]
+
+
+def generate_users(count, batch_size=5000, seed=42):
+    """Insert ``count`` users sharing one password hash, then ANALYZE."""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection
+
+    User = get_user_model()
+    rng = random.Random(seed)
+    password = make_password("Pass!2024")
+    for start in range(0, count, batch_size):
+        User.objects.bulk_create(
+            User(
+                email=f"user{n}@example.com",
+                name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}",
+                password=password,
+            )
+            for n in range(start, min(start + batch_size, count))
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {User._meta.db_table}")
+
+
+def measure(label, fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        with timer() as t:
+            fn()
+        timings.append(t["elapsed"] * 1000)
+    print(
+        f"{label:<40} p50 {percentile(timings, 50):8.2f} ms"
+        f"   p95 {percentile(timings, 95):8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.db.models import Q
+
+    from apps.core.paginator import estimated_count
+    from apps.core.search import search_users, trigram_available
+
+    User = get_user_model()
+
+    with test_database():
+        with timer() as t:
+            generate_users(args.users)
+        print(f"Generated {args.users} users in {t['elapsed']:.1f}s")
+        print(f"pg_trgm installed: {trigram_available()}\n")
+
+        users = User.objects.order_by("id")
+        page = args.page_size
+        terms = {
+            "exact email": f"user{args.users // 2}@example.com",
+            "prefix": "user1234",
+            "name prefix": "Mallory W",
+            "typo (trigram fallback)": "Mallroy Wlaker",
+        }
+        for label, term in terms.items():
+            legacy = users.filter(Q(email__icontains=term) | Q(name__icontains=term))
+            measure(f"ILIKE %q%: {label}", lambda: list(legacy[:page]), args.repeat)
+            measure(
+                f"indexed: {label}",
+                lambda: list(search_users(users, term)[:page]),
+                args.repeat,
+            )
+
+        print()
+        measure("COUNT(*)", lambda: User.objects.count(), args.repeat)
+        measure("estimated count", lambda: estimated_count(User), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up. Serves the change stream, which needs no
+# Django request handling, and hands every other request to Django.
+from apps.core.events import ChangeStreamApplication  # noqa: E402
+
+application = ChangeStreamApplication(django_application)
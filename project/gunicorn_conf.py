@@ -0,0 +1,101 @@
+"""
+Gunicorn configuration for production.
+
+Run with:
+
+    gunicorn -c python:project.gunicorn_conf
+
+`WEB_WORKER_CLASS` selects how requests are served:
+
+- ``sync`` (default): one request at a time per worker process, through
+  `project.wsgi`. Best for this CPU- and database-bound API.
+- ``gthread``: sync workers with `WEB_THREADS` threads each, for I/O waits.
+- ``uvicorn``: asyncio workers serving `project.asgi`; needed for
+  long-lived connections such as streaming responses.
+
+The app is loaded once in the master before forking (`preload_app`), so
+workers share the imported modules copy-on-write and start instantly.
+Workers are recycled after `WEB_MAX_REQUESTS` requests to bound memory
+growth, and finish in-flight requests for up to `WEB_GRACEFUL_TIMEOUT`
+seconds on shutdown (SIGTERM).
+"""
+
+import gc
+import multiprocessing
+import os
+
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+
+WORKER_CLASSES = {
+    "sync": ("sync", "project.wsgi:application"),
+    "gthread": ("gthread", "project.wsgi:application"),
+    "uvicorn": ("project.workers.UvicornWorker", "project.asgi:application"),
+}
+
+cpu_count = multiprocessing.cpu_count()
+worker_kind = os.environ.get("WEB_WORKER_CLASS", "sync")
+worker_class, wsgi_app = WORKER_CLASSES[worker_kind]
+
+bind = f"0.0.0.0:{_int('PORT', 8000)}"
+
+# Sync workers block on the database, so run a few more than there are
+# cores; an event loop keeps one core busy on its own.
+workers = _int(
+    "WEB_CONCURRENCY", 2 * cpu_count + 1 if worker_kind != "uvicorn" else cpu_count
+)
+threads = _int("WEB_THREADS", 4 if worker_kind == "gthread" else 1)
+
+preload_app = os.environ.get("WEB_PRELOAD", "1") == "1"
+
+max_requests = _int("WEB_MAX_REQUESTS", 2000)
+max_requests_jitter = _int("WEB_MAX_REQUESTS_JITTER", max_requests // 10)
+
+timeout = _int("WEB_TIMEOUT", 30)
+graceful_timeout = _int("WEB_GRACEFUL_TIMEOUT", 30)
+keepalive = _int("WEB_KEEPALIVE", 5)
+
+# Heartbeat files on a tmpfs, so a slow disk cannot get workers killed.
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = os.environ.get("WEB_ACCESS_LOG", "-") or None
+errorlog = "-"
+loglevel = os.environ.get("WEB_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    """Warm shared state in the master, then freeze it for the workers."""
+    if preload_app:
+        from django.conf import settings
+        from django.db import connections
+
+        from apps.core import schema
+
+        # API-only workers neither load drf-spectacular nor serve the schema.
+        if not settings.API_ONLY:
+            schema.get_artifact()
+        # A connection opened while loading must not be inherited by workers.
+        connections.close_all()
+        # Objects created so far live for the whole process. Moving them out
+        # of the collector's reach stops gc from touching (and so copying)
+        # the pages workers share with the master.
+        gc.freeze()
+    server.log.info(
+        "Ready: %s x %s worker(s), %s thread(s) each, preload=%s",
+        workers,
+        worker_kind,
+        threads,
+        preload_app,
+    )
+
+
+def worker_exit(server, worker):
+    """Flush this worker's metrics so its counts survive recycling."""
+    from django.conf import settings
+
+    if settings.METRICS_MULTIPROC_DIR:
+        from apps.core.metrics import registry
+
+        registry.flush(settings.METRICS_MULTIPROC_DIR)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -26,6 +27,9 @@ SECRET_KEY = "django-insecure-4$ll6tm#)#mu+7i7(31a)b+@_^t-)!bs74x7osxu$iez%_nr4c
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# True while the test suite is running (`manage.py test`).
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+
 ALLOWED_HOSTS = []
 
 
@@ -38,6 +42,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "apps.core",
     "apps.user",
     "apps.recipe",
@@ -47,7 +52,18 @@ INSTALLED_APPS = [
     "corsheaders",
 ]
 
+# API-only worker pools (DJANGO_API_ONLY=1) do not load the admin or the
+# schema/docs views; route /admin/ and /api/docs/ to a pool without it.
+# Measure the effect with `manage.py startup_profile --compare`.
+API_ONLY = os.environ.get("DJANGO_API_ONLY", "0") == "1"
+DEFERRED_APPS = ["django.contrib.admin", "drf_spectacular"]
+if API_ONLY:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEFERRED_APPS]
+
 MIDDLEWARE = [
+    "apps.core.middleware.RequestMetricsMiddleware",
+    "apps.core.middleware.SlowRequestProfilerMiddleware",
+    "apps.core.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -89,6 +105,51 @@ DATABASES = {
         "NAME": os.environ.get("DB_NAME"),
         "USER": os.environ.get("DB_USER"),
         "PASSWORD": os.environ.get("DB_PASS"),
+        # Keep each worker's connection open between requests instead of
+        # reconnecting for every request; health checks drop dead ones.
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+    }
+}
+
+# Read replicas: a comma-separated list of hosts that share the primary's
+# name and credentials. Safe API reads are sent to them by
+# apps.core.routers.ReplicaRouter; writes always go to "default".
+DATABASE_REPLICAS = []
+for n, host in enumerate(
+    filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(",")), start=1
+):
+    DATABASES[f"replica{n}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{n}")
+
+if TESTING:
+    # The suite runs against the primary only. The router tests enable
+    # routing to this stand-in replica explicitly.
+    DATABASES.setdefault(
+        "replica1", {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    )
+    DATABASE_REPLICAS = []
+
+DATABASE_ROUTERS = ["apps.core.routers.ReplicaRouter"]
+
+# After a user writes, their reads stay on the primary for this many
+# seconds so they see their own changes despite replication lag. The
+# window is kept in the cache, which must be shared by all workers.
+REPLICA_READ_YOUR_WRITES_SECONDS = 5
+
+# A cache table on the primary, shared by every worker and host (a
+# per-process cache would not carry read-your-writes pins across
+# workers). Migrations create the table.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "core_cache",
+        # Pins expire within seconds; don't cull live ones under load.
+        "OPTIONS": {"MAX_ENTRIES": 100000},
     }
 }
 
@@ -129,6 +190,14 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded recipe images and their thumbnails. Serve MEDIA_ROOT at
+# MEDIA_URL from the reverse proxy; runserver serves it when DEBUG is on.
+MEDIA_URL = "/media/"
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+# Uploads are streamed to temporary files here. On the same filesystem as
+# MEDIA_ROOT, a finished upload is moved into place instead of copied.
+FILE_UPLOAD_TEMP_DIR = os.environ.get("FILE_UPLOAD_TEMP_DIR")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -142,7 +211,198 @@ AUTH_USER_MODEL = "core.User"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
+if API_ONLY:
+    # DRF resolves this setting while defining some views; DRF's own class
+    # avoids importing drf-spectacular just for that.
+    REST_FRAMEWORK["DEFAULT_SCHEMA_CLASS"] = "rest_framework.schemas.openapi.AutoSchema"
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # React development server
 ]
+
+# Request instrumentation (see apps/core/middleware.py).
+# Send query count and DB/serializer/total time in a `Server-Timing` header.
+SERVER_TIMING_HEADER = True
+
+# Maximum number of SQL queries per view, keyed by `<ViewClass>.<action>`.
+# Exceeding a budget logs a warning, or raises while the tests are running,
+# so N+1 regressions in the serializers fail CI instead of reaching production.
+QUERY_BUDGETS = {
+    "RecipeViewSet.list": 4,
+    "RecipeViewSet.retrieve": 4,
+    "TagViewSet.list": 2,
+    "IngredientViewSet.list": 2,
+    "ManageUserView.get": 2,
+    "SyncView.get": 8,
+    "RecipeViewSet.cookable": 8,
+    "RecipeViewSet.similar": 10,
+    # Under test, cold requests also build the index in the request (see
+    # RECIPE_INDEX_WARM_IN_BACKGROUND).
+    "TagViewSet.autocomplete": 4,
+    "IngredientViewSet.autocomplete": 4,
+}
+QUERY_BUDGET_RAISE = TESTING
+
+# Metrics (served at /metrics, see apps/core/metrics.py).
+# With several worker processes, point this at a directory shared by all of
+# them (and emptied on deploy) so every scrape reports server-wide totals.
+METRICS_MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR")
+# Seconds between a worker's dumps to METRICS_MULTIPROC_DIR.
+METRICS_FLUSH_INTERVAL = 5
+# Optional bearer token required to scrape /metrics.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+# Slow request profiling (see SlowRequestProfilerMiddleware). A sampled
+# request to a matching view is run under cProfile with an SQL trace, and
+# kept if it took at least PROFILE_THRESHOLD_MS. Profiles are listed at
+# /api/profiles/ (staff only).
+PROFILE_SLOW_REQUESTS = os.environ.get("PROFILE_SLOW_REQUESTS", "0") == "1"
+# fnmatch patterns over `<ViewClass>.<action>` names.
+PROFILE_VIEWS = ["RecipeViewSet.*"]
+PROFILE_THRESHOLD_MS = int(os.environ.get("PROFILE_THRESHOLD_MS", 500))
+# Fraction of matching requests that are profiled at all.
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0.05))
+# Upper bound on profiled requests per minute, per process.
+PROFILE_MAX_PER_MINUTE = 10
+PROFILE_DIR = os.environ.get("PROFILE_DIR", BASE_DIR / "profiles")
+# Only the newest PROFILE_MAX_FILES profiles are kept on disk.
+PROFILE_MAX_FILES = 200
+
+# Precomputed OpenAPI schema (see apps/core/schema.py). Built by
+# `manage.py build_schema`, or on the first request to /api/schema/.
+SCHEMA_CACHE_DIR = os.environ.get("SCHEMA_CACHE_DIR", BASE_DIR / "schema")
+# Browser/CDN cache lifetime of the unversioned /api/schema/ URL; clients
+# revalidate cheaply with the ETag afterwards.
+SCHEMA_CACHE_MAX_AGE = 3600
+
+# Tables estimated (from pg_class.reltuples) to hold more rows than this
+# show the estimate instead of running COUNT(*) on unfiltered admin lists.
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+# /readyz also reports not-ready until every migration has been applied.
+READINESS_CHECK_MIGRATIONS = True
+
+# Response compression (see CompressionMiddleware). Bodies smaller than
+# COMPRESSION_MIN_SIZE bytes are sent as they are.
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+# Levels chosen with `python -m benchmarks.compression`: on recipe lists,
+# gzip 5 and Brotli 5 get within 10% of the best size at 3-5x less CPU
+# than gzip 9 / Brotli 9.
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 5))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 5))
+# Compressed in addition to every text/* (except event streams) and
+# +json type.
+COMPRESSIBLE_TYPES = [
+    "application/json",
+    "application/javascript",
+    "application/vnd.oai.openapi",
+    "application/xml",
+    "image/svg+xml",
+]
+
+# Delta sync (/api/recipe/sync/, see apps/core/changes.py).
+# Maximum change log entries returned per sync request.
+SYNC_PAGE_SIZE = 500
+# Tombstones older than this are removed by `manage.py compact_changes`;
+# clients that have not synced for longer get a full snapshot.
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get("SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+# Change log entries deleted per transaction by `manage.py compact_changes`.
+SYNC_COMPACT_BATCH_SIZE = 1000
+
+# Change stream (served by the ASGI application, see apps/core/events.py).
+EVENTS_STREAM_PATH = "/api/recipe/events/"
+# The Postgres broker fans out across processes with LISTEN/NOTIFY; the
+# in-memory one only reaches streams served by the same process.
+EVENTS_BROKER = os.environ.get(
+    "EVENTS_BROKER",
+    "apps.core.events.InMemoryBroker" if TESTING else "apps.core.events.PostgresBroker",
+)
+# Events buffered per stream; a client that falls further behind is told
+# to sync instead.
+EVENTS_QUEUE_SIZE = 100
+# A comment line is sent after this many idle seconds, so proxies and load
+# balancers keep the connection open.
+EVENTS_HEARTBEAT_SECONDS = 20
+# Streams are closed after this many seconds (clients reconnect), which
+# spreads long-lived connections over new workers after a deploy.
+EVENTS_MAX_STREAM_SECONDS = 3600
+# Seconds a new stream waits for the worker's LISTEN connection.
+EVENTS_CONNECT_TIMEOUT = 5
+
+# Idempotency-Key support on recipe writes (see apps/core/idempotency.py).
+# Keys are remembered this long; purge expired ones with
+# `manage.py purge_idempotency_keys`.
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_KEY_TTL_SECONDS", 86400))
+# A claimed key whose request has not finished after this long (its worker
+# died) can be claimed by a retry.
+IDEMPOTENCY_LOCK_SECONDS = 60
+
+# Background deletion (see apps/core/purge.py), run by `manage.py run_worker`
+# (and swept up by `manage.py run_purges`).
+# Rows deleted per transaction: small enough to hold locks only briefly.
+PURGE_BATCH_SIZE = int(os.environ.get("PURGE_BATCH_SIZE", 1000))
+# A purge whose worker has not finished a batch in this many seconds (it
+# died) is picked up by another worker.
+PURGE_LEASE_SECONDS = 300
+# Seconds an idle worker waits before looking for new purges.
+PURGE_POLL_SECONDS = 5
+# Most ids accepted by one bulk-delete request.
+BULK_DELETE_MAX_IDS = 10000
+
+# Background jobs (see apps/core/jobs.py), run by `manage.py run_worker`.
+# Jobs run at once per worker process.
+JOBS_CONCURRENCY = int(os.environ.get("JOBS_CONCURRENCY", 4))
+# Tries before a failing job is marked failed.
+JOBS_MAX_ATTEMPTS = 5
+# A failed job is retried after JOBS_BACKOFF_SECONDS, doubling with every
+# attempt up to JOBS_BACKOFF_MAX_SECONDS (less up to half, at random).
+JOBS_BACKOFF_SECONDS = 10
+JOBS_BACKOFF_MAX_SECONDS = 3600
+# A job still running after this many seconds is assumed lost with its
+# worker and retried; tasks must finish well within it.
+JOBS_LEASE_SECONDS = 900
+# Seconds an idle worker waits before looking for due jobs.
+JOBS_POLL_SECONDS = 1
+# Finished jobs (and their status) are kept this many days.
+JOBS_RETENTION_DAYS = 7
+
+# Recipe images (see apps/recipe/images.py).
+# Largest accepted upload, in bytes.
+RECIPE_IMAGE_MAX_BYTES = int(os.environ.get("RECIPE_IMAGE_MAX_BYTES", 20 * 2**20))
+# Thumbnails made of every image, by longest edge in pixels, as WebP.
+RECIPE_THUMBNAIL_SIZES = [160, 480, 1024]
+RECIPE_THUMBNAIL_QUALITY = 80
+# Processes rendering thumbnails in each job worker, so that resizing does
+# not hold the worker's GIL; 0 renders them on the job's own thread.
+RECIPE_THUMBNAIL_PROCESSES = int(os.environ.get("RECIPE_THUMBNAIL_PROCESSES", 2))
+
+# In-memory per-user indexes of recipes, tags and ingredients (see
+# apps/recipe/indexes.py). Users whose indexes are kept in memory, per
+# process and kind of index.
+RECIPE_INDEX_MAX_USERS = int(os.environ.get("RECIPE_INDEX_MAX_USERS", 1000))
+# An index further behind the change log than this is rebuilt instead of
+# caught up object by object.
+RECIPE_INDEX_MAX_CATCHUP = 5000
+# Build indexes that requests found missing on a background thread, one at
+# a time, instead of in the request. Off under test, where the thread could
+# not see the test's uncommitted data.
+RECIPE_INDEX_WARM_IN_BACKGROUND = not TESTING
+
+# "What can I cook" matching (see apps/recipe/pantry.py). Most ingredient
+# ids and results accepted by /recipes/cookable/.
+PANTRY_MAX_HAVE = 500
+PANTRY_MAX_RESULTS = 100
+
+# Similar recipes (see apps/recipe/similarity.py). Most results returned by
+# /recipes/<id>/similar/.
+SIMILAR_MAX_RESULTS = 50
+
+# Near-duplicate recipes (see apps/recipe/duplicates.py): smallest Jaccard
+# index of the title 3-grams and ingredient names of two recipes for them
+# to be reported as duplicates.
+DUPLICATES_THRESHOLD = 0.8
+
+# Tag and ingredient autocomplete (see apps/recipe/autocomplete.py). Most
+# names returned per prefix, and seconds a client may reuse a response.
+AUTOCOMPLETE_MAX_RESULTS = 50
+AUTOCOMPLETE_MAX_AGE = 30
@@ -15,20 +15,33 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from django.contrib import admin
+from django.conf import settings
+from django.conf.urls.static import static
 from django.urls import path, include
 
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-    path(
-        "api/docs/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
-        name="swagger-ui",
-    ),
     path("api/user/", include("apps.user.urls")),
     path("api/recipe/", include("apps.recipe.urls")),
+    path("", include("apps.core.urls")),
 ]
+
+if not settings.API_ONLY:
+    # Imported here so API-only workers never load the admin or drf-spectacular.
+    from django.contrib import admin
+    from drf_spectacular.views import SpectacularSwaggerView
+
+    from apps.core.views import schema_view
+
+    urlpatterns = [
+        path("admin/", admin.site.urls),
+        path("api/schema/", schema_view, name="schema"),
+        path(
+            "api/docs/",
+            SpectacularSwaggerView.as_view(url_name="schema"),
+            name="swagger-ui",
+        ),
+    ] + urlpatterns
+
+# Uploaded images; in production the reverse proxy serves MEDIA_ROOT.
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,19 @@
+"""
+Gunicorn worker classes.
+"""
+
+from uvicorn_worker import UvicornWorker as BaseUvicornWorker
+
+
+class UvicornWorker(BaseUvicornWorker):
+    """
+    Uvicorn worker that honours gunicorn's `graceful_timeout`.
+
+    The stock worker waits indefinitely for open connections on shutdown;
+    this one gives in-flight requests `graceful_timeout` seconds, like the
+    sync workers get.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config.timeout_graceful_shutdown = self.cfg.graceful_timeout